@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Asset fingerprinting for `python3 build.py --fingerprint`
+
+Static assets (css/*.css, js/*.js, images/*.svg) are copied to names that
+carry a hash of their contents (css/style.css -> css/style.3f2a9c1b7e.css),
+and href/src references in generated HTML are rewritten to those names, so
+the fingerprinted files can be cached forever. A file's fingerprint only
+changes when its bytes do. The mapping is written to asset-manifest.json and,
+on request, to a Netlify/Cloudflare-style _headers file that marks the
+fingerprinted files immutable.
+"""
+
+import glob
+import hashlib
+import json
+import re
+import shutil
+
+import outputs
+
+ASSET_PATTERNS = ('css/*.css', 'js/*.js', 'images/*.svg')
+HASH_LENGTH = 10
+FINGERPRINTED_RE = re.compile(r'\.[0-9a-f]{%d}$' % HASH_LENGTH)
+REFERENCE_RE = re.compile(r'((?:href|src)=")((?:\.\./)*)((?:css|js|images)/[^"#?]+)"')
+IMMUTABLE = 'Cache-Control: public, max-age=31536000, immutable'
+
+
+def is_fingerprinted(path):
+    return FINGERPRINTED_RE.search(path.stem) is not None
+
+
+def fingerprint_file(root, rel):
+    """Create the fingerprinted copy of one asset (dropping copies of older versions).
+
+    Returns the fingerprinted path relative to root.
+    """
+    path = root / rel
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:HASH_LENGTH]
+    target = path.with_name(f'{path.stem}.{digest}{path.suffix}')
+    if not target.exists():
+        shutil.copyfile(path, target)
+    for old in path.parent.glob(f'{glob.escape(path.stem)}.{"?" * HASH_LENGTH}{path.suffix}'):
+        if old != target and is_fingerprinted(old):
+            old.unlink()
+    return target.relative_to(root).as_posix()
+
+
+def fingerprint_assets(root, exclude=()):
+    """Fingerprint every asset under root except the paths in exclude.
+
+    Returns {asset path: fingerprinted path}, both relative to root.
+    """
+    mapping = {}
+    for pattern in ASSET_PATTERNS:
+        for path in sorted(root.glob(pattern)):
+            rel = path.relative_to(root).as_posix()
+            if not is_fingerprinted(path) and rel not in exclude:
+                mapping[rel] = fingerprint_file(root, rel)
+
+    # Copies whose source file is gone are no longer referenced by any page
+    for pattern in ASSET_PATTERNS:
+        for path in root.glob(pattern):
+            if is_fingerprinted(path):
+                source = path.with_name(FINGERPRINTED_RE.sub('', path.stem) + path.suffix)
+                if not source.exists():
+                    path.unlink()
+    return mapping
+
+
+def rewrite_references(html_text, mapping):
+    """Point href/src attributes at the fingerprinted names (relative prefixes are kept)."""
+    def replace(m):
+        target = mapping.get(m.group(3))
+        return f'{m.group(1)}{m.group(2)}{target}"' if target else m.group(0)
+    return REFERENCE_RE.sub(replace, html_text)
+
+
+def write_manifest(path, mapping, writer=None):
+    (writer or outputs.OutputWriter()).write_text(path, json.dumps(mapping, indent=2) + '\n')
+
+
+def write_headers(path, mapping, writer=None):
+    """Write a _headers file marking every fingerprinted asset immutable."""
+    text = ''.join(f'/{target}\n  {IMMUTABLE}\n' for target in sorted(mapping.values()))
+    (writer or outputs.OutputWriter()).write_text(path, text)
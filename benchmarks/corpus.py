@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Synthetic content/ corpora for the build benchmarks
+
+Posts are generated deterministically from a seed: a title and date
+directive, then paragraphs of pseudo-Swedish text, with each feature of the
+Markdown dialect mixed in with the probability given in the feature mix:
+
+    popups  [[hover text|popup content]]
+    math    $$...$$ display math and \\(...\\) inline math
+    lists   - item lists
+    code    fenced code blocks and `inline code`
+    links   [[post:Title]] links to other posts in the corpus
+
+    python3 benchmarks/corpus.py /tmp/corpus --posts 1000 --mix math=0.5,code=0
+"""
+
+import argparse
+import random
+from pathlib import Path
+
+DEFAULT_MIX = {'popups': 0.3, 'math': 0.2, 'lists': 0.5, 'code': 0.2, 'links': 0.5}
+
+WORDS = ('moral etik frihet vilja kunskap sanning värde handling plikt dygd förnuft känsla lycka rättvisa '
+         'samhälle individ ansvar orsak verkan princip argument slutsats premiss tanke språk mening värld '
+         'tid rum natur kultur historia politik ekonomi marknad stat lag norm regel fråga svar problem '
+         'teori praktik erfarenhet begrepp kategori exempel skillnad likhet grund följd möjlighet').split()
+SMALL_WORDS = 'och att det som en är av för med inte på till om men så'.split()
+
+
+def parse_mix(text):
+    """'math=0.5,code=0' -> DEFAULT_MIX with those probabilities replaced."""
+    mix = dict(DEFAULT_MIX)
+    for part in filter(None, (part.strip() for part in (text or '').split(','))):
+        name, _, value = part.partition('=')
+        if name not in mix:
+            raise ValueError(f"unknown feature {name!r} (expected one of {', '.join(mix)})")
+        mix[name] = float(value)
+    return mix
+
+
+def _sentence(rng, words=None):
+    count = words or rng.randint(6, 18)
+    tokens = [rng.choice(WORDS) if rng.random() < 0.6 else rng.choice(SMALL_WORDS) for _ in range(count)]
+    if rng.random() < 0.15:
+        i = rng.randrange(count)
+        tokens[i] = f"*{tokens[i]}*" if rng.random() < 0.5 else f"**{tokens[i]}**"
+    text = ' '.join(tokens)
+    return text[0].upper() + text[1:] + '.'
+
+
+def _paragraph(rng):
+    return ' '.join(_sentence(rng) for _ in range(rng.randint(3, 7)))
+
+
+def _title(rng, number):
+    return f"{' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).capitalize()} {number}"
+
+
+def generate_post(rng, number, titles, mix):
+    """Markdown text of one post."""
+    lines = [f"<!-- title: {titles[number]} -->",
+             f"<!-- date: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}-{rng.randint(2019, 2026)} -->",
+             '']
+    for section in range(rng.randint(2, 5)):
+        if section:
+            lines += [f"## {_sentence(rng, 3)[:-1]}", '']
+        for _ in range(rng.randint(2, 4)):
+            paragraph = _paragraph(rng)
+            if rng.random() < mix['popups']:
+                paragraph += f" [[{rng.choice(WORDS)}|{_sentence(rng)}]]"
+            if rng.random() < mix['links'] and len(titles) > 1:
+                target = rng.choice([title for i, title in enumerate(titles[:50]) if i != number] or titles)
+                paragraph += f" Se även [[post:{target}]]."
+            if rng.random() < mix['math']:
+                paragraph += r" Låt \(x_i > 0\) för alla \(i\)."
+            if rng.random() < mix['code']:
+                paragraph += f" Kör `{rng.choice(WORDS)}()` först."
+            lines += [paragraph, '']
+        if rng.random() < mix['lists']:
+            lines += [f"- {_sentence(rng, rng.randint(3, 8))}" for _ in range(rng.randint(2, 6))] + ['']
+        if rng.random() < mix['math']:
+            lines += [r"$$\sum_{i=1}^{n} x_i = \frac{n(n+1)}{2}$$", '']
+        if rng.random() < mix['code']:
+            lines += ['```', f"def {rng.choice(WORDS)}(x):", '    return x * 2', '```', '']
+    return '\n'.join(lines)
+
+
+def generate_corpus(content_dir, posts, mix=None, seed=0):
+    """Write posts Markdown files into content_dir; returns their paths."""
+    mix = mix or DEFAULT_MIX
+    rng = random.Random(seed)
+    content_dir = Path(content_dir)
+    content_dir.mkdir(parents=True, exist_ok=True)
+    titles = [_title(rng, number) for number in range(posts)]
+    paths = []
+    for number in range(posts):
+        path = content_dir / f"post-{number:05d}.md"
+        path.write_text(generate_post(rng, number, titles, mix), encoding='utf-8')
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic content/ directory")
+    parser.add_argument('content_dir', help="directory to write the Markdown files into")
+    parser.add_argument('--posts', type=int, default=100, help="number of posts")
+    parser.add_argument('--mix', help="feature probabilities, e.g. popups=0.5,math=0 (default: %s)"
+                        % ','.join(f"{name}={value}" for name, value in DEFAULT_MIX.items()))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = generate_corpus(args.content_dir, args.posts, parse_mix(args.mix), args.seed)
+    print(f"📝 Wrote {len(paths)} posts to {args.content_dir}")
+
+
+if __name__ == "__main__":
+    main()
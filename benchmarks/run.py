@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Build benchmarks for the Tufte Blog Builder
+
+For each corpus size a synthetic site is generated in a temporary directory
+(the real post template and assets plus benchmarks/corpus.py content) and
+these scenarios are timed, each in a fresh Python process so peak memory
+(max RSS) is measured per scenario:
+
+    cold     build_all with no build cache and no outputs
+    warm     build_all again with nothing changed
+    single   build_all after editing one post
+    convert  convert_markdown_to_html over every post (no I/O)
+    index    build_index over every post record
+
+Results are written as JSON and can be compared against a saved baseline;
+a scenario more than --threshold slower (or larger) than the baseline is
+reported as a regression and makes the run exit with status 1.
+
+    python3 benchmarks/run.py --sizes 10,1000 --save-baseline benchmarks/baseline.json
+    python3 benchmarks/run.py --sizes 10,1000 --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # not available on Windows; memory is then not reported
+    resource = None
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = BENCHMARKS_DIR.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+import corpus  # noqa: E402
+
+RESULTS_VERSION = 1
+SCENARIOS = ('cold', 'warm', 'single', 'convert', 'index')
+SITE_FILES = ('posts/post-template.html', 'css', 'js', 'images')
+OUTPUTS = ('.build-cache', 'index.html', 'page', 'archive', 'search')
+
+
+# --- Child process: one scenario ---
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)  # pool workers
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)  # bytes on macOS, KB elsewhere
+
+
+def run_scenario(scenario, root, engine, jobs):
+    """Time one scenario against the site in root; returns the measurement."""
+    import build
+
+    builder = build.BlogBuilder(engine, project_root=root)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if scenario == 'convert':
+            texts = [path.read_text(encoding='utf-8') for path in sorted(builder.content_dir.glob('*.md'))]
+            start = time.perf_counter()
+            for text in texts:
+                builder.convert_markdown_to_html(text)
+        elif scenario == 'index':
+            records = [build.PostRecord.from_dict(post['record'])
+                       for post in builder.load_manifest()['posts'].values()]
+            start = time.perf_counter()
+            builder.build_index(records)
+        else:
+            start = time.perf_counter()
+            builder.build_all(jobs=jobs)
+        seconds = time.perf_counter() - start
+    builder.close()
+    return {'seconds': round(seconds, 4), 'peak_rss_mb': _peak_rss_mb()}
+
+
+# --- Parent: sites, repeats, results ---
+
+def prepare_site(root, posts, mix, seed):
+    """Lay out a site to benchmark: the real template and assets plus a synthetic corpus."""
+    for rel in SITE_FILES:
+        source, target = PROJECT_ROOT / rel, root / rel
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if source.is_dir():
+            shutil.copytree(source, target, ignore=shutil.ignore_patterns('*.gz', '*.br'))
+        else:
+            shutil.copy2(source, target)
+    corpus.generate_corpus(root / 'content', posts, mix, seed)
+
+
+def clean_outputs(root):
+    """Remove everything a build writes, leaving sources, template and assets."""
+    for rel in OUTPUTS:
+        path = root / rel
+        if path.is_dir():
+            shutil.rmtree(path)
+        elif path.exists():
+            path.unlink()
+    for path in (root / 'posts').glob('*.html'):
+        if path.name != 'post-template.html':
+            path.unlink()
+
+
+def edit_one_post(root, round_number):
+    """Append a paragraph to one post (a different one each round)."""
+    posts = sorted((root / 'content').glob('*.md'))
+    path = posts[round_number % len(posts)]
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(f"\nEn tillagd mening i omgång {round_number}.\n")
+
+
+def measure(scenario, root, engine, jobs):
+    """Run one scenario in a fresh interpreter."""
+    command = [sys.executable, str(Path(__file__).resolve()), '--child', scenario, '--root', str(root),
+               '--engine', engine, '--jobs', str(jobs)]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{scenario} failed:\n{result.stderr.strip()}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark_size(posts, args, mix):
+    """All scenarios for one corpus size; returns result entries."""
+    samples = {scenario: [] for scenario in args.scenarios}
+    with tempfile.TemporaryDirectory(prefix=f'blog-bench-{posts}-') as tmp:
+        root = Path(tmp)
+        prepare_site(root, posts, mix, args.seed)
+        for round_number in range(args.repeat):
+            clean_outputs(root)
+            # cold fills the cache that the other scenarios start from, so it always runs
+            cold = measure('cold', root, args.engine, args.jobs)
+            if 'cold' in samples:
+                samples['cold'].append(cold)
+            for scenario in args.scenarios:
+                if scenario == 'cold':
+                    continue
+                if scenario == 'single':
+                    edit_one_post(root, round_number)
+                samples[scenario].append(measure(scenario, root, args.engine, args.jobs))
+
+    entries = []
+    for scenario, runs in samples.items():
+        seconds = [run['seconds'] for run in runs]
+        memory = [run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None]
+        entries.append({
+            'posts': posts,
+            'scenario': scenario,
+            'seconds': min(seconds),
+            'mean_seconds': round(sum(seconds) / len(seconds), 4),
+            'peak_rss_mb': max(memory) if memory else None,
+            'runs': len(runs),
+        })
+    return entries
+
+
+def compare(results, baseline, threshold):
+    """Print each result against the baseline; returns the regressions found."""
+    previous = {(entry['posts'], entry['scenario']): entry for entry in baseline.get('results', [])}
+    regressions = []
+    print(f"\n{'posts':>6}  {'scenario':<8}  {'best s':>9}  {'baseline':>9}  {'change':>8}  {'peak MB':>8}")
+    for entry in results:
+        key = (entry['posts'], entry['scenario'])
+        old = previous.get(key)
+        change = ''
+        if old and old['seconds']:
+            ratio = entry['seconds'] / old['seconds']
+            change = f"{ratio - 1:+.1%}"
+            if ratio > 1 + threshold:
+                regressions.append(f"{key[0]} posts / {key[1]}: {old['seconds']:.4f}s → {entry['seconds']:.4f}s")
+        if old and old.get('peak_rss_mb') and entry['peak_rss_mb']:
+            if entry['peak_rss_mb'] > old['peak_rss_mb'] * (1 + threshold):
+                regressions.append(f"{key[0]} posts / {key[1]}: peak memory "
+                                   f"{old['peak_rss_mb']} MB → {entry['peak_rss_mb']} MB")
+        before = f"{old['seconds']:.4f}" if old else '-'
+        print(f"{entry['posts']:>6}  {entry['scenario']:<8}  {entry['seconds']:>9.4f}  "
+              f"{before:>9}  {change:>8}  {entry['peak_rss_mb'] or '-':>8}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark builds of synthetic sites")
+    parser.add_argument('--sizes', default='10,1000',
+                        help="comma-separated corpus sizes in posts (default: 10,1000; try 10000 for large sites)")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f"comma-separated subset of {', '.join(SCENARIOS)}")
+    parser.add_argument('--mix', help="feature mix for the corpus, e.g. popups=0.5,math=0 (see corpus.py)")
+    parser.add_argument('--seed', type=int, default=0, help="corpus seed")
+    parser.add_argument('--engine', default='regex', help="Markdown engine to benchmark")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="build worker processes")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per scenario; the best time is reported")
+    parser.add_argument('--output', help="write results JSON here")
+    parser.add_argument('--baseline', help="compare against this results JSON")
+    parser.add_argument('--save-baseline', metavar='PATH', help="also write the results as a baseline")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="slowdown (fraction) counted as a regression (default: 0.10)")
+    parser.add_argument('--child', choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument('--root', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_scenario(args.child, Path(args.root), args.engine, args.jobs)))
+        return 0
+
+    args.scenarios = [scenario.strip() for scenario in args.scenarios.split(',') if scenario.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+    mix = corpus.parse_mix(args.mix)
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    results = []
+    for posts in sizes:
+        print(f"⏱️  Benchmarking {posts} posts ({', '.join(args.scenarios)}; best of {args.repeat})...")
+        results.extend(benchmark_size(posts, args, mix))
+
+    report = {
+        'version': RESULTS_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'engine': args.engine,
+        'jobs': args.jobs,
+        'mix': mix,
+        'seed': args.seed,
+        'results': results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+        print(f"📝 Results written to {path}")
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if (baseline.get('engine'), baseline.get('jobs'), baseline.get('mix')) != (args.engine, args.jobs, mix):
+            print("⚠️  Baseline was recorded with a different engine, job count or feature mix")
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+        for regression in regressions:
+            print(f"   {regression}")
+        return 1
+    if args.baseline:
+        print(f"\n✅ No regressions beyond {args.threshold:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,61 +4,510 @@ Tufte Blog Builder
 Converts Markdown files from /content to HTML pages
 """
 
+import argparse
+import contextlib
+import hashlib
+import io
+import json
 import os
+import posixpath
 import re
 import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from pathlib import Path
 
+import assets
+import charts
+import compression
+import deploy
+import feeds
+import link_graph
+import markdown_engine
+import math_render
+import optimize
+import outputs
+import post_metadata
+import profiling
+import search_index
+import template_engine
+import watcher
+
+CATALOG_VERSION = 3
+MANIFEST_VERSION = 2
+
+# Must match the katex version in package.json: prerendered markup is only valid with its own stylesheet
+KATEX_VERSION = '0.16.9'
+KATEX_URL = f'https://cdn.jsdelivr.net/npm/katex@{KATEX_VERSION}/dist'
+
+KATEX_CSS = f'''  <link rel="stylesheet" href="{KATEX_URL}/katex.min.css">'''
+
+KATEX_SNIPPET = KATEX_CSS + f'''
+  <script defer src="{KATEX_URL}/katex.min.js"></script>
+  <script defer src="{KATEX_URL}/contrib/auto-render.min.js" crossorigin="anonymous"''' + '''
+    onload="renderMathInElement(document.body, {delimiters: [{left: '$$', right: '$$', display: true}, {left: '\\\\[', right: '\\\\]', display: true}, {left: '\\\\(', right: '\\\\)', display: false}]});"></script>'''
+
+INDEX_TEMPLATE = template_engine.compile_template('''<!DOCTYPE html>
+<html lang="sv">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <title>{{PAGE_TITLE}}</title>{{FEED_LINKS}}
+  <link rel="preconnect" href="https://fonts.googleapis.com">
+  <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+  <link rel="preload" href="https://fonts.googleapis.com/css2?family=Source+Serif+4:ital,opsz,wght@0,8..60,400;0,8..60,500;1,8..60,400;1,8..60,500&display=swap" as="style" onload="this.onload=null;this.rel='stylesheet'">
+  <noscript><link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Source+Serif+4:ital,opsz,wght@0,8..60,400;0,8..60,500;1,8..60,400;1,8..60,500&display=swap"></noscript>
+  <link rel="stylesheet" href="{{ROOT}}css/style.css">
+  <script defer src="{{ROOT}}js/search.js"></script>
+</head>
+<body>
+  <button id="theme-toggle" onclick="toggleTheme()">dark</button>
+  <script>
+    (function() {
+      if (localStorage.getItem('theme') === 'dark') {
+        document.documentElement.removeAttribute('data-theme');
+        document.addEventListener('DOMContentLoaded', function() {
+          document.getElementById('theme-toggle').textContent = 'light';
+        });
+      } else {
+        document.documentElement.setAttribute('data-theme', 'light');
+      }
+    })();
+    function toggleTheme() {
+      var btn = document.getElementById('theme-toggle');
+      if (document.documentElement.getAttribute('data-theme') === 'light') {
+        document.documentElement.removeAttribute('data-theme');
+        localStorage.setItem('theme', 'dark');
+        btn.textContent = 'light';
+      } else {
+        document.documentElement.setAttribute('data-theme', 'light');
+        localStorage.setItem('theme', 'light');
+        btn.textContent = 'dark';
+      }
+    }
+  </script>
+  <article>
+    <section class="content">
+      <h1 class="site-title">Codex <span class="errata">Errata</span></h1>
+      <p style="font-size: 1.4rem;">Moloch delenda est</p>
+
+      <hr style="width: 100%">
+
+      <input type="search" id="search" class="search-box" placeholder="Search posts" aria-label="Search posts" data-root="{{ROOT}}" hidden>
+      <div id="search-results"></div>
+
+{{HEADING}}{{POST_LIST}}{{PAGE_NAV}}    </section>
+  </article>
+
+  <footer>
+  </footer>
+</body>
+</html>''')
+
+POST_ENTRY_TEMPLATE = template_engine.compile_template('''      <div class="post-entry">
+        <h2><a href="{{URL}}">{{TITLE}}</a></h2>
+        <div class="article-meta">{{META}}</div>
+      </div>
+
+''')
+
+# Pagination links below the post list (index pages) and links between the yearly archives
+PAGE_NAV_TEMPLATE = template_engine.compile_template('''      <nav class="pagination">
+{{LINKS}}      </nav>
+{{ARCHIVES}}
+''')
+
+ARCHIVE_LINKS_TEMPLATE = template_engine.compile_template('''      <p class="archive-links">Archive: {{YEARS}}</p>
+''')
+
+# "Linked from" section at the end of a post, listing the posts that link to it
+BACKLINKS_TEMPLATE = template_engine.compile_template('''
+      <aside class="backlinks">
+        <h2>Linked from</h2>
+        <ul>
+{{ITEMS}}        </ul>
+      </aside>
+''')
+
+SITE_TITLE = 'codexerrata'
+
+INTERNAL_LINK_RE = re.compile(r'\[\[post:\s*([^\]\|]+)(?:\|([^\]]+))?\]\]')
+
+
+def hash_bytes(data):
+    """Content hash used by the catalog and the build manifest."""
+    return hashlib.sha256(data).hexdigest()
+
+
+@dataclass
+class PostRecord:
+    """Everything the index (and other site-wide pages) need to know about a built post."""
+    title: str
+    date: str
+    slug: str
+    url: str              # relative to the site root, e.g. posts/<slug>.html
+    reading_time: int
+    word_count: int
+    source_mtime: float
+    output_path: str      # relative to the project root
+    text: str = field(default='', repr=False, compare=False)  # plain body text; not kept in the manifest
+    html: str = field(default='', repr=False, compare=False)  # article HTML (for the feeds); not kept either
+
+    def to_dict(self):
+        return {f.name: getattr(self, f.name) for f in fields(self) if f.name not in ('text', 'html')}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
 class BlogBuilder:
-    def __init__(self):
-        # Use directory containing build.py as project root (so it works from any cwd)
-        self.project_root = Path(__file__).resolve().parent
+    ENGINES = ('regex', 'tokens')
+    PAGE_SIZE = 20
+    FEED_SIZE = 20
+
+    def __init__(self, engine='regex', page_size=PAGE_SIZE, math_renderer=None, fingerprint=False, project_root=None,
+                 base_url=None, feed_size=FEED_SIZE):
+        # Markdown engine: 'regex' (the original converter) or 'tokens' (markdown_engine)
+        self.engine = engine
+        # Posts per index page (0 = the whole archive on index.html)
+        self.page_size = page_size
+        # Public URL of the site; feeds and sitemap.xml are only written when it is known
+        self.base_url = base_url.rstrip('/') + '/' if base_url else None
+        # Posts (with full content) in the feeds
+        self.feed_size = feed_size
+        # Command of a local math renderer (math_render); None leaves math to KaTeX in the browser
+        self.math_renderer = math_renderer
+        # Reference static assets by content-hashed names (assets)
+        self.fingerprint = fingerprint
+        # Site to build (content/, posts/, assets); defaults to the directory containing build.py,
+        # so it works from any cwd
+        self.project_root = Path(project_root).resolve() if project_root else Path(__file__).resolve().parent
         self.content_dir = self.project_root / "content"
         self.posts_dir = self.project_root / "posts"
         self.template_path = self.project_root / "posts" / "post-template.html"
+        self.cache_dir = self.project_root / ".build-cache"
+        self.catalog_path = self.cache_dir / "catalog.json"
+        self.manifest_path = self.cache_dir / "manifest.json"
+        self.feed_cache_dir = self.cache_dir / "feed"
+        self._catalog = None
+        self._post_mapping = None
+        self._slugs = None
+        self._link_graph = None
+        # Posts build_all has to check for changes; None checks every post (see refresh_catalog)
+        self._candidates = None
+        self._manifest = None
+        self._search = None
+        self._page_hashes = {}
+        self._math = None
+        self._asset_map = None
+        # Records per-stage timings when set to a profiling.Profiler (--profile)
+        self.profiler = profiling.NULL
+        # Every generated file is written through this (skipped when unchanged, replaced atomically)
+        self.writer = outputs.OutputWriter()
+        # optimize.PageOptimizer of a build_all with optimize_output; pages pass through it on their way out
+        self.optimizer = None
+        # Set while watching: the catalog and manifest stay in memory and are only written by
+        # flush_caches (a stale copy on disk just makes the next build re-check the posts that
+        # changed since, by their hashes)
+        self.defer_saves = False
+        self._unsaved = set()
 
     def load_template(self):
-        """Load the HTML template"""
+        """Load the compiled post template (parsed once, re-parsed only when the file changes)"""
         try:
-            with open(self.template_path, 'r', encoding='utf-8') as f:
-                return f.read()
+            return template_engine.load_template(self.template_path, template_engine.prepare_post_template)
         except FileNotFoundError:
             print("❌ Template not found. Make sure post-template.html exists.")
             return None
 
-    def _build_post_mapping(self):
-        """Build title -> post URL mapping from all content files (for internal links)."""
-        mapping = {}
+    def make_slug(self, title, base_name):
+        """Generate the URL-safe output slug for a post (title first, file name as fallback)."""
+        safe_title = re.sub(r'[^\w\-]', '', title.lower().replace(' ', '-'))
+        # If title is too short or would collide, use base filename
+        if len(safe_title) < 5:
+            safe_title = re.sub(r'[^\w\-]', '', base_name.lower())
+        # Limit length but keep it unique
+        return safe_title[:40]
+
+    def _catalog_entry(self, md_file, stat):
+        """Read one source file and record what the rest of the build needs to know about it."""
+        with open(md_file, 'rb') as f:
+            raw = f.read()
+        # Same newline handling as reading in text mode; undecodable bytes are left for build_post to report
+        content = raw.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+        meta = post_metadata.parse_header(content)
+        title = meta.title
+        link_title = title if title and title != "Untitled Post" else md_file.stem
+        return {
+            'title': title,
+            'link_title': link_title.strip(),
+            'date': meta.date,
+            'slug': self.make_slug(link_title, md_file.stem),
+            'links': sorted({m.group(1).strip() for m in INTERNAL_LINK_RE.finditer(content)}),
+            'refs': link_graph.scan_references(content),
+            'hash': hash_bytes(raw),
+            'mtime': stat.st_mtime,
+            'size': stat.st_size,
+        }
+
+    def load_catalog(self):
+        """Return the content catalog: file name -> title, date, slug and mtime.
+
+        The catalog is built at most once per BlogBuilder. Entries are persisted in
+        .build-cache/catalog.json and reused while a file's mtime and size are unchanged,
+        so a single-file build only stats the content directory instead of re-reading it.
+        """
+        if self._catalog is not None:
+            return self._catalog
+
+        cached = {}
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CATALOG_VERSION:
+                cached = data['entries']
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+        catalog = {}
+        changed = False
         for md_file in self.content_dir.glob("*.md"):
-            with open(md_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            title = self.extract_title_from_markdown(content)
-            if not title or title == "Untitled Post":
-                title = md_file.stem
-            base_name = md_file.stem
-            safe_title = re.sub(r'[^\w\-]', '', title.lower().replace(' ', '-'))
-            if len(safe_title) < 5:
-                safe_title = re.sub(r'[^\w\-]', '', base_name.lower())
-            slug = safe_title[:40]
-            mapping[title.strip()] = f"{slug}.html"
-        return mapping
+            stat = md_file.stat()
+            entry = cached.get(md_file.name)
+            if not entry or entry['mtime'] != stat.st_mtime or entry['size'] != stat.st_size:
+                entry = self._catalog_entry(md_file, stat)
+                changed = True
+            catalog[md_file.name] = entry
+
+        self._catalog = catalog
+        if changed or catalog.keys() != cached.keys():
+            self._save_catalog()
+        return catalog
+
+    def _save_catalog(self):
+        if self.defer_saves:
+            self._unsaved.add('catalog')
+            return
+        self.cache_dir.mkdir(exist_ok=True)
+        with open(self.catalog_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CATALOG_VERSION, 'entries': self._catalog}, f, ensure_ascii=False, indent=1)
+
+    def refresh_catalog(self, paths):
+        """Re-read only the given source files into the catalog (new, edited or deleted posts).
+
+        While no post is added, deleted or retitled, slugs and [[post:]] targets stay put, so
+        only the edited posts and the posts they link to (now or before) can need rebuilding:
+        the link graph is updated in place and the next build_all checks just those. Any
+        other change drops the graph and the next build_all checks every post.
+        """
+        catalog = self.load_catalog()
+        before = {path.name: catalog.get(path.name) for path in paths}
+        for path in paths:
+            try:
+                catalog[path.name] = self._catalog_entry(path, path.stat())
+            except FileNotFoundError:
+                catalog.pop(path.name, None)
+        self._save_catalog()
+
+        names = sorted(before)
+        if (self._link_graph is not None and self._candidates is not None
+                and all(before[name] is not None and name in catalog
+                        and catalog[name]['link_title'] == before[name]['link_title'] for name in names)):
+            self._candidates.update(names, self._link_graph.update(names))
+        else:
+            self._post_mapping = None
+            self._slugs = None
+            self._link_graph = None
+            self._candidates = None
+
+    def assign_slugs(self):
+        """Return ({source file name: output slug}, collisions) for every post in the catalog.
+
+        Posts whose titles give the same slug would overwrite each other's page; in file name
+        order, the first keeps the slug and the others get -2, -3, ... appended. collisions
+        lists those as [(slug, [file names])].
+        """
+        if self._slugs is None:
+            slugs, taken, claimants = {}, set(), {}
+            catalog = self.load_catalog()
+            for name in sorted(catalog):
+                claimants.setdefault(catalog[name]['slug'], []).append(name)
+            for slug, names in claimants.items():
+                slugs[names[0]] = slug
+                taken.add(slug)
+            for slug, names in claimants.items():
+                for name in names[1:]:
+                    number = 2
+                    while f"{slug}-{number}" in taken:
+                        number += 1
+                    slugs[name] = f"{slug}-{number}"
+                    taken.add(slugs[name])
+            collisions = sorted((slug, names) for slug, names in claimants.items() if len(names) > 1)
+            self._slugs = (slugs, collisions)
+        return self._slugs
+
+    def output_slug(self, markdown_file, title):
+        """Slug of a post's page: the catalog's for files in content/, else derived from the title."""
+        if Path(markdown_file).resolve().parent == self.content_dir:
+            slug = self.assign_slugs()[0].get(Path(markdown_file).name)
+            if slug:
+                return slug
+        return self.make_slug(title, Path(markdown_file).stem)
+
+    def _build_post_mapping(self):
+        """Build title -> post URL mapping from the content catalog (for internal links)."""
+        if self._post_mapping is None:
+            slugs = self.assign_slugs()[0]
+            self._post_mapping = {}
+            for name, entry in sorted(self.load_catalog().items()):
+                # A title used by several posts links to the one that kept the plain slug
+                self._post_mapping.setdefault(entry['link_title'], f"{slugs[name]}.html")
+        return self._post_mapping
+
+    def _resolve_link_target(self, title, post_mapping):
+        """Return the URL a [[post:Title]] link points to."""
+        url = post_mapping.get(title)
+        if not url:
+            # Fallback: compute slug from given title (in case of minor mismatch)
+            slug = link_graph.fallback_slug(title)
+            url = f"{slug}.html" if len(slug) >= 2 else "#"
+        return url
+
+    def _resolve_source_link(self, ref):
+        """Return the page URL of a relative link to a post's .md source, or None if there is no such post."""
+        slug = self.assign_slugs()[0].get(posixpath.basename(ref))
+        return f"{slug}.html" if slug else None
 
     def _resolve_internal_links(self, markdown_text, post_mapping):
-        """Replace [[post:Title]] and [[post:Title|Link text]] with markdown links."""
+        """Replace [[post:Title]] and [[post:Title|Link text]] with markdown links,
+        and point links to other posts' .md sources at their pages."""
         def replacer(m):
             title = m.group(1).strip()
             link_text = m.group(2).strip() if m.group(2) else title
-            url = post_mapping.get(title)
-            if not url:
-                # Fallback: compute slug from given title (in case of minor mismatch)
-                slug = re.sub(r'[^\w\-]', '', title.lower().replace(' ', '-'))[:40]
-                url = f"{slug}.html" if len(slug) >= 2 else "#"
-            return f"[{link_text}]({url})"
-        return re.sub(r'\[\[post:\s*([^\]\|]+)(?:\|([^\]]+))?\]\]', replacer, markdown_text)
+            return f"[{link_text}]({self._resolve_link_target(title, post_mapping)})"
+
+        def source_replacer(m):
+            url = self._resolve_source_link(m.group(2))
+            return m.group(1) + url if url else m.group(0)
+        markdown_text = INTERNAL_LINK_RE.sub(replacer, markdown_text)
+        return link_graph.SOURCE_LINK_RE.sub(source_replacer, markdown_text)
+
+    def link_graph(self):
+        """The link graph of every post in the catalog (see link_graph.py), built once per catalog."""
+        if self._link_graph is None:
+            self._link_graph = link_graph.LinkGraph(self.load_catalog(), self.assign_slugs()[0],
+                                                    lambda path: (self.project_root / path).exists())
+        return self._link_graph
+
+    def _backlinks(self, name):
+        """[[page URL, title]] of the posts linking to a post, as stored in the manifest."""
+        catalog, slugs = self.load_catalog(), self.assign_slugs()[0]
+        return [[f"{slugs[source]}.html", catalog[source]['link_title']]
+                for source in self.link_graph().backlinks.get(name, ())]
+
+    def render_backlinks(self, markdown_file):
+        """The "Linked from" section of a post in content/ ('' if nothing links to it)."""
+        if Path(markdown_file).resolve().parent != self.content_dir:
+            return ''
+        backlinks = self._backlinks(Path(markdown_file).name)
+        if not backlinks:
+            return ''
+        items = ''.join(f'          <li><a href="{url}">{title}</a></li>\n' for url, title in backlinks)
+        return BACKLINKS_TEMPLATE.render(ITEMS=items)
+
+    def report_broken_links(self):
+        graph = self.link_graph()
+        for name, ref in graph.broken:
+            print(f"🔗 Broken link in {name}: {ref}")
+        return graph.broken
+
+    def _code_hash(self):
+        """Hash of the build code itself (and the engine and math renderer); any change invalidates every output."""
+        digest = hashlib.sha256(f"{self.engine}\0{self.math_renderer or ''}".encode())
+        for module in (__file__, markdown_engine.__file__, template_engine.__file__, search_index.__file__,
+                       math_render.__file__, link_graph.__file__, post_metadata.__file__):
+            digest.update(Path(module).resolve().read_bytes())
+        return digest.hexdigest()
+
+    def _template_hash(self):
+        try:
+            return hash_bytes(self.template_path.read_bytes())
+        except FileNotFoundError:
+            return None
+
+    def load_manifest(self):
+        """Load the build manifest recorded by the previous build_all (empty if missing or stale)."""
+        if self._manifest is None:
+            self._manifest = {'version': MANIFEST_VERSION, 'code': None, 'template': None, 'assets': None,
+                              'posts': {}, 'pages': {}}
+            try:
+                with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == MANIFEST_VERSION:
+                    self._manifest = manifest
+            except (FileNotFoundError, ValueError):
+                pass
+        return self._manifest
+
+    def search_index(self):
+        """The search index (search_index.SearchIndex), kept between builds with its shards in memory."""
+        if self._search is None:
+            self._search = search_index.SearchIndex(self.project_root / "search", self.cache_dir / "search.json",
+                                                    self.writer)
+        return self._search
+
+    def flush_caches(self):
+        """Write the catalog and manifest if defer_saves held them back."""
+        unsaved, self._unsaved = self._unsaved, set()
+        deferred, self.defer_saves = self.defer_saves, False
+        try:
+            if 'catalog' in unsaved:
+                self._save_catalog()
+            if 'manifest' in unsaved:
+                self.save_manifest(self._manifest)
+        finally:
+            self.defer_saves = deferred
+
+    def save_manifest(self, manifest):
+        if self.defer_saves:
+            self._unsaved.add('manifest')
+            return
+        self.cache_dir.mkdir(exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+    def _resolved_links(self, entry):
+        """Current URL of every [[post:]] target and .md source link in a catalog entry."""
+        mapping = self._build_post_mapping()
+        links = {title: self._resolve_link_target(title, mapping) for title in entry['links']}
+        links.update((ref, self._resolve_source_link(ref)) for ref in entry.get('refs', ()) if ref.endswith('.md'))
+        return links
+
+    def _needs_rebuild(self, name, entry, previous):
+        """True if a post's source, link targets, slug or output changed since the last build."""
+        if previous is None or previous['source'] != entry['hash']:
+            return True
+        if previous['record']['slug'] != self.assign_slugs()[0].get(name):
+            return True
+        if previous['links'] != self._resolved_links(entry):
+            return True
+        if previous.get('backlinks') != self._backlinks(name):
+            return True
+        return not (self.project_root / previous['record']['output_path']).exists()
 
     def convert_markdown_to_html(self, markdown_text):
         """Convert basic Markdown to HTML"""
+        if self.engine == 'tokens':
+            with self.profiler.stage('markdown.tokenize'):
+                tokens = markdown_engine.tokenize(markdown_text)
+            with self.profiler.stage('markdown.render'):
+                return markdown_engine.render(tokens)
+
+        lap = self.profiler.laps('markdown')
 
         # Strip title/date comment lines from the start so first paragraph is wrapped in <p> (and second gets indent)
         lines = markdown_text.split('\n')
@@ -75,28 +524,33 @@ class BlogBuilder:
             content = content.replace('\n', '<br>')
             return f'<span class="popup">{visible}<span class="popup-body">{content}</span></span>'
         markdown_text = re.sub(r'\[\[([^\]|]+)\|([\s\S]*?)\]\]', _popup_replacer, markdown_text)
+        lap('popups')
 
         # Headers (allow with or without space after #)
         markdown_text = re.sub(r'^###\s*(.*)$', r'<h3>\1</h3>', markdown_text, flags=re.MULTILINE)
         markdown_text = re.sub(r'^##\s*(.*)$', r'<h2>\1</h2>', markdown_text, flags=re.MULTILINE)
         markdown_text = re.sub(r'^#\s*(.*)$', r'<h1>\1</h1>', markdown_text, flags=re.MULTILINE)
+        lap('headings')
 
         # Bold and italic (. can span newlines so *...* works in multi-line containers)
         markdown_text = re.sub(r'\*\*\*(.*?)\*\*\*', r'<strong><em>\1</em></strong>', markdown_text, flags=re.DOTALL)
         markdown_text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', markdown_text, flags=re.DOTALL)
         markdown_text = re.sub(r'\*(.*?)\*', r'<em>\1</em>', markdown_text, flags=re.DOTALL)
+        lap('emphasis')
 
         # Images (must be before links so ![alt](url) is not treated as link)
         markdown_text = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)', r'<img src="\2" alt="\1" class="content-image">', markdown_text)
 
         # Links
         markdown_text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'<a href="\2">\1</a>', markdown_text)
+        lap('links')
 
         # Code blocks (basic)
         markdown_text = re.sub(r'```(.*?)```', r'<pre><code>\1</code></pre>', markdown_text, flags=re.DOTALL)
 
         # Inline code
         markdown_text = re.sub(r'`([^`]+)`', r'<code>\1</code>', markdown_text)
+        lap('code')
 
         # Blockquotes
         markdown_text = re.sub(r'^> (.*)$', r'<blockquote><p>\1</p></blockquote>', markdown_text, flags=re.MULTILINE)
@@ -126,6 +580,7 @@ class BlogBuilder:
             html_lines.append('</ul>')
 
         markdown_text = '\n'.join(html_lines)
+        lap('blocks')
 
         # Paragraphs (must be done last)
         # First ensure proper separation between HTML elements and text
@@ -188,70 +643,54 @@ class BlogBuilder:
                         prev_had_math = False
             after_break_level = 0
 
+        lap('paragraphs')
         return '\n\n'.join(paragraphs)
 
-    def extract_title_from_markdown(self, markdown_content):
-        """Extract title from raw markdown content"""
-        lines = markdown_content.strip().split('\n')
-
-        # Look for title directive first: <!-- title: Your Title -->
-        for line in lines[:10]:
-            # Strip leading/trailing whitespace before matching
-            line = line.strip()
-            title_match = re.search(r'<!--\s*title:\s*(.*?)\s*-->', line, re.IGNORECASE)
-            if title_match:
-                return title_match.group(1).strip()
+    def prerender_math(self, html_content):
+        """Render the math in converted HTML with the local renderer; returns (html, errors)."""
+        if self._math is None:
+            self._math = math_render.MathRenderer(self.math_renderer, self.cache_dir / "math", cwd=self.project_root,
+                                                  version=KATEX_VERSION)
+        return self._math.prerender(html_content)
+
+    def asset_map(self):
+        """Asset path -> fingerprinted path (None unless fingerprinting), computed once per build."""
+        if self.fingerprint and self._asset_map is None:
+            # The minified stylesheet is written (and fingerprinted) by the optimize stage itself
+            self._asset_map = assets.fingerprint_assets(self.project_root, exclude={optimize.MINIFIED})
+        return self._asset_map
+
+    def close(self):
+        """Stop helper processes (the math renderer), if any were started."""
+        if self._math is not None:
+            self._math.close()
+            self._math = None
 
-        return None
+    def extract_title_from_markdown(self, markdown_content):
+        """Extract title from raw markdown content (the <!-- title: ... --> directive)"""
+        return post_metadata.parse_header(markdown_content).title
 
     def extract_date_from_markdown(self, markdown_content):
-        """Extract date from raw markdown content"""
-        lines = markdown_content.strip().split('\n')
-
-        # Look for date directive: <!-- date: January 15, 2026 --> or <!-- date: 17/12-2025 -->
-        for line in lines[:10]:
-            # Strip leading/trailing whitespace before matching
-            line = line.strip()
-            date_match = re.search(r'<!--\s*date:\s*(.*?)\s*-->', line, re.IGNORECASE)
-            if date_match:
-                return date_match.group(1).strip()
-
-        return None
+        """Extract date from raw markdown content (<!-- date: 17/12-2025 --> or <!-- date: 15 januari 2026 -->)"""
+        return post_metadata.parse_header(markdown_content).date
 
     def parse_post_date_for_sort(self, date_str, fallback_timestamp=None):
         """Parse post date string to a comparable value for sorting. Returns (datetime, used_fallback)."""
-        if not date_str:
-            if fallback_timestamp is not None:
-                return (datetime.fromtimestamp(fallback_timestamp), True)
-            return (datetime.min, True)
-        date_str = date_str.strip()
-        # DD/MM-YYYY or DD/MM-Y (e.g. 17/12-2025)
-        m = re.match(r'(\d{1,2})/(\d{1,2})-(\d{4})$', date_str)
-        if m:
-            try:
-                d, mo, y = int(m.group(1)), int(m.group(2)), int(m.group(3))
-                if 1 <= mo <= 12 and 1 <= d <= 31:
-                    return (datetime(y, mo, d), False)
-            except (ValueError, TypeError):
-                pass
-        # January 15, 2026
-        for fmt in ('%B %d, %Y', '%b %d, %Y', '%Y-%m-%d', '%d.%m.%Y'):
-            try:
-                return (datetime.strptime(date_str, fmt), False)
-            except ValueError:
-                continue
+        parsed = post_metadata.parse_date(date_str) if date_str else None
+        if parsed is not None:
+            return (parsed, False)
         if fallback_timestamp is not None:
             return (datetime.fromtimestamp(fallback_timestamp), True)
         return (datetime.min, True)
 
     def extract_metadata(self, content):
         """Extract title and other metadata from content"""
-        lines = content.strip().split('\n')
+        lines = post_metadata.header_lines(content)
 
         # Look for title directive first: <!-- title: Your Title -->
         title = None
         for line in lines[:5]:
-            title_match = re.search(r'<!--\s*title:\s*(.*?)\s*-->', line, re.IGNORECASE)
+            title_match = post_metadata.PATTERNS['title'].search(line)
             if title_match:
                 title = title_match.group(1).strip()
                 break
@@ -262,17 +701,17 @@ class BlogBuilder:
             for line in lines[:10]:
                 line = line.strip()
                 if line.startswith('<h1>'):
-                    title = re.sub(r'<[^>]+>', '', line)
+                    title = post_metadata.strip_tags(line)
                     break
                 elif line and len(line) > 10 and not line.startswith('<'):
                     # Remove HTML tags and use as title
-                    clean_line = re.sub(r'<[^>]+>', '', line)
+                    clean_line = post_metadata.strip_tags(line)
                     if len(clean_line) > 10:
                         title = clean_line[:60]
                         break
 
         date_str = datetime.now().strftime("%d/%m-%Y")
-        text_content = re.sub(r'<[^>]+>', '', content)
+        text_content = post_metadata.strip_tags(content)
         word_count = len(text_content.split())
         reading_time = max(1, round(word_count / 160))
 
@@ -280,245 +719,804 @@ class BlogBuilder:
             'title': title,
             'date': date_str,
             'word_count': word_count,
-            'reading_time': reading_time
+            'reading_time': reading_time,
+            'text': text_content,
         }
 
-    def build_post(self, markdown_file):
-        """Convert a single Markdown file to HTML"""
+    def render_post(self, markdown_file, markdown_content=None):
+        """Render a Markdown file to a complete HTML page in memory.
 
-        try:
-            # Read markdown
-            with open(markdown_file, 'r', encoding='utf-8') as f:
+        Returns (html, PostRecord), or None if the template is missing. Nothing is written.
+        """
+        # Read markdown
+        if markdown_content is None:
+            with self.profiler.stage('read'), open(markdown_file, 'r', encoding='utf-8') as f:
                 markdown_content = f.read()
 
-            print(f"📖 Processing: {markdown_file}")
-
-            # Only load math scripts on posts that contain math
-            has_math = '$$' in markdown_content or r'\(' in markdown_content or r'\[' in markdown_content
+        # Only load math scripts on posts that contain math
+        has_math = '$$' in markdown_content or r'\(' in markdown_content or r'\[' in markdown_content
 
-            # Extract title and date from raw markdown first
-            title = self.extract_title_from_markdown(markdown_content)
-            date = self.extract_date_from_markdown(markdown_content)
+        # Extract title and date from raw markdown first (header directives only)
+        header = post_metadata.parse_header(markdown_content)
+        title, date = header.title, header.date
 
-            # Resolve internal post links [[post:Title]] or [[post:Title|Link text]]
+        # Resolve internal post links [[post:Title]] or [[post:Title|Link text]]
+        with self.profiler.stage('links'):
             markdown_content = self._resolve_internal_links(markdown_content, self._build_post_mapping())
 
-            # Convert to HTML
+        # Convert to HTML
+        with self.profiler.stage('markdown'):
             html_content = self.convert_markdown_to_html(markdown_content)
 
-            # Fix image paths for posts (posts live in posts/, images in images/)
-            html_content = re.sub(r'src="images/', r'src="../images/', html_content)
+        # Fix image paths for posts (posts live in posts/, images in images/)
+        html_content = re.sub(r'src="images/', r'src="../images/', html_content)
 
-            # Extract metadata (or use extracted title)
+        # Extract metadata (or use extracted title)
+        with self.profiler.stage('metadata'):
             metadata = self.extract_metadata(html_content)
-            if title and title != "Untitled Post":
-                metadata['title'] = title
-            if date:
-                metadata['date'] = date
-
-            # Load template
-            template = self.load_template()
-            if not template:
-                return False
-
-            # Build final HTML
-            blog_post = template.replace("{{TITLE}}", metadata['title'])
-            blog_post = blog_post.replace("Post Title - Tufte-Style Blog", f"{metadata['title']} - Tufte-Style Blog")
-            blog_post = blog_post.replace("Your Post Title Here", metadata['title'])
-            blog_post = blog_post.replace("{{ARTICLE_DATE}}", metadata['date'] + f" · {metadata['reading_time']} min read")
-
-            # Inject KaTeX only when post has math (keeps other posts fast)
-            katex_snippet = '''  <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.css">
-  <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/katex.min.js"></script>
-  <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.9/dist/contrib/auto-render.min.js" crossorigin="anonymous"
-    onload="renderMathInElement(document.body, {delimiters: [{left: '$$', right: '$$', display: true}, {left: '\\\\[', right: '\\\\]', display: true}, {left: '\\\\(', right: '\\\\)', display: false}]});"></script>''' if has_math else ''
-            blog_post = blog_post.replace("{{MATH_SCRIPTS}}", katex_snippet)
-
-            # Replace content (escape backslashes so re.sub doesn't treat \s etc. in content as regex escapes)
-            content_section = f'<section class="content">\n{html_content.replace(chr(92), chr(92)*2)}\n</section>'
-            blog_post = re.sub(r'<section class="content">.*?</section>', content_section, blog_post, flags=re.DOTALL)
-
-            # Generate output filename (use original filename as base to avoid collisions)
-            base_name = markdown_file.stem  # Get filename without extension
-            safe_title = re.sub(r'[^\w\-]', '', metadata['title'].lower().replace(' ', '-'))
-            # If title is too short or would collide, use base filename
-            if len(safe_title) < 5:
-                safe_title = re.sub(r'[^\w\-]', '', base_name.lower())
-            # Limit length but keep it unique
-            safe_title = safe_title[:40]
-            output_file = self.posts_dir / f"{safe_title}.html"
+        if title and title != "Untitled Post":
+            metadata['title'] = title
+        if date:
+            metadata['date'] = date
+
+        # Load template
+        template = self.load_template()
+        if not template:
+            return None
+
+        # Inject KaTeX only when post has math (keeps other posts fast)
+        katex_snippet = KATEX_SNIPPET if has_math else ''
+
+        # Pre-rendered math only needs the stylesheet; anything left over still gets the runtime
+        if has_math and self.math_renderer:
+            with self.profiler.stage('math'):
+                html_content, math_errors = self.prerender_math(html_content)
+            if math_errors:
+                print(f"⚠️  Math left to the browser in {markdown_file.name}: {'; '.join(math_errors)}")
+            else:
+                katex_snippet = KATEX_CSS
+
+        article_html = html_content
+
+        # Posts linking here (from the link graph; not counted in the word count)
+        with self.profiler.stage('backlinks'):
+            html_content += self.render_backlinks(markdown_file)
+
+        # Build final HTML
+        with self.profiler.stage('template'):
+            blog_post = template.render(
+                TITLE=metadata['title'],
+                ARTICLE_DATE=metadata['date'] + f" · {metadata['reading_time']} min read",
+                MATH_SCRIPTS=katex_snippet,
+                CONTENT=html_content,
+            )
+            if self.fingerprint:
+                blog_post = assets.rewrite_references(blog_post, self.asset_map())
+
+        # Generate output filename (unique among the posts in content/, see assign_slugs)
+        safe_title = self.output_slug(markdown_file, metadata['title'])
+        output_file = self.posts_dir / f"{safe_title}.html"
+
+        record = PostRecord(
+            title=metadata['title'],
+            date=metadata['date'],
+            slug=safe_title,
+            url=f"posts/{safe_title}.html",
+            reading_time=metadata['reading_time'],
+            word_count=metadata['word_count'],
+            source_mtime=markdown_file.stat().st_mtime,
+            output_path=os.path.relpath(output_file, self.project_root),
+            text=metadata['text'],
+            html=article_html,
+        )
+        return blog_post, record
+
+    def build_post(self, markdown_file):
+        """Convert a single Markdown file to HTML. Returns a PostRecord, or None on failure."""
+
+        try:
+            print(f"📖 Processing: {markdown_file}")
+
+            rendered = self.render_post(markdown_file)
+            if rendered is None:
+                return None
+            blog_post, record = rendered
+            output_file = self.project_root / record.output_path
 
             # Ensure posts directory exists
             self.posts_dir.mkdir(exist_ok=True)
 
-            # Write file
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(blog_post)
+            # Write file (left untouched if the page came out the same)
+            with self.profiler.stage('write'):
+                written = self._write_page(output_file, blog_post)
 
-            print(f"✅ Generated: {output_file}")
-            return True
+            print(f"✅ Generated: {output_file}" if written else f"✅ Unchanged: {output_file}")
+
+            # The article alone, for the feeds (which only re-render posts that changed)
+            self._save_article(record)
+            return record
 
         except Exception as e:
             print(f"❌ Error processing {markdown_file}: {e}")
-            return False
+            return None
 
-    def build_all(self):
-        """Build all Markdown files in content directory"""
+    def _write_page(self, output_path, html):
+        """Write a generated page, optimized first when the build optimizes; True if its bytes changed."""
+        if self.optimizer is not None:
+            with self.profiler.stage('optimize'):
+                html = self.optimizer.page(output_path.relative_to(self.project_root).as_posix(), html)
+        return self.writer.write_text(output_path, html)
+
+    def _build_post_entry(self, md_file):
+        """Build one post and return its manifest entry, or None if the build failed.
+
+        The entry also carries the post's search terms under 'terms' and, when optimizing,
+        what the optimizer recorded for its page under 'optimized' (both taken out again
+        before the manifest is saved).
+        """
+        with self.profiler.post(md_file.name):
+            record = self.build_post(md_file)
+            if record is None:
+                return None
+
+            entry = self.load_catalog()[md_file.name]
+            with self.profiler.stage('terms'):
+                terms = search_index.term_counts(f"{record.title}\n{record.text}")
+            post_entry = {
+                'source': entry['hash'],
+                'content': hash_bytes(f"{record.title}\0{record.date}\0{record.html}".encode('utf-8')),
+                'links': self._resolved_links(entry),
+                'backlinks': self._backlinks(md_file.name),
+                'record': record.to_dict(),
+                'terms': terms,
+            }
+            if self.optimizer is not None:
+                post_entry['optimized'] = self.optimizer.take(record.output_path)
+            return post_entry
+
+    def _build_in_pool(self, stale, jobs):
+        """Build posts in a process pool; yield (md_file, manifest entry) in submission order.
+
+        Each worker's output is captured and printed as a block when its post is reached,
+        so progress stays in order. A failing or crashed worker only fails its own post.
+        """
+        critical_css = None if self.optimizer is None else self.optimizer.critical_limit is not None
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(self.engine, self.math_renderer, self.load_catalog(), self.asset_map(),
+                                           self.project_root, self.profiler.enabled, critical_css)) as pool:
+            futures = [pool.submit(_build_post_worker, md_file) for md_file in stale]
+            for md_file, future in zip(stale, futures):
+                try:
+                    log, post_entry, events, counts = future.result()
+                except Exception as e:
+                    log, post_entry, events, counts = f"❌ Error processing {md_file}: {e}\n", None, (), (0, 0)
+                sys.stdout.write(log)
+                self.writer.add(counts)
+                if events:
+                    self.profiler.events.extend(events)
+                yield md_file, post_entry
+
+    def build_all(self, force=False, jobs=1, compress=False, headers=False, optimize_output=False, dist=None,
+                  critical_css=False):
+        """Build all Markdown files in content directory whose inputs changed since the last build
+
+        jobs > 1 renders the stale posts in a process pool of that size.
+        compress also writes precompressed siblings of the site (see compress_outputs);
+        headers writes a _headers file marking fingerprinted assets immutable;
+        optimize_output minifies CSS and HTML as pages are written (see optimize.py), and
+        critical_css then also inlines each page's critical CSS where that is the smaller option;
+        dist syncs the finished site into that directory (see package).
+        """
 
         if not self.content_dir.exists():
             print(f"❌ Content directory not found: {self.content_dir}")
             return
 
         markdown_files = list(self.content_dir.glob("*.md"))
+        sources = {md_file.name: md_file for md_file in markdown_files}
 
         if not markdown_files:
             print(f"❌ No .md files found in {self.content_dir}")
             print("Add some Markdown files to get started!")
             return
 
-        print(f"🔄 Building {len(markdown_files)} posts...")
+        self.writer.take_counts()  # report this build's writes only
+        self.optimizer = (optimize.PageOptimizer(self.project_root, self.cache_dir / "optimize.json", critical_css)
+                          if optimize_output else None)
+        optimized = self.optimizer.signature if self.optimizer else False
+
+        # Charts first: they are assets the posts embed (and fingerprinting hashes)
+        with self.profiler.stage('charts'):
+            self.build_charts()
+
+        with self.profiler.stage('catalog'):
+            catalog = self.load_catalog()
+            missing = [md_file for name, md_file in sources.items() if name not in catalog]
+            if missing:
+                self.refresh_catalog(missing)
+        with self.profiler.stage('plan'):
+            manifest = self.load_manifest()
+            previous_outputs = (manifest['posts'], manifest.get('pages') or {})
+            self.report_slug_collisions()
+        with self.profiler.stage('graph'):
+            self.report_broken_links()
+            code_hash = self._code_hash()
+            template_hash = self._template_hash()
+            # Fingerprinted asset names appear in every page, so a changed asset makes them all stale
+            self._asset_map = None
+            asset_map = self.asset_map()
+        rebuild_all = (force or manifest['code'] != code_hash or manifest['template'] != template_hash
+                       or manifest.get('assets') != asset_map or manifest.get('optimized', False) != optimized)
+        previous = {} if rebuild_all else manifest['posts']
+
+        # Posts missing from the search index are rebuilt too, since that is where their terms come from
+        search = self.search_index()
+        candidates = None if rebuild_all else self._candidates
+        stale = [md_file for name, md_file in sources.items()
+                 if (candidates is None or name in candidates or name not in previous)
+                 and (self._needs_rebuild(name, catalog[name], previous.get(name)) or name not in search)]
+
+        if stale:
+            print(f"🔄 Building {len(stale)} of {len(markdown_files)} posts...")
 
         success_count = 0
-        posts_info = []
-        
-        for md_file in markdown_files:
-            if self.build_post(md_file):
-                success_count += 1
-                # Collect post info for index
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                title = self.extract_title_from_markdown(content)
-                date = self.extract_date_from_markdown(content)
-                html_content = self.convert_markdown_to_html(content)
-                metadata = self.extract_metadata(html_content)
-                if title:
-                    metadata['title'] = title
-                if date:
-                    metadata['date'] = date
-                
-                # Generate URL-safe filename (use original filename as base to avoid collisions)
-                base_name = md_file.stem  # Get filename without extension
-                safe_title = re.sub(r'[^\w\-]', '', metadata['title'].lower().replace(' ', '-'))
-                # If title is too short or would collide, use base filename
-                if len(safe_title) < 5:
-                    safe_title = re.sub(r'[^\w\-]', '', base_name.lower())
-                # Limit length but keep it unique
-                safe_title = safe_title[:40]
-                posts_info.append({
-                    'title': metadata['title'],
-                    'url': f"posts/{safe_title}.html",
-                    'date': metadata['date'],
-                    'reading_time': metadata['reading_time'],
-                    'file_mtime': md_file.stat().st_mtime
-                })
-
-        print(f"\n✅ Built {success_count}/{len(markdown_files)} posts")
-        
-        # Generate index page
-        self.build_index(posts_info)
-        print(f"📁 Check the {self.posts_dir} directory")
+        posts = {}
+        terms = {}
+        stale_names = {md_file.name for md_file in stale}
 
-    def build_index(self, posts_info):
-        """Generate index.html with list of all posts"""
-        
-        # Sort posts by displayed post date (newest first); fall back to file mtime if no/unknown date
-        def sort_key(post):
-            dt, _ = self.parse_post_date_for_sort(post['date'], post['file_mtime'])
-            return dt
-        posts_info.sort(key=sort_key, reverse=True)
-        
-        # Generate post list HTML
-        post_list_html = ""
-        for post in posts_info:
-            post_list_html += f'''      <div class="post-entry">
-        <h2><a href="{post['url']}">{post['title']}</a></h2>
-        <div class="article-meta">{post['date']} · {post['reading_time']} min read</div>
-      </div>
+        for name in sources:
+            if name not in stale_names:
+                posts[name] = previous[name]
 
-'''
-        
-        # Create index HTML
-        index_html = f'''<!DOCTYPE html>
-<html lang="sv">
-<head>
-  <meta charset="UTF-8">
-  <meta name="viewport" content="width=device-width, initial-scale=1.0">
-  <title>codexerrata</title>
-  <link rel="preconnect" href="https://fonts.googleapis.com">
-  <link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
-  <link rel="preload" href="https://fonts.googleapis.com/css2?family=Source+Serif+4:ital,opsz,wght@0,8..60,400;0,8..60,500;1,8..60,400;1,8..60,500&display=swap" as="style" onload="this.onload=null;this.rel='stylesheet'">
-  <noscript><link rel="stylesheet" href="https://fonts.googleapis.com/css2?family=Source+Serif+4:ital,opsz,wght@0,8..60,400;0,8..60,500;1,8..60,400;1,8..60,500&display=swap"></noscript>
-  <link rel="stylesheet" href="css/style.css">
-</head>
-<body>
-  <button id="theme-toggle" onclick="toggleTheme()">dark</button>
-  <script>
-    (function() {{
-      if (localStorage.getItem('theme') === 'dark') {{
-        document.documentElement.removeAttribute('data-theme');
-        document.addEventListener('DOMContentLoaded', function() {{
-          document.getElementById('theme-toggle').textContent = 'light';
-        }});
-      }} else {{
-        document.documentElement.setAttribute('data-theme', 'light');
-      }}
-    }})();
-    function toggleTheme() {{
-      var btn = document.getElementById('theme-toggle');
-      if (document.documentElement.getAttribute('data-theme') === 'light') {{
-        document.documentElement.removeAttribute('data-theme');
-        localStorage.setItem('theme', 'dark');
-        btn.textContent = 'light';
-      }} else {{
-        document.documentElement.setAttribute('data-theme', 'light');
-        localStorage.setItem('theme', 'light');
-        btn.textContent = 'dark';
-      }}
-    }}
-  </script>
-  <article>
-    <section class="content">
-      <h1 class="site-title">Codex <span class="errata">Errata</span></h1>
-      <p style="font-size: 1.4rem;">Moloch delenda est</p>
-
-      <hr style="width: 100%">
+        if jobs > 1 and len(stale) > 1:
+            results = self._build_in_pool(stale, jobs)
+        else:
+            results = ((md_file, self._build_post_entry(md_file)) for md_file in stale)
 
-{post_list_html}    </section>
-  </article>
+        for md_file, post_entry in results:
+            if post_entry is not None:
+                success_count += 1
+                terms[md_file.name] = post_entry.pop('terms')
+                if 'optimized' in post_entry:
+                    self.optimizer.add(post_entry['record']['output_path'], post_entry.pop('optimized'))
+                posts[md_file.name] = post_entry
 
-  <footer>
-  </footer>
-</body>
-</html>'''
-        
-        with open(self.project_root / 'index.html', 'w', encoding='utf-8') as f:
-            f.write(index_html)
-        
-        print("📄 Generated index.html")
-
-    def watch_and_build(self):
-        """Watch for changes and rebuild (basic implementation)"""
-        print("👀 Watching for changes... (Ctrl+C to stop)")
-        print("Add/edit .md files in content/ and run build.py again")
+        # Keep manifest (and index) order stable regardless of which posts were rebuilt
+        posts = {name: posts[name] for name in sources if name in posts}
 
-def main():
-    import sys
+        if stale:
+            print(f"\n✅ Built {success_count}/{len(stale)} posts")
+        else:
+            print(f"✨ All {len(markdown_files)} posts up to date")
+
+        # Generate index pages (records of unchanged posts come from the manifest)
+        records = [PostRecord.from_dict(dict(post['record'], source_mtime=catalog[name]['mtime']))
+                   for name, post in posts.items()]
+        previous_pages = None if rebuild_all else manifest.get('pages')
+        with self.profiler.stage('index'):
+            pages = self.build_index(records, previous_pages)
+
+        if self.base_url:
+            with self.profiler.stage('feeds'):
+                self.build_feeds(dict(zip(posts, records)), posts)
+
+        with self.profiler.stage('search'):
+            search_files = search.update({name: (posts[name]['record'], counts) for name, counts in terms.items()},
+                                         posts)
+        if search_files:
+            print(f"🔎 Updated search index ({search_files} files)")
+
+        manifest.update(code=code_hash, template=template_hash, assets=asset_map, optimized=optimized,
+                        posts=posts, pages=pages)
+        with self.profiler.stage('manifest'):
+            self.save_manifest(manifest)
+        with self.profiler.stage('prune'):
+            self.prune_outputs(*previous_outputs, posts, pages)
+        # Everything is in line with the catalog now; later refreshes name what to check
+        self._candidates = set()
+
+        if optimize_output:
+            outputs = [post['record']['output_path'] for post in posts.values()] + list(pages)
+            with self.profiler.stage('optimize'):
+                stylesheet = self.optimize_outputs(outputs)
+            if asset_map is not None:
+                asset_map = dict(asset_map, **{optimize.MINIFIED: stylesheet})
+
+        if asset_map is not None:
+            assets.write_manifest(self.project_root / "asset-manifest.json", asset_map, self.writer)
+            if headers:
+                assets.write_headers(self.project_root / "_headers", asset_map, self.writer)
+
+        if compress:
+            with self.profiler.stage('compress'):
+                self.compress_outputs(manifest, jobs)
+        print(f"💾 {self.writer.summary()}")
+        if dist:
+            with self.profiler.stage('package'):
+                self.package(manifest, dist)
+        print(f"📁 Check the {self.posts_dir} directory")
 
-    builder = BlogBuilder()
+    def plan_index_pages(self, records):
+        """Lay out index.html, page/N.html and archive/<year>.html for a list of PostRecords
 
-    if len(sys.argv) > 1:
-        if sys.argv[1] == 'watch':
-            builder.watch_and_build()
+        Returns {path: (template values, posts on the page)} with paths relative to the
+        project root; nothing is rendered yet.
+        """
+        # Sort posts by displayed post date (newest first); fall back to file mtime if no/unknown date
+        dated = sorted(((self.parse_post_date_for_sort(post.date, post.source_mtime)[0], post) for post in records),
+                       key=lambda item: item[0], reverse=True)
+        posts = [post for _, post in dated]
+
+        size = self.page_size or len(posts) or 1
+        page_count = max(1, -(-len(posts) // size))
+        page_paths = ['index.html'] + [f'page/{number}.html' for number in range(2, page_count + 1)]
+
+        years = {}
+        for dt, post in dated:
+            years.setdefault(dt.year, []).append(post)
+
+        def archive_links(root, current=None):
+            links = ' · '.join(str(year) if year == current else f'<a href="{root}archive/{year}.html">{year}</a>'
+                               for year in years)
+            return ARCHIVE_LINKS_TEMPLATE.render(YEARS=links)
+
+        def feed_links(root):
+            if not self.base_url:
+                return ''
+            return ''.join(f'\n  <link rel="alternate" type="application/{kind}+xml" title="{SITE_TITLE}" href="{root}{path}">'
+                           for kind, path in (('atom', feeds.ATOM_PATH), ('rss', feeds.RSS_PATH)))
+
+        pages = {}
+        for number, path in enumerate(page_paths, 1):
+            root = '' if number == 1 else '../'
+            nav = ''
+            if page_count > 1:
+                links = []
+                if number > 1:
+                    links.append(f'        <a href="{root}{page_paths[number - 2]}">← Newer</a>\n')
+                links.append(f'        <span>Page {number} of {page_count}</span>\n')
+                if number < page_count:
+                    links.append(f'        <a href="{root}{page_paths[number]}">Older →</a>\n')
+                nav = PAGE_NAV_TEMPLATE.render(LINKS=''.join(links), ARCHIVES=archive_links(root))
+            values = dict(PAGE_TITLE=SITE_TITLE if number == 1 else f'{SITE_TITLE} · page {number}',
+                          ROOT=root, HEADING='', PAGE_NAV=nav, FEED_LINKS=feed_links(root))
+            pages[path] = (values, posts[(number - 1) * size:number * size])
+
+        for year, year_posts in years.items():
+            nav = PAGE_NAV_TEMPLATE.render(LINKS='        <a href="../index.html">← Latest posts</a>\n',
+                                           ARCHIVES=archive_links('../', year))
+            values = dict(PAGE_TITLE=f'{year} · {SITE_TITLE}', ROOT='../',
+                          HEADING=f'      <h2>{year}</h2>\n\n', PAGE_NAV=nav, FEED_LINKS=feed_links('../'))
+            pages[f'archive/{year}.html'] = (values, year_posts)
+        return pages
+
+    def render_index_page(self, values, posts):
+        """Render one planned index or archive page"""
+        post_list_html = ''.join(POST_ENTRY_TEMPLATE.render(
+            URL=values['ROOT'] + post.url, TITLE=post.title, META=f"{post.date} · {post.reading_time} min read"
+        ) for post in posts)
+        page = INDEX_TEMPLATE.render(POST_LIST=post_list_html, **values)
+        return assets.rewrite_references(page, self.asset_map()) if self.fingerprint else page
+
+    def render_index(self, records, path='index.html'):
+        """Render the index page (or another page from plan_index_pages) in memory; None if there is no such page"""
+        page = self.plan_index_pages(records).get(path)
+        return self.render_index_page(*page) if page else None
+
+    def _index_page_hash(self, path, values, posts):
+        """Hash of what a page shows: its navigation and the entries on it (kept per page between builds)."""
+        entries = [[post.url, post.title, post.date, post.reading_time] for post in posts]
+        known = self._page_hashes.get(path)
+        if known is None or known[0] != values or known[1] != entries:
+            known = (values, entries, hash_bytes(json.dumps([values, entries], ensure_ascii=False).encode('utf-8')))
+            self._page_hashes[path] = known
+        return known[2]
+
+    def build_index(self, records, previous_pages=None):
+        """Generate index.html, page/N.html and archive/<year>.html (from PostRecords)
+
+        previous_pages maps the pages of the last build to their hashes: pages whose membership
+        is unchanged are not rendered again (prune_outputs removes pages no longer needed).
+        Returns the new map for the build manifest.
+        """
+        previous_pages = previous_pages or {}
+        pages = {}
+        written = []
+        for path, (values, posts) in self.plan_index_pages(records).items():
+            pages[path] = self._index_page_hash(path, values, posts)
+            output_path = self.project_root / path
+            if previous_pages.get(path) == pages[path] and output_path.exists():
+                continue
+            output_path.parent.mkdir(exist_ok=True)
+            if self._write_page(output_path, self.render_index_page(values, posts)):
+                written.append(path)
+
+        if len(written) > 3:
+            print(f"📄 Generated {len(written)} index and archive pages")
+        elif written:
+            print(f"📄 Generated {', '.join(written)}")
+        return pages
+
+    def report_slug_collisions(self):
+        slugs, collisions = self.assign_slugs()
+        for slug, names in collisions:
+            renamed = ', '.join(f"{name} → posts/{slugs[name]}.html" for name in names[1:])
+            print(f"⚠️  Slug collision on posts/{slug}.html: kept for {names[0]}; {renamed}")
+
+    def _output_files(self, rel):
+        """A generated file and its compressed siblings."""
+        return [self.project_root / rel] + [self.project_root / f"{rel}.{fmt}" for fmt in ('gz', 'br')]
+
+    def _remove_output(self, rel, dry_run=False):
+        """Delete a generated file and its compressed siblings; returns the bytes freed."""
+        freed = 0
+        for path in self._output_files(rel):
+            if path.is_file():
+                freed += path.stat().st_size
+                if not dry_run:
+                    path.unlink()
+        return freed
+
+    def prune_outputs(self, previous_posts, previous_pages, posts, pages):
+        """Delete pages the previous build wrote that no post or index page produces any more
+
+        previous_posts and previous_pages come from the last manifest, so only files this
+        build tracked are touched (see collect_garbage for everything else in posts/).
+        """
+        live = {post['record']['output_path'] for post in posts.values()} | set(pages)
+        catalog = self.load_catalog()
+        for name, previous in previous_posts.items():
+            rel = previous['record']['output_path']
+            if rel in live or (name in catalog and name not in posts):
+                continue  # still produced, or its post failed to build and keeps the last good page
+            if not any(path.is_file() for path in self._output_files(rel)):
+                continue
+            self._remove_output(rel)
+            if name in posts:
+                print(f"🗑️  Removed {rel} ({name} now builds {posts[name]['record']['output_path']})")
+            else:
+                print(f"🗑️  Removed {rel} ({name} was deleted)")
+        for rel in sorted(previous_pages.keys() - live):
+            if any(path.is_file() for path in self._output_files(rel)):
+                self._remove_output(rel)
+                print(f"🗑️  Removed {rel}")
+
+    def collect_garbage(self, dry_run=False):
+        """Delete every page in posts/, page/ and archive/ that no current source or index page produces
+
+        Catches what prune_outputs cannot: pages from before the manifest tracked outputs,
+        from other build versions or from hand copies. dry_run only lists them.
+        """
+        self.report_slug_collisions()
+        live = {f"posts/{slug}.html" for slug in self.assign_slugs()[0].values()}
+        live.add(self.template_path.relative_to(self.project_root).as_posix())
+        candidates = list(self.posts_dir.glob('*.html*'))
+        pages = self.load_manifest().get('pages')
+        if pages:
+            live |= set(pages)
+            for directory in ('page', 'archive'):
+                candidates += (self.project_root / directory).glob('*.html*')
+        else:
+            print("⚠️  No index pages in the build manifest (run a build first); leaving page/ and archive/ alone")
+
+        orphans = set()
+        for path in candidates:
+            rel = path.relative_to(self.project_root).as_posix()
+            base = rel.removesuffix('.gz').removesuffix('.br')
+            if base.endswith('.html') and base not in live:
+                orphans.add(base)
+
+        freed = 0
+        for rel in sorted(orphans):
+            freed += self._remove_output(rel, dry_run)
+            print(f"🗑️  {'Would remove' if dry_run else 'Removed'} {rel}")
+        if dry_run:
+            print(f"🧹 {len(orphans)} orphaned outputs ({freed / 1024:.1f} KB) would be removed (dry run)")
         else:
+            print(f"🧹 Removed {len(orphans)} orphaned outputs ({freed / 1024:.1f} KB)")
+        return sorted(orphans)
+
+    def _save_article(self, record):
+        path = self.feed_cache_dir / f"{record.slug}.html"
+        data = record.html.encode('utf-8')
+        if not outputs.same_contents(path, data):
+            self.feed_cache_dir.mkdir(parents=True, exist_ok=True)
+            outputs.replace_file(path, data)
+
+    def _load_article(self, name, record):
+        """Article HTML of a built post, from the feed cache (re-rendered if it is missing)"""
+        try:
+            return (self.feed_cache_dir / f"{record.slug}.html").read_text(encoding='utf-8')
+        except FileNotFoundError:
+            rendered = self.render_post(self.content_dir / name)
+            if rendered is None:
+                return ''
+            self._save_article(rendered[1])
+            return rendered[1].html
+
+    def build_feeds(self, records, posts):
+        """Write feed.xml (Atom), rss.xml and sitemap.xml for the PostRecords in records (by source name)
+
+        The latest feed_size posts go into the feeds with their full content. Updated/lastmod
+        times come from the posts' content hashes (see feeds.LastModified), never from the clock.
+        """
+        lastmod = feeds.LastModified(self.cache_dir / "lastmod.json")
+        dated = sorted(((self.parse_post_date_for_sort(record.date, record.source_mtime)[0], name, record)
+                        for name, record in records.items()), key=lambda item: item[0], reverse=True)
+        updated = {name: lastmod.get(name, posts[name].get('content', posts[name]['source']), published,
+                                     record.source_mtime)
+                   for published, name, record in dated}
+        lastmod.save(records)
+
+        entries = []
+        for published, name, record in dated[:self.feed_size]:
+            url = self.base_url + record.url
+            entries.append(feeds.FeedEntry(url=url, title=record.title, published=feeds.utc(published),
+                                           updated=updated[name],
+                                           content=feeds.absolutize(self._load_article(name, record), url)))
+
+        urls = []
+        page_names = {record.url: name for name, record in records.items()}
+        for path, (_, page_posts) in self.plan_index_pages(list(records.values())).items():
+            modified = max((updated[page_names[post.url]] for post in page_posts), default=None)
+            urls.append((self.base_url if path == 'index.html' else self.base_url + path, modified))
+        urls += [(self.base_url + record.url, updated[name]) for _, name, record in dated]
+
+        written = []
+        for path, text in ((feeds.ATOM_PATH, feeds.atom_feed(SITE_TITLE, self.base_url, entries)),
+                           (feeds.RSS_PATH, feeds.rss_feed(SITE_TITLE, self.base_url, entries)),
+                           (feeds.SITEMAP_PATH, feeds.sitemap(urls))):
+            if self.writer.write_text(self.project_root / path, text):
+                written.append(path)
+        if written:
+            print(f"📰 Updated {', '.join(written)}")
+
+        # Articles of posts that are gone
+        live = {f"{record.slug}.html" for record in records.values()}
+        for path in self.feed_cache_dir.glob('*.html'):
+            if path.name not in live:
+                path.unlink()
+
+    def build_charts(self):
+        """Render the chart specs (content/*.chart.json) whose spec, data or renderer changed"""
+        rendered, errors = charts.build_charts(self.content_dir, self.project_root, self.cache_dir / "charts.json",
+                                               self.writer)
+        for spec_path, output in rendered:
+            print(f"📊 {spec_path.name} → {output.relative_to(self.project_root)}")
+        for spec_path, error in errors:
+            print(f"❌ Chart {spec_path.name}: {error}")
+
+    def optimize_outputs(self, outputs):
+        """Write the minified stylesheet for the site's pages (paths relative to the project root) and
+        report the pages this build optimized; returns the path pages link the minified stylesheet by."""
+        fingerprint = (lambda rel: assets.fingerprint_file(self.project_root, rel)) if self.fingerprint else None
+        report, stylesheet, css_saved = self.optimizer.finish(outputs, fingerprint, self.writer)
+        for path, before, after, inlined in report:
+            critical = f", critical CSS +{inlined:,}" if inlined else ""
+            print(f"🪶 {path}: {before:,} → {after:,} bytes (markup {after - inlined - before:+,}{critical})")
+        if report:
+            saved = sum(before - (after - inlined) for _, before, after, inlined in report)
+            print(f"🪶 Optimized {len(report)} pages ({saved / 1024:.1f} KB saved on markup); "
+                  f"{stylesheet} is {css_saved / 1024:.1f} KB smaller than {optimize.STYLESHEET}")
+        return stylesheet
+
+    def compress_outputs(self, manifest, jobs=1):
+        """Write .gz (and .br, if the brotli module is installed) siblings of every changed deployable file
+        (the pages in the build manifest and the static files), and delete siblings of anything else"""
+        compressed, total, saved_gz, saved_br, removed = compression.compress_site(
+            self.project_root, manifest, self.cache_dir / "compressed.json", jobs, self.writer)
+        saved = f"{saved_gz / 1024:.1f} KB saved by gzip"
+        if compression.brotli is not None:
+            saved += f", {saved_br / 1024:.1f} KB by brotli"
+        print(f"🗜️  Compressed {compressed} of {total} files ({saved})")
+        if removed:
+            print(f"🗑️  Removed {removed} stale compressed files")
+
+    def package(self, manifest, dist_dir):
+        """Sync the deployable site into dist_dir and write the deploy diff to .build-cache/deploy-diff.json"""
+        dist_dir = self.project_root / dist_dir
+        diff_path = self.cache_dir / "deploy-diff.json"
+        try:
+            diff = deploy.package_site(self.project_root, manifest, dist_dir, diff_path)
+        except ValueError as e:
+            print(f"❌ Not packaging into {dist_dir}: {e}")
+            return
+        for kind, symbol in (('added', '+'), ('changed', '~'), ('removed', '-')):
+            for path in diff[kind][:10]:
+                print(f"   {symbol} {path}")
+            if len(diff[kind]) > 10:
+                print(f"   {symbol} ... and {len(diff[kind]) - 10} more")
+        copied = f", {diff['copied']} copied instead of hardlinked" if diff['copied'] else ""
+        print(f"📦 {dist_dir.name}/: {len(diff['added'])} added, {len(diff['changed'])} changed, "
+              f"{len(diff['removed'])} removed, {diff['unchanged']} unchanged{copied} "
+              f"(diff in {diff_path.relative_to(self.project_root)})")
+
+    def check_engine_parity(self):
+        """Convert every post with both Markdown engines and report any difference. Returns True if all match."""
+        mismatches = 0
+        markdown_files = sorted(self.content_dir.glob("*.md"))
+        for md_file in markdown_files:
+            with open(md_file, 'r', encoding='utf-8') as f:
+                markdown_content = self._resolve_internal_links(f.read(), self._build_post_mapping())
+            expected = BlogBuilder('regex').convert_markdown_to_html(markdown_content)
+            actual = markdown_engine.convert(markdown_content)
+            if actual == expected:
+                print(f"✅ {md_file.name}")
+                continue
+            mismatches += 1
+            expected_lines, actual_lines = expected.split('\n'), actual.split('\n')
+            line_no = next((i for i, (a, b) in enumerate(zip(expected_lines, actual_lines)) if a != b),
+                           min(len(expected_lines), len(actual_lines)))
+            print(f"❌ {md_file.name}: output differs at line {line_no + 1}")
+            print(f"   regex:  {expected_lines[line_no][:120] if line_no < len(expected_lines) else '<end>'}")
+            print(f"   tokens: {actual_lines[line_no][:120] if line_no < len(actual_lines) else '<end>'}")
+
+        print(f"\n{len(markdown_files) - mismatches}/{len(markdown_files)} posts identical")
+        return mismatches == 0
+
+    def watch_and_build(self, jobs=1, polling=False):
+        """Watch content, template and assets; rebuild affected posts after each burst of changes.
+
+        The catalog, manifest, link graph, search shards and compiled template stay in memory
+        between rebuilds; only the changed sources are re-read, only the posts they affect are
+        checked (see refresh_catalog), and the catalog and manifest are written when watching stops.
+        """
+        targets = [self.content_dir, self.template_path,
+                   self.project_root / 'css', self.project_root / 'js', self.project_root / 'images']
+        watch = watcher.create_watcher(targets, polling=polling)
+        self.build_all(jobs=jobs)
+        self.defer_saves = True
+        print(f"👀 Watching for changes ({watch.name})... (Ctrl+C to stop)")
+
+        try:
+            while True:
+                changed = watcher.wait_for_changes(watch)
+                started = time.perf_counter()
+
+                sources = [path for path in changed
+                           if path.parent == self.content_dir and path.suffix == '.md']
+                if sources:
+                    self.refresh_catalog(sources)
+                # Anything else in content/ may be a chart spec or its data
+                chart_inputs = [path for path in changed
+                                if path.parent == self.content_dir and path.suffix != '.md']
+                if chart_inputs and not sources:
+                    self.build_charts()
+                # Fingerprinted copies are written by the build itself
+                changed_assets = [path for path in sorted(changed)
+                                  if path.parent.name in ('css', 'js', 'images') and not assets.is_fingerprinted(path)]
+                if sources or self.template_path in changed or (self.fingerprint and changed_assets):
+                    self.build_all(jobs=jobs)
+
+                for path in changed_assets:
+                    print(f"🎨 Asset changed: {path.relative_to(self.project_root)}")
+
+                print(f"⏱️  Rebuilt in {(time.perf_counter() - started) * 1000:.0f} ms")
+        except KeyboardInterrupt:
+            print("\n👋 Stopped watching")
+        finally:
+            watch.close()
+            self.defer_saves = False
+            self.flush_caches()
+
+_worker_builder = None
+
+
+def _init_worker(engine, math_renderer, catalog, asset_map, project_root, profile, critical_css):
+    """Process pool initializer: one BlogBuilder per worker, sharing the parent's catalog and asset names.
+
+    critical_css is None unless the build optimizes its pages.
+    """
+    global _worker_builder
+    _worker_builder = BlogBuilder(engine, math_renderer=math_renderer, fingerprint=asset_map is not None,
+                                  project_root=project_root)
+    if profile:
+        _worker_builder.profiler = profiling.Profiler()
+    _worker_builder._catalog = catalog
+    _worker_builder._asset_map = asset_map
+    if critical_css is not None:
+        _worker_builder.optimizer = optimize.PageOptimizer(_worker_builder.project_root,
+                                                           _worker_builder.cache_dir / "optimize.json", critical_css)
+
+
+def _build_post_worker(md_file):
+    """Build one post in a worker process.
+
+    Returns (captured output, manifest entry, profiler events, (files written, unchanged)).
+    """
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        try:
+            post_entry = _worker_builder._build_post_entry(md_file)
+        except Exception as e:
+            print(f"❌ Error processing {md_file}: {e}")
+            post_entry = None
+    return buffer.getvalue(), post_entry, _worker_builder.profiler.take_events(), _worker_builder.writer.take_counts()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert Markdown files from content/ to HTML pages")
+    parser.add_argument('target', nargs='?',
+                        help="'watch', 'serve', 'parity', 'gc', or a single Markdown file to build (default: build all)")
+    parser.add_argument('--force', action='store_true',
+                        help="rebuild every post regardless of the build manifest")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="render posts in N worker processes (0 = one per CPU core)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="gc: list the orphaned outputs without deleting them")
+    parser.add_argument('--poll', action='store_true',
+                        help="watch by polling mtimes instead of inotify")
+    parser.add_argument('--host', default='127.0.0.1', help="serve: address to listen on")
+    parser.add_argument('--port', type=int, default=8000, help="serve: port to listen on")
+    parser.add_argument('--compress', action='store_true',
+                        help="also write .gz (and .br with the brotli module) siblings of the generated site")
+    parser.add_argument('--prerender-math', nargs='?', const=math_render.DEFAULT_COMMAND, metavar='COMMAND',
+                        help=f"render math at build time with a local renderer (default: {math_render.DEFAULT_COMMAND})")
+    parser.add_argument('--fingerprint', action='store_true',
+                        help="reference css/, js/ and images/ assets by content-hashed file names")
+    parser.add_argument('--headers', action='store_true',
+                        help="with --fingerprint, also write a _headers file marking those assets immutable")
+    parser.add_argument('--optimize', action='store_true',
+                        help="minify CSS and HTML and drop unused CSS rules")
+    parser.add_argument('--critical-css', action='store_true',
+                        help="with --optimize, inline each page's critical CSS where it is smaller than the stylesheet")
+    parser.add_argument('--dist', nargs='?', const='dist', metavar='DIR',
+                        help="after building, sync the deployable site into DIR (default dist/) and write a deploy diff")
+    parser.add_argument('--base-url', metavar='URL',
+                        help="public URL of the site, e.g. https://example.org/; enables feed.xml, rss.xml and sitemap.xml")
+    parser.add_argument('--feed-size', type=int, default=BlogBuilder.FEED_SIZE,
+                        help=f"latest posts (with full content) in the feeds (default {BlogBuilder.FEED_SIZE})")
+    parser.add_argument('--page-size', type=int, default=BlogBuilder.PAGE_SIZE,
+                        help=f"posts per index page (default {BlogBuilder.PAGE_SIZE}, 0 = all on index.html)")
+    parser.add_argument('--engine', choices=BlogBuilder.ENGINES, default='regex',
+                        help="Markdown engine: the original regex converter or the token engine")
+    parser.add_argument('--profile', nargs='?', type=int, const=10, metavar='N',
+                        help="time every build stage and print the N slowest stages and posts (default 10)")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="with --profile (implied), also write a Chrome trace-event JSON of the build")
+    args = parser.parse_args()
+
+    builder = BlogBuilder(args.engine, page_size=args.page_size, math_renderer=args.prerender_math,
+                          fingerprint=args.fingerprint, base_url=args.base_url, feed_size=args.feed_size)
+    if args.profile is not None or args.trace:
+        builder.profiler = profiling.Profiler()
+
+    jobs = args.jobs or os.cpu_count() or 1
+
+    try:
+        if args.target == 'watch':
+            builder.watch_and_build(jobs=jobs, polling=args.poll)
+        elif args.target == 'serve':
+            # Render from content/ in memory with live reload (nothing is written to posts/)
+            import preview_server
+            preview_server.serve(builder, host=args.host, port=args.port, polling=args.poll)
+        elif args.target == 'gc':
+            # Remove generated pages that no source in content/ produces any more
+            builder.collect_garbage(dry_run=args.dry_run)
+        elif args.target == 'parity':
+            # Compare the two Markdown engines on every post in content/
+            sys.exit(0 if builder.check_engine_parity() else 1)
+        elif args.target:
             # Build specific file
-            md_file = Path(sys.argv[1])
+            md_file = Path(args.target)
             if md_file.exists():
-                builder.build_post(md_file)
+                with builder.profiler.post(md_file.name):
+                    builder.build_post(md_file)
             else:
                 print(f"❌ File not found: {md_file}")
-    else:
-        # Build all
-        builder.build_all()
+        else:
+            # Build all
+            builder.build_all(force=args.force, jobs=jobs, compress=args.compress, headers=args.headers,
+                              optimize_output=args.optimize, dist=args.dist,
+                              critical_css=args.critical_css)
+
+        if builder.profiler.enabled:
+            builder.profiler.report(args.profile or 10)
+            if args.trace:
+                builder.profiler.write_trace(args.trace)
+                print(f"📈 Trace written to {args.trace} (open it in ui.perfetto.dev or chrome://tracing)")
+    finally:
+        builder.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Data-driven SVG charts for the Tufte Blog Builder
+
+A chart is declared next to the post that shows it: content/<name>.chart.json
+names a CSV or JSON data file (relative to the spec) plus the chart type and
+any style overrides, and is rendered to images/<name>.svg, which the post
+embeds like any other image:
+
+    {"data": "budget-chart.csv", "type": "bar", "height": 700, "label_angle": -52}
+
+Types are "bar" (grouped), "stacked" and "line". The value axis is scaled to
+round tick steps automatically. The SVG is kept small: colors and fonts live
+in one <style> block, grid lines and tick marks are shared <defs> placed with
+<use>, each bar series is a single path, and coordinates are rounded.
+
+CSV data has the category labels in the first column and one column per
+series, with series names in the header row. JSON data is either a list of
+such rows as objects or {"categories": [...], "series": {name: [values]}}.
+
+build_charts() regenerates a chart only when its spec, its data or this
+module changed (hashes are kept in the build cache).
+"""
+
+import csv
+import functools
+import hashlib
+import html
+import json
+import math
+from pathlib import Path
+
+import outputs
+
+SPEC_SUFFIX = '.chart.json'
+CHART_TYPES = ('bar', 'stacked', 'line')
+
+DEFAULT_STYLE = {
+    'width': 800,
+    'height': 400,
+    'margin': [40, 20, 70, 90],  # top, right, bottom, left
+    'colors': ['#d4d4d4', '#565656', '#8c8c8c', '#b0b0b0', '#3c3c3c'],
+    'axis_color': '#606060',
+    'grid_color': '#2a2a2a',
+    'text_color': '#a8a8a8',
+    'font': '"Courier New", Courier, monospace',
+    'font_size': 10,
+    'label_size': 9,
+    'legend_size': 14,
+    'label_angle': 0,
+    'ticks': 8,
+    'zero': True,     # always include 0 on the value axis
+    'legend': True,
+    'precision': 1,   # decimals kept in coordinates
+}
+
+SUFFIXES = ((1e12, 'T'), (1e9, 'G'), (1e6, 'M'), (1e3, 'k'))
+
+
+class ChartError(Exception):
+    pass
+
+
+def _reports_malformed_input(function):
+    """Turn the KeyError/TypeError/IndexError of a spec or data file of the wrong shape (a row
+    without its label, a number where a list belongs, ...) into a ChartError."""
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        try:
+            return function(*args, **kwargs)
+        except (KeyError, TypeError, IndexError) as e:
+            raise ChartError(f"malformed chart spec or data ({type(e).__name__}: {e})") from e
+    return wrapper
+
+
+# --- Data ---
+
+def _number(value, where):
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace('\u2212', '-').replace('\u00a0', '').replace(' ', ''))
+    except ValueError:
+        raise ChartError(f"{where}: not a number: {value!r}") from None
+
+
+@_reports_malformed_input
+def load_data(path):
+    """Read a CSV or JSON data file into (categories, [(series name, values)])."""
+    path = Path(path)
+    if path.suffix == '.json':
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            categories = [str(c) for c in data.get('categories', [])]
+            series = [(name, [_number(v, f"{path.name}: {name}") for v in values])
+                      for name, values in data.get('series', {}).items()]
+        else:
+            if not data:
+                raise ChartError(f"{path.name}: no rows")
+            label, *names = list(data[0])
+            categories = [str(row[label]) for row in data]
+            series = [(name, [_number(row.get(name, 0), f"{path.name}: {name}") for row in data])
+                      for name in names]
+    else:
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = [row for row in csv.reader(f) if row and any(cell.strip() for cell in row)]
+        if len(rows) < 2:
+            raise ChartError(f"{path.name}: needs a header row and at least one data row")
+        header, rows = rows[0], rows[1:]
+        categories = [row[0].strip() for row in rows]
+        series = [(name.strip(), [_number(row[i] if i < len(row) else 0, f"{path.name}: {name.strip()}")
+                                  for row in rows])
+                  for i, name in enumerate(header[1:], start=1)]
+
+    if not categories or not series:
+        raise ChartError(f"{path.name}: no categories or series")
+    for name, values in series:
+        if len(values) != len(categories):
+            raise ChartError(f"{path.name}: series {name!r} has {len(values)} values for {len(categories)} categories")
+    return categories, series
+
+
+# --- Scaling ---
+
+def nice_number(value, round_result):
+    """A 1, 2, 5 or 10 times a power of ten close to value (Heckbert's nice numbers)."""
+    exponent = math.floor(math.log10(value))
+    fraction = value / 10 ** exponent
+    if round_result:
+        nice = 1 if fraction < 1.5 else 2 if fraction < 3 else 5 if fraction < 7 else 10
+    else:
+        nice = 1 if fraction <= 1 else 2 if fraction <= 2 else 5 if fraction <= 5 else 10
+    return nice * 10 ** exponent
+
+
+def nice_scale(low, high, ticks=8):
+    """Axis (low, high, step) covering [low, high] with about ticks round-numbered ticks."""
+    if high <= low:
+        high = low + (abs(low) or 1)
+    step = nice_number(nice_number(high - low, False) / max(1, ticks - 1), True)
+    return math.floor(low / step) * step, math.ceil(high / step) * step, step
+
+
+def tick_label(value, scale):
+    """Format a tick value with the suffix (k, M, ...) suited to the axis scale."""
+    for factor, suffix in SUFFIXES:
+        if scale >= factor:
+            value /= factor
+            break
+    else:
+        suffix = ''
+    return f"{value:.{_decimals(value)}f}{suffix}".replace('-', '−')
+
+
+def _decimals(value):
+    for decimals in range(3):
+        if abs(value - round(value, decimals)) < 1e-9:
+            return decimals
+    return 3
+
+
+# --- Rendering ---
+
+class _Writer:
+    """Number formatting shared by the renderers: rounded, no trailing zeros."""
+
+    def __init__(self, precision):
+        self.precision = precision
+
+    def n(self, value):
+        text = f"{value:.{self.precision}f}" if self.precision else str(round(value))
+        if '.' in text:
+            text = text.rstrip('0').rstrip('.')
+        return '0' if text == '-0' else text
+
+
+@_reports_malformed_input
+def render_chart(spec, categories, series):
+    """Render a chart spec (type and style keys) for the data as SVG text."""
+    style = dict(DEFAULT_STYLE, **{key: value for key, value in spec.items() if key in DEFAULT_STYLE})
+    kind = spec.get('type', 'bar')
+    if kind not in CHART_TYPES:
+        raise ChartError(f"unknown chart type {kind!r} (expected one of {', '.join(CHART_TYPES)})")
+    wanted = spec.get('series')
+    if wanted:
+        named = dict(series)
+        missing = [name for name in wanted if name not in named]
+        if missing:
+            raise ChartError(f"unknown series: {', '.join(missing)}")
+        series = [(name, named[name]) for name in wanted]
+
+    w = _Writer(style['precision'])
+    width, height = style['width'], style['height']
+    top, right, bottom, left = style['margin']
+    x0, x1, y0, y1 = left, width - right, height - bottom, top  # plot area; y grows downwards
+
+    if kind == 'stacked':
+        positive = [sum(max(0, values[i]) for _, values in series) for i in range(len(categories))]
+        negative = [sum(min(0, values[i]) for _, values in series) for i in range(len(categories))]
+        low, high = min(negative), max(positive)
+    else:
+        low = min(min(values) for _, values in series)
+        high = max(max(values) for _, values in series)
+    if style['zero'] or kind != 'line':
+        low, high = min(low, 0), max(high, 0)
+    low, high, step = nice_scale(low, high, style['ticks'])
+
+    def y(value):
+        return y0 - (value - low) / (high - low) * (y0 - y1)
+
+    colors = style['colors']
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+           f'viewBox="0 0 {width} {height}">']
+    if spec.get('title'):
+        out.append(f'<title>{html.escape(spec["title"])}</title>')
+    css = [f'text{{font-family:{style["font"]};fill:{style["text_color"]};font-size:{style["font_size"]}px}}',
+           f'.g{{stroke:{style["grid_color"]}}}',
+           f'.a{{stroke:{style["axis_color"]}}}',
+           f'.c{{font-size:{style["label_size"]}px}}',
+           f'.l{{font-size:{style["legend_size"]}px}}',
+           '.y{text-anchor:end}']
+    for i in range(len(series)):
+        color = colors[i % len(colors)]
+        if kind == 'line':
+            css.append(f'.s{i}{{stroke:{color};fill:none}}.m{i}{{fill:{color}}}')
+        else:
+            css.append(f'.s{i}{{fill:{color}}}')
+    out.append('<defs><style>' + ''.join(css) + '</style>')
+    out.append(f'<path id="g" class="g" d="M{w.n(x0)} 0H{w.n(x1)}"/>')
+    out.append('<path id="t" class="a" d="M0 0v4"/>')
+    if kind == 'line':
+        out.append('<circle id="p" r="3"/>')
+    out.append('</defs>')
+
+    # Grid lines and value labels
+    count = round((high - low) / step)
+    scale = max(abs(low), abs(high))
+    for i in range(count + 1):
+        value = low + i * step
+        out.append(f'<use href="#g" y="{w.n(y(value))}"/>')
+        out.append(f'<text class="y" x="{w.n(x0 - 6)}" y="{w.n(y(value) + 4)}">{tick_label(value, scale)}</text>')
+
+    # Data
+    n = len(categories)
+    group = (x1 - x0) / n
+    if kind == 'line':
+        for s, (_, values) in enumerate(series):
+            points = ' '.join(f"{w.n(x0 + (i + 0.5) * group)},{w.n(y(v))}" for i, v in enumerate(values))
+            out.append(f'<polyline class="s{s}" points="{points}"/>')
+            out.extend(f'<use href="#p" class="m{s}" x="{w.n(x0 + (i + 0.5) * group)}" y="{w.n(y(v))}"/>'
+                       for i, v in enumerate(values))
+    else:
+        k = 1 if kind == 'stacked' else len(series)
+        bar = group * 0.76 / k
+        gap = group * 0.05 if k > 1 else 0
+        pad = (group - k * bar - (k - 1) * gap) / 2
+        base_pos = [0.0] * n
+        base_neg = [0.0] * n
+        for s, (_, values) in enumerate(series):
+            path = []
+            for i, v in enumerate(values):
+                if kind == 'stacked':
+                    base = base_pos if v >= 0 else base_neg
+                    start, end = base[i], base[i] + v
+                    base[i] = end
+                    x = x0 + i * group + pad
+                else:
+                    start, end = 0, v
+                    x = x0 + i * group + pad + s * (bar + gap)
+                if v:
+                    top_y, bottom_y = y(max(start, end)), y(min(start, end))
+                    path.append(f"M{w.n(x)} {w.n(top_y)}h{w.n(bar)}v{w.n(bottom_y - top_y)}h-{w.n(bar)}z")
+            if path:
+                out.append(f'<path class="s{s}" d="{"".join(path)}"/>')
+
+    # Axes, category ticks and labels
+    out.append(f'<path class="a" d="M{w.n(x0)} {w.n(y1)}V{w.n(y0)}H{w.n(x1)}"/>')
+    if low < 0:
+        out.append(f'<path class="a" d="M{w.n(x0)} {w.n(y(0))}H{w.n(x1)}"/>')
+    angle = style['label_angle']
+    label_y = y0 + 10 if angle else y0 + 6 + style['label_size']
+    for i, name in enumerate(categories):
+        xc = x0 + (i + 0.5) * group
+        out.append(f'<use href="#t" x="{w.n(xc)}" y="{w.n(y0)}"/>')
+        if angle:
+            out.append(f'<text class="c y" x="{w.n(xc)}" y="{w.n(label_y)}" '
+                       f'transform="rotate({w.n(angle)} {w.n(xc)} {w.n(label_y)})">{html.escape(name)}</text>')
+        else:
+            out.append(f'<text class="c" x="{w.n(xc)}" y="{w.n(label_y)}" text-anchor="middle">{html.escape(name)}</text>')
+
+    # Legend along the bottom edge
+    if style['legend'] and len(series) > 1:
+        size = style['legend_size']
+        lx, ly = x0, height - 40
+        for s, (name, _) in enumerate(series):
+            if kind == 'line':
+                out.append(f'<path class="s{s}" d="M{w.n(lx)} {w.n(ly + 6)}h13"/>')
+            else:
+                out.append(f'<rect class="s{s}" x="{w.n(lx)}" y="{w.n(ly)}" width="13" height="11"/>')
+            out.append(f'<text class="l" x="{w.n(lx + 17)}" y="{w.n(ly + 13)}">{html.escape(name)}</text>')
+            lx += 17 + len(name) * size * 0.6 + 2 * size
+
+    out.append('</svg>')
+    return '\n'.join(out) + '\n'
+
+
+# --- Build stage ---
+
+def chart_output(spec_path, root):
+    """Path of the SVG rendered for a spec file: images/<name>.svg under root."""
+    return Path(root) / 'images' / (Path(spec_path).name[:-len(SPEC_SUFFIX)] + '.svg')
+
+
+def load_spec(spec_path):
+    with open(spec_path, 'r', encoding='utf-8') as f:
+        spec = json.load(f)
+    if not isinstance(spec, dict) or not isinstance(spec.get('data'), str):
+        raise ChartError(f"{Path(spec_path).name}: a chart spec needs a \"data\" file")
+    return spec
+
+
+def build_charts(content_dir, root, cache_path, writer=None):
+    """Render every content/*.chart.json whose spec, data or renderer changed.
+
+    Returns ([(spec path, output path) rendered now], [(spec path, error message)]).
+    """
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cache = {}
+    writer = writer or outputs.OutputWriter()
+    code = hashlib.sha256(Path(__file__).resolve().read_bytes()).hexdigest()
+
+    rendered = []
+    errors = []
+    entries = {}
+    for spec_path in sorted(Path(content_dir).glob('*' + SPEC_SUFFIX)):
+        output = chart_output(spec_path, root)
+        try:
+            spec_bytes = spec_path.read_bytes()
+            spec = load_spec(spec_path)
+            data_path = spec_path.parent / spec['data']
+            digest = hashlib.sha256(code.encode() + spec_bytes + b'\0' + data_path.read_bytes()).hexdigest()
+            if cache.get(spec_path.name) == digest and output.exists():
+                entries[spec_path.name] = digest
+                continue
+            svg = render_chart(spec, *load_data(data_path))
+        except (OSError, ValueError, ChartError) as e:
+            errors.append((spec_path, str(e)))
+            continue
+        output.parent.mkdir(exist_ok=True)
+        writer.write_text(output, svg)
+        entries[spec_path.name] = digest
+        rendered.append((spec_path, output))
+
+    if entries != cache:
+        cache_path = Path(cache_path)
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        writer.write_text(cache_path, json.dumps(entries, indent=2))
+    return rendered, errors
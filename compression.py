@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Precompressed copies of the generated site for `python3 build.py --compress`
+
+Every deployable text file (the posts and index pages in the build manifest,
+stylesheets, scripts, search index, SVG images, feeds and sitemap) gets a .gz
+sibling at maximum compression and, when the optional brotli module is
+installed, a .br sibling. Pages the manifest does not list (drafts, pages of
+deleted posts) are not compressed, and siblings whose source is no longer
+part of the site are deleted. Source hashes are recorded in the build cache, so a
+file is only recompressed when its bytes change; files are compressed in a
+thread pool (zlib and brotli release the GIL while they work).
+"""
+
+import gzip
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import deploy
+import outputs
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Deployable files besides the pages, relative to the project root (text formats only)
+STATIC_PATTERNS = ('css/*.css', 'js/*.js', 'search/*.json', 'images/*.svg', 'feed.xml', 'rss.xml', 'sitemap.xml')
+# Where siblings are looked for, and what their sources can be
+SIBLING_DIRS = ('', 'posts', 'page', 'archive', 'css', 'js', 'search', 'images')
+SOURCE_SUFFIXES = ('.html', '.css', '.js', '.json', '.svg', '.xml')
+
+
+def available_formats():
+    """Sibling suffixes this interpreter can produce."""
+    return ('gz', 'br') if brotli is not None else ('gz',)
+
+
+def site_files(root, manifest):
+    """Every deployable file under root to compress, in a stable order: the pages in the build
+    manifest and the static files."""
+    rels = [post['record']['output_path'] for post in manifest.get('posts', {}).values()]
+    rels += list(manifest.get('pages', {}))
+    for pattern in STATIC_PATTERNS:
+        rels += [path.relative_to(root).as_posix() for path in root.glob(pattern)]
+    return [root / rel for rel in sorted(set(rels)) if not deploy.is_excluded(rel) and (root / rel).is_file()]
+
+
+def stale_siblings(root, files):
+    """.gz/.br files under root whose source is not one of files."""
+    wanted = {path.relative_to(root).as_posix() for path in files}
+    stale = []
+    for directory in SIBLING_DIRS:
+        for fmt in ('gz', 'br'):
+            for path in sorted((root / directory).glob(f'*.{fmt}')):
+                source = path.relative_to(root).as_posix()[:-len(fmt) - 1]
+                if source.endswith(SOURCE_SUFFIXES) and source not in wanted:
+                    stale.append(path)
+    return stale
+
+
+def _sibling(path, fmt):
+    return path.with_name(f'{path.name}.{fmt}')
+
+
+def _compress_file(path, formats, writer):
+    """Write the compressed siblings of one file; return its cache entry."""
+    data = path.read_bytes()
+    entry = {'source': hashlib.sha256(data).hexdigest(), 'size': len(data)}
+    for fmt in formats:
+        if fmt == 'gz':
+            packed = gzip.compress(data, compresslevel=9, mtime=0)
+        else:
+            packed = brotli.compress(data, quality=11)
+        writer.write_bytes(_sibling(path, fmt), packed)
+        entry[fmt] = len(packed)
+    return entry
+
+
+def _is_current(path, entry, formats, digest):
+    return (entry is not None and entry['source'] == digest
+            and all(fmt in entry and _sibling(path, fmt).exists() for fmt in formats))
+
+
+def compress_site(root, manifest, cache_path, jobs=1, writer=None):
+    """Bring the .gz/.br siblings of every deployable file (see site_files) up to date.
+
+    Returns (files compressed now, files covered, bytes saved by .gz, bytes saved by .br,
+    stale siblings removed); savings cover every file, including those left untouched.
+    """
+    formats = available_formats()
+    writer = writer or outputs.OutputWriter()
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cache = {}
+
+    files = site_files(root, manifest)
+    current = {}
+    stale = []
+    for path in files:
+        rel = path.relative_to(root).as_posix()
+        entry = cache.get(rel)
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        if _is_current(path, entry, formats, digest):
+            current[rel] = entry
+        else:
+            stale.append((rel, path))
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        entries = pool.map(lambda path: _compress_file(path, formats, writer), [path for _, path in stale])
+        for (rel, _), entry in zip(stale, entries):
+            current[rel] = entry
+
+    # Files that are no longer part of the site take their siblings with them
+    removed = stale_siblings(root, files)
+    for path in removed:
+        path.unlink()
+
+    cache_path.parent.mkdir(exist_ok=True)
+    with open(cache_path, 'w', encoding='utf-8') as f:
+        json.dump({rel: current[rel] for rel in sorted(current)}, f, indent=1)
+
+    saved = {fmt: sum(entry['size'] - entry[fmt] for entry in current.values()) for fmt in formats}
+    return len(stale), len(files), saved['gz'], saved.get('br', 0), len(removed)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Incremental dist/ packaging for `python3 build.py --dist`
+
+The deployable site is taken from the build manifest (every post's output
+page and every index/archive page) plus the static assets, the search index,
+_headers, the feeds and sitemap, and the precompressed siblings of all of
+those. The post template and *-work-in-progress.html drafts left in posts/
+are never shipped, and neither are pages the manifest no longer knows about.
+
+dist/ is then brought in line with that list: a file whose dist/ copy is
+still the same (a hardlink to the same inode, or a copy with the same size
+and bytes) is left alone, anything else is put in place through an atomic
+rename, and files in dist/ that are no longer part of the site are deleted.
+Because of that, a directory is only synced into if it is empty (or missing)
+or carries the MARKER file an earlier sync left in it.
+
+Generated files are always replaced rather than rewritten in place (see
+outputs.py), so they are hardlinked (copied when the filesystem cannot
+link) and a linked dist/ copy never changes under a deploy. Files in
+SOURCE_DIRS (css/, js/, images/) may be edited in place by hand, which
+would change a linked copy without the diff noticing, so they are always
+copied.
+
+The result is a deploy diff of added, changed and removed paths, which is
+written as JSON so an upload step can transfer only the delta.
+"""
+
+import fnmatch
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import outputs
+
+# Static files shipped as they are, relative to the project root
+STATIC_PATTERNS = ('css/*', 'js/*', 'images/*', 'search/*.json', '_headers', 'feed.xml', 'rss.xml', 'sitemap.xml')
+COMPRESSED_SUFFIXES = ('.gz', '.br')
+EXCLUDED_PATTERNS = ('post-template.html', '*-work-in-progress.html', '.*')
+# Hand-edited sources live here: their files are copied into dist/, never hardlinked
+SOURCE_DIRS = ('css', 'js', 'images')
+# Left in the dist directory by sync; a non-empty directory without it is never touched
+MARKER = '.blog-dist'
+# Directories dist/ must never be (or be inside): syncing deletes whatever is not part of the site
+PROTECTED_DIRS = {'content', 'drafts', 'css', 'js', 'images', 'posts', 'page', 'archive', 'search',
+                  '.build-cache', '.git', 'node_modules'}
+
+
+def is_excluded(rel):
+    name = rel.rsplit('/', 1)[-1]
+    for suffix in COMPRESSED_SUFFIXES:
+        name = name.removesuffix(suffix)
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in EXCLUDED_PATTERNS)
+
+
+def is_source(rel):
+    """Is rel a file that may be edited in place (and so must not share an inode with its dist/ copy)?"""
+    return rel.split('/', 1)[0] in SOURCE_DIRS and not rel.endswith(COMPRESSED_SUFFIXES)
+
+
+def site_files(root, manifest):
+    """Paths (relative to root) of every file to deploy, in a stable order."""
+    wanted = [post['record']['output_path'] for post in manifest.get('posts', {}).values()]
+    wanted += list(manifest.get('pages', {}))
+    for pattern in STATIC_PATTERNS:
+        wanted += [path.relative_to(root).as_posix() for path in sorted(root.glob(pattern))
+                   if path.is_file() and path.suffix not in COMPRESSED_SUFFIXES]
+
+    files = set()
+    for rel in wanted:
+        if is_excluded(rel) or not (root / rel).is_file():
+            continue
+        files.add(rel)
+        files.update(rel + suffix for suffix in COMPRESSED_SUFFIXES if (root / (rel + suffix)).is_file())
+    return sorted(files)
+
+
+def check_dist_dir(root, dist_dir):
+    """Raise ValueError if syncing into dist_dir could delete sources or build outputs."""
+    root, dist_dir = Path(root).resolve(), Path(dist_dir).resolve()
+    if dist_dir == root or dist_dir in root.parents:
+        raise ValueError(f"{dist_dir} contains the project itself")
+    if root in dist_dir.parents and dist_dir.relative_to(root).parts[0] in PROTECTED_DIRS:
+        raise ValueError(f"{dist_dir} is inside a source or output directory")
+    if dist_dir.exists():
+        if not dist_dir.is_dir():
+            raise ValueError(f"{dist_dir} is not a directory")
+        if not (dist_dir / MARKER).is_file() and any(dist_dir.iterdir()):
+            raise ValueError(f"{dist_dir} is not empty and was not created by a previous sync "
+                             f"(no {MARKER} file); refusing to delete its contents")
+
+
+def _unchanged(source, target, link):
+    """Is target already a copy of source? (same inode, or same size, then same mtime or bytes)
+
+    A copied file linked by an older sync never counts as unchanged: an in-place edit
+    would have changed both names, so its bytes tell nothing.
+    """
+    try:
+        target_stat = os.stat(target)
+    except FileNotFoundError:
+        return False
+    source_stat = os.stat(source)
+    if os.path.samestat(source_stat, target_stat):
+        return link
+    if source_stat.st_size != target_stat.st_size:
+        return False
+    if source_stat.st_mtime_ns == target_stat.st_mtime_ns:  # copy2 keeps mtimes
+        return True
+    return outputs.same_contents(target, Path(source).read_bytes())
+
+
+def _place(source, target, link=True):
+    """Atomically hardlink (if link) or copy source to target. Returns True if linked."""
+    temp_path = target.with_name(f".{target.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    temp_path.unlink(missing_ok=True)
+    try:
+        linked = False
+        if link:
+            try:
+                os.link(source, temp_path)
+                linked = True
+            except OSError:  # another filesystem, or links not supported
+                pass
+        if not linked:
+            shutil.copy2(source, temp_path)
+        os.replace(temp_path, target)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+    return linked
+
+
+def sync(root, dist_dir, files):
+    """Make dist_dir hold exactly files (relative to root).
+
+    Returns the deploy diff {'added', 'changed', 'removed': [paths], 'unchanged': count, 'copied': count},
+    where copied counts the files that could not be hardlinked.
+    """
+    root, dist_dir = Path(root), Path(dist_dir)
+    check_dist_dir(root, dist_dir)
+    diff = {'added': [], 'changed': [], 'removed': [], 'unchanged': 0, 'copied': 0}
+    dist_dir.mkdir(parents=True, exist_ok=True)
+    (dist_dir / MARKER).write_text("Synced by build.py --dist; files not part of the site are deleted.\n",
+                                   encoding='utf-8')
+
+    for rel in files:
+        source, target = root / rel, dist_dir / rel
+        existed = target.exists()
+        link = not is_source(rel)
+        if existed and _unchanged(source, target, link):
+            diff['unchanged'] += 1
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if not _place(source, target, link) and link:
+            diff['copied'] += 1
+        diff['changed' if existed else 'added'].append(rel)
+
+    wanted = set(files)
+    for directory, subdirs, names in os.walk(dist_dir, topdown=False):
+        directory = Path(directory)
+        for name in names:
+            rel = (directory / name).relative_to(dist_dir).as_posix()
+            if rel not in wanted and rel != MARKER:
+                (directory / name).unlink()
+                diff['removed'].append(rel)
+        if directory != dist_dir and not any(directory.iterdir()):
+            directory.rmdir()
+    diff['removed'].sort()
+    return diff
+
+
+def package_site(root, manifest, dist_dir, diff_path):
+    """Sync the site described by the build manifest into dist_dir and write the deploy diff to diff_path."""
+    diff = sync(root, dist_dir, site_files(Path(root), manifest))
+    diff_path = Path(diff_path)
+    diff_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(diff_path, 'w', encoding='utf-8') as f:
+        json.dump({'dist': str(dist_dir), **diff}, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+    return diff
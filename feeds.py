@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Atom and RSS feeds and sitemap.xml for `python3 build.py --base-url URL`
+
+The feeds carry the full content of the latest posts, with relative links
+and images made absolute against the base URL; the sitemap lists every post
+and index page. Nothing in them depends on when the build ran: an entry's
+updated/lastmod time only moves when the hash of the post's content changes
+(see LastModified), and a feed's own updated time is that of its newest
+entry. An unchanged site therefore regenerates byte-identical files, which
+the build's write-if-changed writer leaves alone, so their mtimes and ETags
+stay put and conditional GETs keep answering 304.
+"""
+
+import json
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+from xml.sax.saxutils import escape, quoteattr
+
+ATOM_PATH = 'feed.xml'
+RSS_PATH = 'rss.xml'
+SITEMAP_PATH = 'sitemap.xml'
+FEED_PATHS = (ATOM_PATH, RSS_PATH, SITEMAP_PATH)
+
+RELATIVE_REF_RE = re.compile(r'''((?:href|src)=")(?![a-zA-Z][a-zA-Z0-9+.-]*:|//|#)([^"]*)"''')
+
+
+@dataclass
+class FeedEntry:
+    """One post as it appears in the feeds."""
+    url: str               # absolute
+    title: str
+    published: datetime    # UTC
+    updated: datetime      # UTC
+    content: str           # HTML, links already absolute
+
+
+def utc(dt):
+    """A naive datetime (a post date) as UTC; aware datetimes are converted."""
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def absolutize(html, page_url):
+    """Make the relative href/src references in html absolute, as seen from page_url."""
+    return RELATIVE_REF_RE.sub(lambda m: f'{m.group(1)}{urljoin(page_url, m.group(2))}"', html)
+
+
+def _iso(dt):
+    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def atom_feed(title, site_url, entries):
+    """Atom 1.0 document for entries (newest first)."""
+    updated = max((entry.updated for entry in entries), default=datetime(1970, 1, 1, tzinfo=timezone.utc))
+    lines = ['<?xml version="1.0" encoding="utf-8"?>',
+             '<feed xmlns="http://www.w3.org/2005/Atom">',
+             f'  <title>{escape(title)}</title>',
+             f'  <link href={quoteattr(site_url)}/>',
+             f'  <link rel="self" href={quoteattr(urljoin(site_url, ATOM_PATH))}/>',
+             f'  <id>{escape(site_url)}</id>',
+             f'  <updated>{_iso(updated)}</updated>']
+    for entry in entries:
+        lines += ['  <entry>',
+                  f'    <title>{escape(entry.title)}</title>',
+                  f'    <link href={quoteattr(entry.url)}/>',
+                  f'    <id>{escape(entry.url)}</id>',
+                  f'    <published>{_iso(entry.published)}</published>',
+                  f'    <updated>{_iso(entry.updated)}</updated>',
+                  f'    <author><name>{escape(title)}</name></author>',
+                  f'    <content type="html">{escape(entry.content)}</content>',
+                  '  </entry>']
+    lines.append('</feed>')
+    return '\n'.join(lines) + '\n'
+
+
+def rss_feed(title, site_url, entries):
+    """RSS 2.0 document for entries (newest first)."""
+    updated = max((entry.updated for entry in entries), default=datetime(1970, 1, 1, tzinfo=timezone.utc))
+    lines = ['<?xml version="1.0" encoding="utf-8"?>',
+             '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom">',
+             '  <channel>',
+             f'    <title>{escape(title)}</title>',
+             f'    <link>{escape(site_url)}</link>',
+             f'    <description>{escape(title)}</description>',
+             f'    <atom:link href={quoteattr(urljoin(site_url, RSS_PATH))} rel="self" type="application/rss+xml"/>',
+             f'    <lastBuildDate>{updated.strftime("%a, %d %b %Y %H:%M:%S +0000")}</lastBuildDate>']
+    for entry in entries:
+        lines += ['    <item>',
+                  f'      <title>{escape(entry.title)}</title>',
+                  f'      <link>{escape(entry.url)}</link>',
+                  f'      <guid isPermaLink="true">{escape(entry.url)}</guid>',
+                  f'      <pubDate>{entry.published.strftime("%a, %d %b %Y %H:%M:%S +0000")}</pubDate>',
+                  f'      <description>{escape(entry.content)}</description>',
+                  '    </item>']
+    lines += ['  </channel>', '</rss>']
+    return '\n'.join(lines) + '\n'
+
+
+def sitemap(urls):
+    """sitemap.xml for [(absolute URL, lastmod datetime or None)]."""
+    lines = ['<?xml version="1.0" encoding="utf-8"?>',
+             '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">']
+    for url, lastmod in urls:
+        lastmod = f'<lastmod>{lastmod.strftime("%Y-%m-%d")}</lastmod>' if lastmod else ''
+        lines.append(f'  <url><loc>{escape(url)}</loc>{lastmod}</url>')
+    lines.append('</urlset>')
+    return '\n'.join(lines) + '\n'
+
+
+class LastModified:
+    """Last-modified times of posts that only move when a post's content hash does.
+
+    State is kept in the build cache as {post: [content hash, ISO time]}. A post seen for
+    the first time is dated by its publication date, so a fresh checkout gives the same
+    times everywhere; a later change of content is dated by the source file's mtime.
+    """
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                self.state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.state = {}
+        self.changed = False
+
+    def get(self, name, content_hash, published, source_mtime):
+        """Last-modified time (UTC) of a post with the given content hash."""
+        known = self.state.get(name)
+        if known and known[0] == content_hash:
+            return datetime.fromisoformat(known[1])
+        if known:
+            modified = max(utc(published), datetime.fromtimestamp(source_mtime, timezone.utc))
+        else:
+            modified = utc(published)
+        self.state[name] = [content_hash, modified.isoformat()]
+        self.changed = True
+        return modified
+
+    def save(self, names):
+        """Persist the state of the given posts (dropping posts that are gone)."""
+        if self.changed or self.state.keys() != set(names):
+            self.state = {name: self.state[name] for name in sorted(names) if name in self.state}
+            self.state_path.parent.mkdir(exist_ok=True)
+            with open(self.state_path, 'w', encoding='utf-8') as f:
+                json.dump(self.state, f, ensure_ascii=False, indent=1)
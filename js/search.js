@@ -0,0 +1,117 @@
+// Search box for the index pages, backed by the index search_index.py writes to search/.
+// Queries are folded like the index (å/ä/æ -> a, ö/ø -> o); only the shards for the
+// query's words are fetched, and the last word matches as a prefix while typing.
+(function () {
+  var FOLD = {'å': 'a', 'ä': 'a', 'æ': 'a', 'ö': 'o', 'ø': 'o', 'é': 'e', 'è': 'e', 'ü': 'u'};
+  var WORD = /[\p{L}\p{N}_]+/gu;
+  var MIN_TERM_LENGTH = 2;
+
+  var input = document.getElementById('search');
+  var results = document.getElementById('search-results');
+  if (!input || !results || !window.fetch) return;
+
+  var root = input.getAttribute('data-root') || '';
+  var meta = null;
+  var shards = {};
+  var latest = 0;
+
+  function normalize(text) {
+    return text.normalize('NFC').toLowerCase().replace(/[åäæöøéèü]/g, function (c) { return FOLD[c]; });
+  }
+
+  function shardOf(term) {
+    return /[a-z0-9]/.test(term[0]) ? term[0] : '_';
+  }
+
+  function fetchJSON(name) {
+    return fetch(root + 'search/' + name)
+      .then(function (response) { return response.ok ? response.json() : null; })
+      .catch(function () { return null; });
+  }
+
+  function loadMeta() {
+    if (!meta) {
+      meta = fetchJSON('docs.json').then(function (data) { return data || {docs: [], shards: ''}; });
+    }
+    return meta;
+  }
+
+  function loadShard(name, available) {
+    if (!shards[name]) {
+      shards[name] = available.indexOf(name) < 0 ? Promise.resolve({}) : fetchJSON(name + '.json')
+        .then(function (data) { return data || {}; });
+    }
+    return shards[name];
+  }
+
+  // Add the counts from a gap-encoded postings list ([gap, count, gap, count, ...]) to scores
+  function addPostings(flat, scores) {
+    var id = 0;
+    for (var i = 0; i < flat.length; i += 2) {
+      id += flat[i];
+      scores[id] = (scores[id] || 0) + flat[i + 1];
+    }
+  }
+
+  function match(term, prefix, available) {
+    return loadShard(shardOf(term), available).then(function (shard) {
+      var scores = {};
+      if (prefix) {
+        for (var key in shard) {
+          if (key.lastIndexOf(term, 0) === 0) addPostings(shard[key], scores);
+        }
+      } else if (shard[term]) {
+        addPostings(shard[term], scores);
+      }
+      return scores;
+    });
+  }
+
+  // Posts containing every word of the query, best matches first (null for an empty query)
+  function search(query) {
+    var terms = (normalize(query).match(WORD) || []).filter(function (term) {
+      return term.length >= MIN_TERM_LENGTH;
+    });
+    if (!terms.length) return Promise.resolve(null);
+    var typing = !/\s$/.test(query);
+
+    return loadMeta().then(function (data) {
+      return Promise.all(terms.map(function (term, i) {
+        return match(term, typing && i === terms.length - 1, data.shards);
+      })).then(function (matches) {
+        var hits = [];
+        Object.keys(matches[0]).forEach(function (id) {
+          var score = 0;
+          for (var i = 0; i < matches.length; i++) {
+            if (!matches[i][id]) return;
+            score += matches[i][id];
+          }
+          if (data.docs[id]) hits.push([score, data.docs[id]]);
+        });
+        hits.sort(function (a, b) { return b[0] - a[0]; });
+        return hits.map(function (hit) { return hit[1]; });
+      });
+    });
+  }
+
+  function show(docs) {
+    if (docs === null) {
+      results.innerHTML = '';
+    } else if (!docs.length) {
+      results.innerHTML = '<p class="article-meta">No posts found</p>';
+    } else {
+      results.innerHTML = docs.map(function (doc) {
+        return '<div class="post-entry"><h2><a href="' + root + doc[0] + '">' + doc[1] + '</a></h2>' +
+          '<div class="article-meta">' + doc[2] + '</div></div>';
+      }).join('');
+    }
+  }
+
+  input.addEventListener('input', function () {
+    var request = ++latest;
+    search(input.value).then(function (docs) {
+      if (request === latest) show(docs);  // ignore answers to older keystrokes
+    });
+  });
+  input.hidden = false;
+})();
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Link graph of the posts for the Tufte Blog Builder
+
+The content catalog records every post's outgoing references when it reads
+the source: [[post:Title]] links (by title) and, from scan_references,
+relative Markdown links and images ([text](other.md), ![alt](images/x.svg))
+and src/href attributes of inline HTML. The graph is assembled from those
+entries on each build, so a build never rescans sources to find links:
+
+    post -> post    [[post:Title]], a link to another post's .md source or to its page
+    post -> file    images and other files under the project root
+
+Each reference either resolves or is reported as broken, and the reverse
+post edges give each post's backlinks.
+"""
+
+import posixpath
+import re
+
+MARKDOWN_REF_RE = re.compile(r'!?\[[^\]\n]*\]\(\s*<?([^)\s>]+)')
+HTML_REF_RE = re.compile(r'\b(?:src|href)\s*=\s*"([^"]+)"')
+# Markdown links to another post's source, rewritten to its page at build time
+SOURCE_LINK_RE = re.compile(r'(\]\(\s*<?)([^)\s>#?]+\.md)(?=[#?)\s>])')
+EXTERNAL_RE = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.-]*:|//|/|#)')
+# Root-relative by convention: the build points src="images/..." at ../images/
+ROOT_PREFIXES = ('images/',)
+
+
+def fallback_slug(title):
+    """Slug guessed from a link title that matches no post (what [[post:]] falls back to)."""
+    return re.sub(r'[^\w\-]', '', title.lower().replace(' ', '-'))[:40]
+
+
+def scan_references(content):
+    """Relative link and image targets in a post's Markdown, without #fragments or ?queries."""
+    refs = set()
+    for regex in (MARKDOWN_REF_RE, HTML_REF_RE):
+        for match in regex.finditer(content):
+            ref = match.group(1).split('#', 1)[0].split('?', 1)[0]
+            if ref and not EXTERNAL_RE.match(ref):
+                refs.add(ref)
+    return sorted(refs)
+
+
+def site_path(ref):
+    """Path relative to the project root that a reference in a post page points to (None if outside it)."""
+    if ref.startswith(ROOT_PREFIXES):
+        path = posixpath.normpath(ref)
+    else:
+        path = posixpath.normpath(posixpath.join('posts', ref))
+    return None if path == '..' or path.startswith('../') else path
+
+
+class LinkGraph:
+    """Edges between posts (and from posts to files), built from catalog entries.
+
+    catalog maps source file names to entries with 'link_title', 'links' ([[post:]] titles)
+    and 'refs' (scan_references); slugs maps them to output slugs; exists(path) tells
+    whether a file relative to the project root exists.
+    """
+
+    def __init__(self, catalog, slugs, exists):
+        self.catalog = catalog
+        self.exists = exists
+        self.titles = {}
+        for name in sorted(catalog):
+            self.titles.setdefault(catalog[name]['link_title'], name)
+        self.pages = {f"posts/{slug}.html": name for name, slug in slugs.items()}
+        self.outgoing = {}   # name -> {reference: post name, file path or None if broken}
+        self.backlinks = {}  # name -> names of the posts linking to it
+        self.broken = []     # (name, reference)
+        self._known_files = {}
+
+        sources = {}
+        for name in sorted(catalog):
+            self.outgoing[name] = self._targets(catalog[name])
+            for target in self._post_targets(name):
+                sources.setdefault(target, set()).add(name)
+        self.broken = self._broken()
+        self.backlinks = {name: self._sorted(names) for name, names in sources.items()}
+
+    def _targets(self, entry):
+        """{reference: what it resolves to} for one catalog entry."""
+        targets = {}
+        for title in entry['links']:
+            targets[f"[[post:{title}]]"] = self.resolve_title(title)
+        for ref in entry.get('refs', ()):
+            if ref.endswith('.md'):
+                source = posixpath.basename(ref)
+                targets[ref] = source if source in self.catalog else None
+                continue
+            path = site_path(ref)
+            if path in self.pages:
+                targets[ref] = self.pages[path]
+            elif path is not None:
+                if path not in self._known_files:
+                    self._known_files[path] = self.exists(path)
+                targets[ref] = path if self._known_files[path] else None
+            else:
+                targets[ref] = None
+        return targets
+
+    def _post_targets(self, name):
+        """The other posts a post links to."""
+        return {target for target in self.outgoing[name].values()
+                if target in self.catalog and target != name}
+
+    def _broken(self):
+        return [(name, ref) for name in sorted(self.outgoing)
+                for ref, target in self.outgoing[name].items() if target is None]
+
+    def _sorted(self, names):
+        return sorted(names, key=lambda source: self.catalog[source]['link_title'].casefold())
+
+    def update(self, names):
+        """Recompute the edges of the given posts after their catalog entries were re-read.
+
+        Only valid while the set of posts, their titles and their slugs stay the same (a
+        change to any of those can move other posts' links; build a new graph then). Returns
+        the posts whose backlinks changed.
+        """
+        self._known_files = {}  # files may have been added or removed since
+        affected = set()
+        for name in names:
+            before = self._post_targets(name)
+            self.outgoing[name] = self._targets(self.catalog[name])
+            after = self._post_targets(name)
+            for target in before - after:
+                self.backlinks[target] = [source for source in self.backlinks[target] if source != name]
+                if not self.backlinks[target]:
+                    del self.backlinks[target]
+            for target in after - before:
+                self.backlinks[target] = self._sorted(self.backlinks.get(target, []) + [name])
+            affected |= before ^ after
+        self.broken = self._broken()
+        return affected
+
+    def resolve_title(self, title):
+        """Source file name of the post a [[post:Title]] link points to, or None."""
+        name = self.titles.get(title)
+        if name is None:
+            name = self.pages.get(f"posts/{fallback_slug(title)}.html")
+        return name
+
+    def edge_count(self):
+        return sum(len(targets) for targets in self.outgoing.values())
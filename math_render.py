@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Build-time math rendering for `python3 build.py --prerender-math`
+
+Finds the spans KaTeX's auto-render would typeset in a converted post ($$…$$
+and \\[…\\] as display math, \\(…\\) inline; nothing inside pre, code, script,
+style or textarea) and replaces them with static markup from a local renderer
+process. The renderer is started once and kept running; it reads one JSON
+request per line ({"tex": ..., "display": true}) and answers each with
+{"html": ...} or {"error": ...} (see tools/render-math.js for a KaTeX one).
+
+A renderer that does not answer within timeout seconds is stopped (and
+restarted for the next expression), so a hung renderer cannot hang the build.
+
+Rendered expressions are cached in the build cache, one file per hash of the
+renderer command, the KaTeX version the pages load the stylesheet of, display
+mode and TeX source, so they survive across builds and are shared by worker
+processes.
+"""
+
+import hashlib
+import html
+import json
+import os
+import re
+import select
+import shlex
+import subprocess
+import time
+from pathlib import Path
+
+DEFAULT_COMMAND = 'node tools/render-math.js'
+# Seconds to wait for one answer (the first includes starting the renderer)
+DEFAULT_TIMEOUT = 10
+
+MATH_RE = re.compile(r'\$\$(.+?)\$\$|\\\[(.+?)\\\]|\\\((.+?)\\\)', re.DOTALL)
+IGNORED_RE = re.compile(r'<(pre|code|script|style|textarea)\b.*?</\1>', re.DOTALL | re.IGNORECASE)
+
+
+class MathRenderError(Exception):
+    pass
+
+
+class MathRenderer:
+    """A running renderer process plus the on-disk cache of its results."""
+
+    def __init__(self, command, cache_dir, cwd=None, version='', timeout=DEFAULT_TIMEOUT):
+        self.command = command
+        self.cache_dir = Path(cache_dir)
+        self.cwd = cwd
+        self.version = version
+        self.timeout = timeout
+        self._process = None
+        self._buffer = b''
+
+    def _cache_path(self, tex, display):
+        key = f"{self.command}\0{self.version}\0{int(display)}\0{tex}".encode('utf-8')
+        return self.cache_dir / f"{hashlib.sha256(key).hexdigest()}.html"
+
+    def _request(self, tex, display):
+        if self._process is None or self._process.poll() is not None:
+            try:
+                self._process = subprocess.Popen(
+                    shlex.split(self.command), cwd=self.cwd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                    bufsize=0)
+            except OSError as e:
+                raise MathRenderError(f"cannot start math renderer ({self.command}): {e}") from e
+            self._buffer = b''
+        try:
+            self._process.stdin.write((json.dumps({'tex': tex, 'display': display}) + '\n').encode('utf-8'))
+            reply = self._read_line()
+        except (BrokenPipeError, OSError) as e:
+            raise MathRenderError(f"math renderer stopped: {e}") from e
+        if not reply:
+            raise MathRenderError("math renderer exited without answering")
+        reply = reply.decode('utf-8', errors='replace')
+        try:
+            reply = json.loads(reply)
+        except ValueError as e:
+            raise MathRenderError(f"math renderer answered with something other than JSON: {reply[:80]!r}") from e
+        if not isinstance(reply, dict):
+            raise MathRenderError(f"math renderer answered with {type(reply).__name__}, not an object")
+        return reply
+
+    def _read_line(self):
+        """Read one line of output, or b'' at end of output; stops the renderer if it takes too long."""
+        stdout = self._process.stdout
+        deadline = time.monotonic() + self.timeout
+        while b'\n' not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([stdout], [], [], remaining)[0]:
+                self._process.kill()
+                self._process.wait()
+                self._process = None
+                raise MathRenderError(f"math renderer did not answer within {self.timeout:g}s")
+            chunk = os.read(stdout.fileno(), 65536)
+            if not chunk:
+                return b''
+            self._buffer += chunk
+        line, _, self._buffer = self._buffer.partition(b'\n')
+        return line + b'\n'
+
+    def render(self, tex, display):
+        """Return the markup for one expression; raises MathRenderError if it cannot be rendered."""
+        path = self._cache_path(tex, display)
+        try:
+            return path.read_text(encoding='utf-8')
+        except FileNotFoundError:
+            pass
+
+        reply = self._request(tex, display)
+        if 'html' not in reply:
+            raise MathRenderError(reply.get('error', 'no output'))
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        temp_path.write_text(reply['html'], encoding='utf-8')
+        os.replace(temp_path, path)  # workers may race on the same expression
+        return reply['html']
+
+    def prerender(self, html_text):
+        """Replace every math span with rendered markup.
+
+        Returns (html, errors); spans that could not be rendered are left for the runtime
+        renderer and described in errors.
+        """
+        errors = []
+
+        def replace(m):
+            display = m.group(3) is None
+            source = next(group for group in m.groups() if group is not None)
+            if '<' in source:
+                # auto-render only sees text nodes, so markup inside a span is never math
+                errors.append(f"markup inside {m.group(0)[:40]!r}")
+                return m.group(0)
+            try:
+                return self.render(html.unescape(source), display)
+            except MathRenderError as e:
+                errors.append(f"{m.group(0)[:40]!r}: {e}")
+                return m.group(0)
+
+        parts = []
+        pos = 0
+        for ignored in IGNORED_RE.finditer(html_text):
+            parts.append(MATH_RE.sub(replace, html_text[pos:ignored.start()]))
+            parts.append(ignored.group(0))
+            pos = ignored.end()
+        parts.append(MATH_RE.sub(replace, html_text[pos:]))
+        return ''.join(parts), errors
+
+    def close(self):
+        if self._process is not None:
+            self._process.stdin.close()
+            self._process.wait()
+            self._process = None
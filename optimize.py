@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+Output optimization for `python3 build.py --optimize`
+
+Pages are optimized in memory as the build renders them, before they reach
+the output writer, so each page is written once (pure Python, no network):
+
+- Insignificant whitespace between tags and inside text is collapsed and
+  comments are dropped; pre, textarea, script and style are left untouched.
+- Pages link css/style.min.css, css/style.css minified down to the rules
+  whose selectors can match a tag, class or id that some generated page (or
+  a script in js/) actually emits. Attribute selectors and pseudo-classes
+  never make a rule unused, so theme switching and :hover rules survive.
+- With --critical-css, each page also gets the rules its first
+  CRITICAL_BYTES of <body> needs inlined in <head> and loads the stylesheet
+  without blocking rendering, but only where that CSS is smaller than the
+  stylesheet itself: inlined CSS is paid for on every page, the stylesheet
+  only once per visitor.
+
+The tags/classes/ids of every page are cached, so the stylesheet can be
+minified for the whole site when a build only renders a few pages.
+"""
+
+import hashlib
+import json
+import re
+
+import outputs
+
+STYLESHEET = 'css/style.css'
+MINIFIED = 'css/style.min.css'
+CRITICAL_BYTES = 14 * 1024  # roughly what arrives in the first round trip
+OPTIMIZE_VERSION = 2
+
+COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+STRING_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+WS_RE = re.compile(r'\s+')
+
+TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9-]*)')
+CLASS_RE = re.compile(r'\bclass="([^"]*)"')
+ID_RE = re.compile(r'\bid="([^"]*)"')
+ATTRIBUTE_SELECTOR_RE = re.compile(r'\[[^\]]*\]')
+PSEUDO_RE = re.compile(r'::?[\w-]+(?:\([^)]*\))?')
+SIMPLE_SELECTOR_RE = re.compile(r'([.#]?)(-?[_a-zA-Z][\w-]*)')
+
+STYLESHEET_LINK_RE = re.compile(
+    r'<link rel="stylesheet" href="((?:\.\./)*)css/style(?:\.[0-9a-f]{10})?\.css">')
+PRESERVED_RE = re.compile(r'<(pre|textarea|script|style)\b.*?</\1>', re.DOTALL | re.IGNORECASE)
+HTML_COMMENT_RE = re.compile(r'<!--(?!\[).*?-->', re.DOTALL)
+BLOCK_TAGS = ('html|head|body|meta|link|title|script|style|noscript|article|section|nav|header|footer|div|p|'
+              'h[1-6]|ul|ol|li|blockquote|hr|br|figure|figcaption|table|thead|tbody|tr|td|th|pre')
+BLOCK_GAP_RE = re.compile(r'(<(?:/?(?:%s))\b[^>]*>)\s+(?=<)|\s+(?=</?(?:%s)\b)' % (BLOCK_TAGS, BLOCK_TAGS))
+
+
+# --- CSS ---
+
+def _scan(text, pos, stops):
+    """Index of the next character in stops at or after pos, skipping quoted strings."""
+    n = len(text)
+    while pos < n:
+        char = text[pos]
+        if char in stops:
+            return pos
+        if char in '"\'':
+            m = STRING_RE.match(text, pos)
+            pos = m.end() if m else pos + 1
+            continue
+        pos += 1
+    return n
+
+
+def _matching_brace(text, pos):
+    """Index just past the brace block opening at text[pos]."""
+    depth = 0
+    while pos < len(text):
+        pos = _scan(text, pos, '{}')
+        if pos >= len(text):
+            break
+        depth += 1 if text[pos] == '{' else -1
+        pos += 1
+        if depth == 0:
+            return pos
+    return len(text)
+
+
+def _minify_value(text, punctuation):
+    """Collapse whitespace (outside strings) and drop it around the given punctuation."""
+    tight = re.compile(r'\s*([%s])\s*' % re.escape(punctuation))
+    parts = []
+    for i, part in enumerate(STRING_RE.split(text)):
+        if i % 2 == 0:
+            part = tight.sub(r'\1', WS_RE.sub(' ', part))
+        parts.append(part)
+    return ''.join(parts).strip()
+
+
+def parse_css(text):
+    """Parse a stylesheet into rules: ('rule', [selectors], declarations), ('group', prelude, rules)
+    for @media/@supports, or ('raw', minified text) for anything else."""
+    text = COMMENT_RE.sub('', text)
+    return _parse_rules(text, 0, len(text))
+
+
+def _parse_rules(text, pos, end):
+    rules = []
+    while True:
+        while pos < end and text[pos].isspace():
+            pos += 1
+        if pos >= end:
+            return rules
+        brace = _scan(text, pos, '{;')
+        if brace >= end:
+            return rules
+        prelude = WS_RE.sub(' ', text[pos:brace]).strip()
+        if text[brace] == ';':
+            rules.append(('raw', prelude + ';'))
+            pos = brace + 1
+            continue
+        close = _matching_brace(text, brace)
+        body = text[brace + 1:close - 1]
+        if prelude.startswith(('@media', '@supports')):
+            rules.append(('group', _minify_value(prelude, ',:()'), _parse_rules(text, brace + 1, close - 1)))
+        elif prelude.startswith('@'):
+            rules.append(('raw', prelude + '{' + _minify_value(body, ':;,{}').replace(';}', '}').rstrip(';') + '}'))
+        else:
+            selectors = [_minify_value(s, '>+~') for s in prelude.split(',')]
+            rules.append(('rule', selectors, _minify_value(body, ':;,').rstrip(';')))
+        pos = close
+
+
+def selector_used(selector, tokens):
+    """Could the selector match, given the tags, .classes and #ids emitted?"""
+    simple = PSEUDO_RE.sub(' ', ATTRIBUTE_SELECTOR_RE.sub(' ', selector))
+    for prefix, name in SIMPLE_SELECTOR_RE.findall(simple):
+        if (prefix + name if prefix else name.lower()) not in tokens:
+            return False
+    return True
+
+
+def render_css(rules, tokens=None):
+    """Minified CSS for the rules, keeping only selectors usable with tokens (all if None)."""
+    out = []
+    for rule in rules:
+        kind = rule[0]
+        if kind == 'raw':
+            out.append(rule[1])
+        elif kind == 'group':
+            inner = render_css(rule[2], tokens)
+            if inner:
+                out.append(f'{rule[1]}{{{inner}}}')
+        else:
+            selectors = rule[1] if tokens is None else [s for s in rule[1] if selector_used(s, tokens)]
+            if selectors and rule[2]:
+                out.append(f"{','.join(selectors)}{{{rule[2]}}}")
+    return ''.join(out)
+
+
+def emitted_tokens(text):
+    """Tags, .classes and #ids appearing in HTML (or in HTML strings inside a script)."""
+    tokens = {tag.lower() for tag in TAG_RE.findall(text)}
+    for classes in CLASS_RE.findall(text):
+        tokens.update('.' + name for name in classes.split())
+    tokens.update('#' + name for name in ID_RE.findall(text))
+    return tokens
+
+
+# --- HTML ---
+
+def collapse_whitespace(html):
+    """Drop comments and insignificant whitespace, leaving pre/textarea/script/style untouched."""
+    parts = []
+    pos = 0
+    for m in PRESERVED_RE.finditer(html):
+        parts.append(_collapse(html[pos:m.start()]))
+        parts.append(m.group(0))
+        pos = m.end()
+    parts.append(_collapse(html[pos:]))
+    return ''.join(parts).strip()
+
+
+def _collapse(text):
+    text = HTML_COMMENT_RE.sub('', text)
+    text = BLOCK_GAP_RE.sub(lambda m: m.group(1) or '', text)
+    return WS_RE.sub(' ', text)
+
+
+def optimize_page(html, rules, stylesheet, critical_limit=None):
+    """Point the page at the minified stylesheet (site-relative path) and collapse whitespace.
+
+    With critical_limit, the CSS the top of the page needs is inlined and the stylesheet loaded
+    asynchronously, provided that CSS is smaller than critical_limit bytes.
+    Returns (optimized html, tokens the page emits, bytes of inlined CSS).
+    """
+    tokens = emitted_tokens(html)
+    critical = ''
+    if critical_limit is not None:
+        body = html.find('<body')
+        critical = render_css(rules, emitted_tokens(html[body:body + CRITICAL_BYTES]) if body >= 0 else tokens)
+        if len(critical.encode('utf-8')) >= critical_limit:
+            critical = ''
+
+    def relink(m):
+        href = m.group(1) + stylesheet
+        if not critical:
+            return f'<link rel="stylesheet" href="{href}">'
+        return (f'<style>{critical}</style>\n'
+                f'<link rel="preload" href="{href}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+                f'<noscript><link rel="stylesheet" href="{href}"></noscript>')
+
+    html = STYLESHEET_LINK_RE.sub(relink, html, count=1)
+    return collapse_whitespace(html) + '\n', tokens, len(critical.encode('utf-8'))
+
+
+# --- Stage ---
+
+def _load_cache(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('version') == OPTIMIZE_VERSION:
+            return cache
+    except (FileNotFoundError, ValueError):
+        pass
+    return {'version': OPTIMIZE_VERSION, 'stylesheet': None, 'pages': {}}
+
+
+class PageOptimizer:
+    """Optimizes the pages of one build as they are rendered; finish() writes the stylesheet.
+
+    The pages are linked to the minified stylesheet by the name the previous build gave it,
+    so only a change of that name (with fingerprinting) makes finish() rewrite pages.
+    """
+
+    def __init__(self, root, cache_path, critical_css=False):
+        self.root = root
+        self.cache_path = cache_path
+        self.cache = _load_cache(cache_path)
+        source = (root / STYLESHEET).read_text(encoding='utf-8')
+        self.source_size = len(source.encode('utf-8'))
+        self.rules = parse_css(source)
+        # Inlined CSS has to be smaller than the stylesheet it stands in for
+        self.critical_limit = len(render_css(self.rules).encode('utf-8')) if critical_css else None
+        # What pages depend on besides their own content (critical CSS is cut from the stylesheet)
+        self.signature = hashlib.sha256(source.encode('utf-8')).hexdigest() if critical_css else True
+        self.stylesheet = self.cache['stylesheet'] or MINIFIED
+        self.pages = {}     # path -> {'tokens', 'stylesheet'} of the pages optimized by this build
+        self.report = []    # (path, bytes before, bytes after, bytes of inlined CSS)
+
+    def page(self, path, html):
+        """The optimized HTML of a page (path relative to the site root)."""
+        optimized, tokens, inlined = optimize_page(html, self.rules, self.stylesheet, self.critical_limit)
+        self.pages[path] = {'tokens': sorted(tokens), 'stylesheet': self.stylesheet}
+        self.report.append((path, len(html.encode('utf-8')), len(optimized.encode('utf-8')), inlined))
+        return optimized
+
+    def take(self, path):
+        """Remove and return what page() recorded for path (to hand it from a worker to the parent)."""
+        report = [line for line in self.report if line[0] == path]
+        self.report = [line for line in self.report if line[0] != path]
+        return self.pages.pop(path, None), report
+
+    def add(self, path, taken):
+        entry, report = taken
+        if entry is not None:
+            self.pages[path] = entry
+        self.report.extend(report)
+
+    def finish(self, pages, fingerprint=None, writer=None):
+        """Write the minified stylesheet for the site's pages (paths relative to root).
+
+        fingerprint optionally maps the minified stylesheet path to the name pages should link.
+        Returns (report of the pages optimized by this build, minified stylesheet path as linked,
+        bytes saved on the stylesheet).
+        """
+        writer = writer or outputs.OutputWriter()
+        entries = {}
+        for path in pages:
+            entry = self.pages.get(path) or self.cache['pages'].get(path)
+            if entry is None:  # written before the cache was: take its tokens from the page itself
+                html = (self.root / path).read_text(encoding='utf-8')
+                entry = {'tokens': sorted(emitted_tokens(html)), 'stylesheet': MINIFIED}
+            entries[path] = entry
+
+        # The site stylesheet keeps what any page or script can emit
+        tokens = set()
+        for entry in entries.values():
+            tokens.update(entry['tokens'])
+        for script in sorted(self.root.glob('js/*.js')):
+            tokens |= emitted_tokens(script.read_text(encoding='utf-8'))
+        minified = render_css(self.rules, tokens) + '\n'
+        writer.write_text(self.root / MINIFIED, minified)
+
+        # Point every page at the current name of the minified sheet (it changes with fingerprinting)
+        stylesheet = fingerprint(MINIFIED) if fingerprint else MINIFIED
+        for path, entry in entries.items():
+            if entry['stylesheet'] != stylesheet:
+                page_path = self.root / path
+                html = page_path.read_text(encoding='utf-8').replace(entry['stylesheet'] + '"', stylesheet + '"')
+                writer.write_text(page_path, html)
+                entries[path] = dict(entry, stylesheet=stylesheet)
+
+        cache = {'version': OPTIMIZE_VERSION, 'stylesheet': stylesheet, 'pages': entries}
+        if cache != self.cache:
+            self.cache_path.parent.mkdir(exist_ok=True)
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f)
+            self.cache = cache
+        return self.report, stylesheet, self.source_size - len(minified.encode('utf-8'))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Write-if-changed output files for the Tufte Blog Builder
+
+Every generated file goes through an OutputWriter. A file whose size and
+hash already match the new bytes is left alone, so its mtime (and whatever
+rsync, caches or file watchers derive from it) does not change. Otherwise
+the bytes are written to a temporary file next to the target and moved into
+place with os.replace, so an interrupted build never leaves a half-written
+page behind. The writer counts what it wrote and what it skipped.
+"""
+
+import hashlib
+import os
+import threading
+from pathlib import Path
+
+
+def same_contents(path, data):
+    """Does the file at path hold exactly data? (size first, then hash)"""
+    try:
+        if os.stat(path).st_size != len(data):
+            return False
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 16), b''):
+                digest.update(chunk)
+        return digest.digest() == hashlib.sha256(data).digest()
+    except FileNotFoundError:
+        return False
+
+
+def replace_file(path, data):
+    """Atomically replace (or create) the file at path with data."""
+    path = Path(path)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        temp_path.unlink(missing_ok=True)
+        raise
+
+
+class OutputWriter:
+    """Writes files only when their bytes change; counts written and unchanged files."""
+
+    def __init__(self):
+        self.written = 0
+        self.unchanged = 0
+        self._lock = threading.Lock()  # compression writes from a thread pool
+
+    def write_bytes(self, path, data):
+        """Write data to path unless it already holds it. Returns True if the file was written."""
+        changed = not same_contents(path, data)
+        if changed:
+            replace_file(path, data)
+        with self._lock:
+            if changed:
+                self.written += 1
+            else:
+                self.unchanged += 1
+        return changed
+
+    def write_text(self, path, text, encoding='utf-8'):
+        return self.write_bytes(path, text.encode(encoding))
+
+    def add(self, counts):
+        """Add (written, unchanged) counts reported by another writer (e.g. in a worker process)."""
+        with self._lock:
+            self.written += counts[0]
+            self.unchanged += counts[1]
+
+    def take_counts(self):
+        """Return (written, unchanged) so far and reset them."""
+        with self._lock:
+            counts = (self.written, self.unchanged)
+            self.written = self.unchanged = 0
+        return counts
+
+    def summary(self):
+        return f"{self.written} file{'s' if self.written != 1 else ''} written, {self.unchanged} unchanged"
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Post metadata for the Tufte Blog Builder
+
+A post's title and date live in directives at the top of its Markdown:
+
+    <!-- title: Kain och Abel -->
+    <!-- date: 14/3-2026 -->
+
+Only the header region (the first HEADER_LINES lines after any leading
+whitespace) is looked at, so a document is not split any further than that.
+Patterns are compiled once, in the PATTERNS registry.
+
+Dates are parsed by parse_date, which is memoized (an index or feed over a
+large archive sorts by the same few hundred distinct dates again and again)
+and understands D/M-YYYY, YYYY-MM-DD, DD.MM.YYYY and month names in English
+and Swedish ("January 15, 2026", "15 januari 2026", "den 3 okt. 2025").
+"""
+
+import functools
+import re
+from datetime import datetime
+
+HEADER_LINES = 10
+
+PATTERNS = {
+    'title': re.compile(r'<!--\s*title:\s*(.*?)\s*-->', re.IGNORECASE),
+    'date': re.compile(r'<!--\s*date:\s*(.*?)\s*-->', re.IGNORECASE),
+    'leading_space': re.compile(r'\s*'),
+    'tag': re.compile(r'<[^>]+>'),
+    'date_numeric': re.compile(r'(\d{1,2})/(\d{1,2})-(\d{4})$'),
+    'date_iso': re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})$'),
+    'date_dotted': re.compile(r'(\d{1,2})\.(\d{1,2})\.(\d{4})$'),
+    'date_month_first': re.compile(r'([^\W\d_]+)\.?\s+(\d{1,2}),?\s+(\d{4})$'),
+    'date_day_first': re.compile(r'(?:den\s+)?(\d{1,2})\.?\s+([^\W\d_]+)\.?\s+(\d{4})$', re.IGNORECASE),
+}
+
+MONTHS = {
+    # English
+    'january': 1, 'jan': 1, 'february': 2, 'feb': 2, 'march': 3, 'mar': 3, 'april': 4, 'apr': 4,
+    'may': 5, 'june': 6, 'jun': 6, 'july': 7, 'jul': 7, 'august': 8, 'aug': 8,
+    'september': 9, 'sep': 9, 'sept': 9, 'october': 10, 'oct': 10, 'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12,
+    # Swedish
+    'januari': 1, 'februari': 2, 'mars': 3, 'maj': 5, 'juni': 6, 'juli': 7, 'augusti': 8,
+    'oktober': 10, 'okt': 10,
+}
+
+
+class PostMeta:
+    """Title and date directives of a post (None where missing); see parse_date for the date."""
+
+    __slots__ = ('title', 'date')
+
+    title: 'str | None'
+    date: 'str | None'
+
+    def __init__(self, title=None, date=None):
+        self.title = title
+        self.date = date
+
+    def __repr__(self):
+        return f"PostMeta(title={self.title!r}, date={self.date!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, PostMeta):
+            return NotImplemented
+        return (self.title, self.date) == (other.title, other.date)
+
+
+def header_lines(text, count=HEADER_LINES):
+    """The first count lines of text after leading whitespace (the rest of text is not split)."""
+    lines = []
+    start = PATTERNS['leading_space'].match(text).end()
+    while len(lines) < count and start < len(text):
+        end = text.find('\n', start)
+        if end == -1:
+            end = len(text)
+        lines.append(text[start:end])
+        start = end + 1
+    return lines
+
+
+def _directive(lines, pattern):
+    for line in lines:
+        match = pattern.search(line.strip())
+        if match:
+            return match.group(1).strip()
+    return None
+
+
+def parse_header(text):
+    """PostMeta from the title and date directives in the header region of a Markdown document."""
+    lines = header_lines(text)
+    return PostMeta(_directive(lines, PATTERNS['title']), _directive(lines, PATTERNS['date']))
+
+
+def _date(year, month, day):
+    try:
+        return datetime(int(year), int(month), int(day))
+    except (TypeError, ValueError):  # unknown month name, or no such day
+        return None
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(text):
+    """datetime of a post date string, or None if it is not in a known format."""
+    text = text.strip()
+    m = PATTERNS['date_numeric'].match(text)
+    if m:
+        return _date(m.group(3), m.group(2), m.group(1))
+    m = PATTERNS['date_iso'].match(text)
+    if m:
+        return _date(m.group(1), m.group(2), m.group(3))
+    m = PATTERNS['date_dotted'].match(text)
+    if m:
+        return _date(m.group(3), m.group(2), m.group(1))
+    m = PATTERNS['date_month_first'].match(text)
+    if m:
+        return _date(m.group(3), MONTHS.get(m.group(1).lower()), m.group(2))
+    m = PATTERNS['date_day_first'].match(text)
+    if m:
+        return _date(m.group(3), MONTHS.get(m.group(2).lower()), m.group(1))
+    return None
+
+
+def strip_tags(html):
+    return PATTERNS['tag'].sub('', html)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Local preview server for `python3 build.py serve`
+
+Posts and the index pages are rendered straight from content/ on request and kept
+in an in-memory LRU keyed by source hash, so nothing is written to posts/.
+Static site files (deploy.STATIC_PATTERNS: css/, js/, images/, search/, ...) are
+served from the project directory; nothing else in it (sources, .git/, the
+build cache) is.
+Open pages get a small script that listens on /__reload (server-sent events)
+and reloads the tab when a source file, the template or an asset changes.
+"""
+
+import fnmatch
+import os
+import posixpath
+import threading
+from collections import OrderedDict
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+import deploy
+import watcher
+
+RELOAD_PATH = '/__reload'
+RELOAD_SCRIPT = '''<script>
+  new EventSource('/__reload').addEventListener('reload', function() { location.reload(); });
+</script>
+'''
+
+
+def is_site_file(rel):
+    """Is a path relative to the project root one of the static files the site is deployed with?"""
+    return (any(fnmatch.fnmatchcase(rel, pattern) for pattern in deploy.STATIC_PATTERNS)
+            and not deploy.is_excluded(rel))
+
+
+class RenderCache:
+    """Thread-safe LRU of rendered pages."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            page = self._pages.get(key)
+            if page is not None:
+                self._pages.move_to_end(key)
+            return page
+
+    def put(self, key, page):
+        with self._lock:
+            self._pages[key] = page
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+
+
+class PreviewSite:
+    """In-memory view of the blog shared by all request threads."""
+
+    def __init__(self, builder, cache_size=256):
+        self.builder = builder
+        self.cache = RenderCache(cache_size)
+        self.version = 0
+        # Guards the builder's catalog and rendering; cache hits only hold it to compute the key
+        self._lock = threading.RLock()
+        self._changed = threading.Condition()
+        self._slugs = {}    # output slug -> source file name, learned from rendered posts
+
+    def _post_key(self, name):
+        entry = self.builder.load_catalog().get(name)
+        if entry is None:
+            return None
+        slug = self.builder.assign_slugs()[0].get(name)
+        links = tuple(sorted(self.builder._resolved_links(entry).items()))
+        backlinks = tuple(map(tuple, self.builder._backlinks(name)))
+        return ('post', name, entry['hash'], slug, links, backlinks)
+
+    def render_post(self, name):
+        """Return (html, PostRecord) for a source file name, rendering it only on a cache miss."""
+        with self._lock:
+            key = self._post_key(name)
+        if key is None:
+            return None
+        page = self.cache.get(key)
+        if page is not None:
+            return page
+
+        with self._lock:
+            page = self.cache.get(key)  # another request may have rendered it meanwhile
+            if page is None:
+                page = self.builder.render_post(self.builder.content_dir / name)
+                if page is None:
+                    return None
+                self.cache.put(key, page)
+                self._slugs[page[1].slug] = name
+        return page
+
+    def find_post(self, slug):
+        """Map an output slug (posts/<slug>.html) back to its source file name."""
+        with self._lock:
+            name = self._slugs.get(slug)
+            if name is not None:
+                return name
+            for name, entry in self.builder.load_catalog().items():
+                if entry['slug'] == slug:
+                    return name
+            names = list(self.builder.load_catalog())
+        # Posts without a title directive get their slug from the rendered page
+        for name in names:
+            page = self.render_post(name)
+            if page is not None and page[1].slug == slug:
+                return name
+        return None
+
+    def render_index(self, path='index.html'):
+        """Render index.html, page/N.html or archive/<year>.html; None if there is no such page."""
+        with self._lock:
+            names = sorted(self.builder.load_catalog())
+        records = []
+        for name in names:
+            try:
+                page = self.render_post(name)
+            except Exception as e:
+                print(f"❌ Error processing {name}: {e}")
+                continue
+            if page is not None:
+                records.append(page[1])
+        return self.builder.render_index(records, path)
+
+    def files_changed(self, paths):
+        """Called from the watcher thread: refresh the catalog and tell open pages to reload."""
+        builder = self.builder
+        sources = [path for path in paths if path.parent == builder.content_dir and path.suffix == '.md']
+        with self._lock:
+            if sources:
+                builder.refresh_catalog(sources)
+                self._slugs.clear()
+            if builder.template_path in paths:
+                self.cache.clear()
+        with self._changed:
+            self.version += 1
+            self._changed.notify_all()
+        for path in sorted(paths):
+            print(f"🔁 Changed: {path.relative_to(builder.project_root)}")
+
+    def wait_for_change(self, version, timeout):
+        """Block until the site version moves past version (or timeout); return the current version."""
+        with self._changed:
+            self._changed.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    def __init__(self, *args, site, **kwargs):
+        self.site = site
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self):
+        path = unquote(urlsplit(self.path).path)
+        try:
+            if path == RELOAD_PATH:
+                return self._stream_reloads()
+            if path in ('/', '/index.html'):
+                return self._send_page(self.site.render_index())
+            if path.startswith(('/page/', '/archive/')) and path.endswith('.html'):
+                html = self.site.render_index(path[1:])
+                if html is not None:
+                    return self._send_page(html)
+            if path.startswith('/posts/') and path.endswith('.html'):
+                name = self.site.find_post(path[len('/posts/'):-len('.html')])
+                page = self.site.render_post(name) if name else None
+                if page is not None:
+                    return self._send_page(page[0])
+        except Exception as e:
+            self.send_error(500, f"Error rendering {path}: {e}")
+            return
+        super().do_GET()
+
+    def send_head(self):
+        rel = posixpath.normpath(unquote(urlsplit(self.path).path)).lstrip('/')
+        if not is_site_file(rel) or os.path.isdir(self.translate_path(self.path)):
+            self.send_error(404, "File not found")
+            return None
+        return super().send_head()
+
+    def _send_page(self, html):
+        head, sep, tail = html.rpartition('</body>')
+        if sep:
+            html = head + RELOAD_SCRIPT + sep + tail
+        body = html.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream_reloads(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        version = self.site.version
+        try:
+            self.wfile.write(b': connected\n\n')
+            self.wfile.flush()
+            while True:
+                current = self.site.wait_for_change(version, timeout=15)
+                if current == version:
+                    self.wfile.write(b': ping\n\n')  # keep-alive; also detects closed tabs
+                else:
+                    version = current
+                    self.wfile.write(f'event: reload\ndata: {version}\n\n'.encode())
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        if self.path != RELOAD_PATH:
+            super().log_message(format, *args)
+
+
+def serve(builder, host='127.0.0.1', port=8000, polling=False):
+    """Serve the site with live reload until interrupted."""
+    site = PreviewSite(builder)
+    root = builder.project_root
+
+    def handler(*args, **kwargs):
+        return PreviewHandler(*args, site=site, directory=str(root), **kwargs)
+
+    targets = [builder.content_dir, builder.template_path, root / 'css', root / 'js', root / 'images']
+    watch = watcher.create_watcher(targets, polling=polling)
+
+    def watch_loop():
+        while True:
+            site.files_changed(watcher.wait_for_changes(watch))
+
+    threading.Thread(target=watch_loop, name='preview-watcher', daemon=True).start()
+
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"🌐 Serving on http://{host}:{server.server_address[1]}/ ({watch.name}, Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped server")
+    finally:
+        server.server_close()
+        watch.close()
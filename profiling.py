@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Build profiling for `python3 build.py --profile`
+
+BlogBuilder wraps each stage of a build (catalog scan, link resolution, each
+Markdown sub-pass, templating, writes, index and search generation, ...) in
+profiler.stage(name), and each post in profiler.post(name). A Profiler
+records wall time for every call; the default NULL profiler records nothing
+and costs next to nothing.
+
+Stage times are inclusive: "markdown" contains its "markdown.*" sub-passes,
+and both count towards the post they ran in. Worker processes profile their
+own posts and send the events back with the results, so a trace shows one
+row per process.
+"""
+
+import contextlib
+import json
+import os
+import time
+
+POST = 'post'  # event name of a whole post
+
+
+class Profiler:
+    """Records (name, post, start ns, duration ns, pid) for every stage and post."""
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+        self._post = None
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.events.append((name, self._post, start, time.perf_counter_ns() - start, os.getpid()))
+
+    @contextlib.contextmanager
+    def post(self, name):
+        """Attribute the stages run inside to the post name."""
+        previous, self._post = self._post, name
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.events.append((POST, name, start, time.perf_counter_ns() - start, os.getpid()))
+            self._post = previous
+
+    def laps(self, prefix):
+        """Return lap(name): records the time since the previous lap (or since now) as stage prefix.name.
+
+        For timing consecutive passes of one function without nesting each in a with block.
+        """
+        last = time.perf_counter_ns()
+
+        def lap(name):
+            nonlocal last
+            now = time.perf_counter_ns()
+            self.events.append((f"{prefix}.{name}", self._post, last, now - last, os.getpid()))
+            last = now
+        return lap
+
+    def take_events(self):
+        """Return the events recorded so far and start a new list (workers hand them to the parent)."""
+        events, self.events = self.events, []
+        return events
+
+    # --- Reports ---
+
+    def stage_totals(self):
+        """{stage: [total ns, calls]} over the whole build."""
+        totals = {}
+        for name, _, _, duration, _ in self.events:
+            if name != POST:
+                total = totals.setdefault(name, [0, 0])
+                total[0] += duration
+                total[1] += 1
+        return totals
+
+    def post_totals(self):
+        """{post: (wall ns, {stage: [total ns, calls]})}."""
+        posts = {}
+        for name, post, _, duration, _ in self.events:
+            if post is None:
+                continue
+            wall, stages = posts.setdefault(post, [0, {}])
+            if name == POST:
+                posts[post][0] = wall + duration
+            else:
+                total = stages.setdefault(name, [0, 0])
+                total[0] += duration
+                total[1] += 1
+        return {post: (wall, stages) for post, (wall, stages) in posts.items()}
+
+    def report(self, top=10):
+        """Print the top slowest stages and posts."""
+        stages = sorted(self.stage_totals().items(), key=lambda item: item[1][0], reverse=True)
+        print(f"\n⏱️  Slowest stages (inclusive wall time, top {min(top, len(stages))} of {len(stages)}):")
+        for name, (total, calls) in stages[:top]:
+            print(f"   {name:<24} {total / 1e6:>10.1f} ms  {calls:>6} call{'s' if calls != 1 else ''}")
+
+        posts = sorted(self.post_totals().items(), key=lambda item: item[1][0], reverse=True)
+        if posts:
+            print(f"\n⏱️  Slowest posts (top {min(top, len(posts))} of {len(posts)}):")
+        for post, (wall, post_stages) in posts[:top]:
+            # Top-level stages only, so the breakdown adds up to (at most) the post's time
+            parts = sorted(((name, total) for name, (total, _) in post_stages.items() if '.' not in name),
+                           key=lambda item: item[1], reverse=True)
+            breakdown = ', '.join(f"{name} {total / 1e6:.1f} ms" for name, total in parts[:4])
+            print(f"   {post:<40} {wall / 1e6:>8.1f} ms  ({breakdown})")
+
+    def write_trace(self, path):
+        """Write the events as Chrome trace-event JSON (chrome://tracing, Perfetto, speedscope)."""
+        origin = min((start for _, _, start, _, _ in self.events), default=0)
+        trace = []
+        for name, post, start, duration, pid in sorted(self.events, key=lambda event: (event[2], -event[3])):
+            event = {'name': post if name == POST else name, 'cat': POST if name == POST else 'stage',
+                     'ph': 'X', 'ts': (start - origin) / 1000, 'dur': duration / 1000, 'pid': pid, 'tid': pid}
+            if post is not None:
+                event['args'] = {'post': post}
+            trace.append(event)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+
+class NullProfiler:
+    """Profiler that records nothing (the default)."""
+
+    enabled = False
+    events = ()
+
+    def stage(self, name):
+        return _NO_OP
+
+    def post(self, name):
+        return _NO_OP
+
+    def laps(self, prefix):
+        return _no_lap
+
+    def take_events(self):
+        return ()
+
+
+def _no_lap(name):
+    pass
+
+
+_NO_OP = contextlib.nullcontext()
+NULL = NullProfiler()
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Client-side search index for the Tufte Blog Builder
+
+Post titles and text (the tag-stripped text extract_metadata counts words
+in) are split into terms, lowercased and folded for Swedish: å/ä/æ become a,
+ö/ø become o, and decomposed forms (a + combining ring) are composed first,
+so "lopband", "löpband" and "LÖPBAND" all find the same posts.
+
+The index is written to search/ as small JSON files:
+
+    docs.json    {"v": 1, "docs": [[url, title, date] or null, ...], "shards": "abl..."}
+    <c>.json     {"term": [id, tf, gap, tf, gap, tf, ...], ...}
+
+A shard holds every term starting with character c (letters a-z and digits,
+everything else goes to "_"), so a query loads only the shards of its words.
+Postings are sorted by document id and stored as gaps from the previous id,
+each followed by the term's count in that document. Document ids are stable:
+a removed post leaves a null in docs, so updating one post rewrites only the
+shards its old and new terms live in. js/search.js is the matching client.
+
+Shards that were read or written stay in memory (postings as sorted id and
+count arrays, plus each term's encoded JSON), so a long-lived SearchIndex
+(watch mode) only re-encodes the terms an update actually changes.
+"""
+
+import html
+import json
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from itertools import accumulate, chain
+
+import outputs
+
+SEARCH_VERSION = 1
+WORD_RE = re.compile(r'\w+')
+FOLD_TABLE = str.maketrans({'å': 'a', 'ä': 'a', 'æ': 'a', 'ö': 'o', 'ø': 'o', 'é': 'e', 'è': 'e', 'ü': 'u'})
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+
+
+def normalize(word):
+    """Search key for a word (js/search.js applies the same folding to queries)."""
+    return unicodedata.normalize('NFC', word).lower().translate(FOLD_TABLE)
+
+
+def term_counts(text):
+    """Count the normalized terms in a post's plain text."""
+    counts = {}
+    # Compose first: \w does not match the combining marks of decomposed å/ä/ö
+    for word in WORD_RE.findall(unicodedata.normalize('NFC', html.unescape(text))):
+        term = normalize(word)
+        if MIN_TERM_LENGTH <= len(term) <= MAX_TERM_LENGTH:
+            counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+def shard_of(term):
+    first = term[0]
+    return first if 'a' <= first <= 'z' or '0' <= first <= '9' else '_'
+
+
+def encode_postings(ids, counts):
+    """Sorted doc ids and their counts -> flat gap-encoded list."""
+    flat = [0] * (2 * len(ids))
+    flat[0::2] = [doc_id - previous for previous, doc_id in zip(chain((0,), ids), ids)]
+    flat[1::2] = counts
+    return flat
+
+
+def _dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class SearchIndex:
+    """The search/ output directory plus the bookkeeping needed to update it per post."""
+
+    def __init__(self, output_dir, state_path, writer=None):
+        self.output_dir = output_dir
+        self.state_path = state_path
+        self.writer = writer or outputs.OutputWriter()
+        self.docs = {}      # source file name -> {'id', 'doc': [url, title, date], 'shards': str}
+        self.next_id = 0
+        self._shards = {}   # shard -> term -> (doc ids, counts), for the shards read or written so far
+        self._encoded = {}  # shard -> term -> '"term":[gap,count,...]'
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        # The state only describes what is on disk if the output is still there
+        if state.get('version') == SEARCH_VERSION and (self.output_dir / 'docs.json').exists():
+            self.docs = state['docs']
+            self.next_id = state['next_id']
+
+    def __contains__(self, name):
+        return name in self.docs
+
+    def _read_shard(self, shard):
+        if shard not in self._shards:
+            try:
+                with open(self.output_dir / f'{shard}.json', 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (FileNotFoundError, ValueError):
+                data = {}
+            self._shards[shard] = {term: (array('l', accumulate(flat[0::2])), array('l', flat[1::2]))
+                                   for term, flat in data.items()}
+            self._encoded[shard] = {}
+        return self._shards[shard]
+
+    def _shard_text(self, shard):
+        terms, encoded = self._shards[shard], self._encoded[shard]
+        for term in terms.keys() - encoded.keys():
+            ids, counts = terms[term]
+            encoded[term] = f'{_dump(term)}:{_dump(encode_postings(ids, counts))}'
+        return '{' + ','.join(encoded[term] for term in sorted(terms)) + '}'
+
+    def update(self, changed, present):
+        """Apply changed posts and drop posts that are gone; return the number of files written or removed.
+
+        changed maps source file names to (record dict, term counts); present is every post
+        that should stay in the index.
+        """
+        removed = [name for name in self.docs if name not in present]
+        if not changed and not removed:
+            return 0
+        full = len(changed) >= len(present)
+        if full:
+            # Everything is being reindexed: start over so ids stay dense. The files on disk
+            # stay until their replacements are written (unchanged ones are left untouched)
+            self.docs, self.next_id = {}, 0
+            self._shards, self._encoded = {}, {}
+            removed = []
+
+        touched = set()
+        dropped = set()
+        for name in list(changed) + removed:
+            old = self.docs.get(name)
+            if old is not None:
+                touched.update(old['shards'])
+                dropped.add(old['id'])
+        for name in removed:
+            del self.docs[name]
+        # Whether docs.json and the state change (not when posts were only edited in place)
+        docs_changed = full or bool(removed) or not (self.output_dir / 'docs.json').exists()
+
+        additions = {}      # shard -> term -> [(id, count)]
+        for name, (record, counts) in changed.items():
+            old = self.docs.get(name)
+            doc_id = old['id'] if old is not None else self.next_id
+            self.next_id = max(self.next_id, doc_id + 1)
+            shards = set()
+            for term, count in counts.items():
+                shard = shard_of(term)
+                shards.add(shard)
+                additions.setdefault(shard, {}).setdefault(term, []).append((doc_id, count))
+            touched.update(shards)
+            entry = {'id': doc_id, 'doc': [record['url'], record['title'], record['date']],
+                     'shards': ''.join(sorted(shards))}
+            docs_changed = docs_changed or entry != old
+            self.docs[name] = entry
+
+        self.output_dir.mkdir(exist_ok=True)
+        written = 0
+        for shard in sorted(touched):
+            if full:
+                self._shards[shard], self._encoded[shard] = {}, {}
+            terms, encoded = self._read_shard(shard), self._encoded[shard]
+            edits = {}      # term -> [removed postings, added postings]
+            if dropped:
+                for term, (ids, counts) in list(terms.items()):
+                    for doc_id in dropped:
+                        i = bisect_left(ids, doc_id)
+                        if i < len(ids) and ids[i] == doc_id:
+                            edits.setdefault(term, [set(), set()])[0].add((doc_id, counts[i]))
+                            del ids[i], counts[i]
+                    if not ids:
+                        del terms[term]
+                        encoded.pop(term, None)
+            for term, postings in additions.get(shard, {}).items():
+                ids, counts = terms.setdefault(term, (array('l'), array('l')))
+                for doc_id, count in postings:
+                    i = bisect_left(ids, doc_id)
+                    ids.insert(i, doc_id)
+                    counts.insert(i, count)
+                edits.setdefault(term, [set(), set()])[1].update(postings)
+            # A post re-added with the same count leaves the term's encoding as it was
+            for term, (before, after) in edits.items():
+                if before != after:
+                    encoded.pop(term, None)
+            path = self.output_dir / f'{shard}.json'
+            if terms:
+                written += self.writer.write_text(path, self._shard_text(shard))
+            elif path.exists():
+                path.unlink()
+                written += 1
+        if not docs_changed:
+            return written
+
+        docs = [None] * self.next_id
+        for entry in self.docs.values():
+            docs[entry['id']] = entry['doc']
+        shards = sorted(set(''.join(entry['shards'] for entry in self.docs.values())))
+        written += self.writer.write_text(self.output_dir / 'docs.json',
+                                          _dump({'v': SEARCH_VERSION, 'docs': docs, 'shards': ''.join(shards)}))
+        if full:
+            # Shards of terms no post uses any more
+            for path in self.output_dir.glob('*.json'):
+                if path.name != 'docs.json' and path.stem not in shards:
+                    path.unlink()
+                    written += 1
+
+        self.state_path.parent.mkdir(exist_ok=True)
+        with open(self.state_path, 'w', encoding='utf-8') as f:
+            f.write(_dump({'version': SEARCH_VERSION, 'next_id': self.next_id, 'docs': self.docs}))
+        return written
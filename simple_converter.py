@@ -2,31 +2,271 @@
 """
 Simple Google Docs to Blog Converter
 No external dependencies required
+
+The export is read from disk in chunks and fed to an incremental HTML parser,
+which hands over each paragraph, heading or list as soon as it is complete, so
+memory stays bounded by the largest single block however big the file is.
+Headings, emphasis (including Google Docs' class-based bold/italic spans),
+links and lists are kept as Markdown; literal *, _ and ` in the text are
+written as character references so they are not read as Markdown. The
+blocks are written either as a Markdown post for content/ (output path
+ending in .md) or, converted with markdown_engine, into
+posts/post-template.html.
 """
 
+import argparse
+import html
+import json
 import os
 import re
+import shutil
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from html.parser import HTMLParser
 from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+import markdown_engine
+from template_engine import load_template, prepare_post_template
+
+PROJECT_ROOT = Path(__file__).resolve().parent
+DEFAULT_TEMPLATE = PROJECT_ROOT / "posts" / "post-template.html"
+DEFAULT_OUTPUT_DIR = PROJECT_ROOT / "posts"
+DEFAULT_MARKDOWN_DIR = PROJECT_ROOT / "content"
+SUMMARY_NAME = "conversion-summary.json"
+
+CHUNK_SIZE = 64 * 1024
+TITLE_SEARCH_BLOCKS = 3  # blocks looked at (and held back) while picking the title
+
+SKIPPED_TAGS = {'head', 'script', 'style', 'title', 'noscript', 'template'}
+HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 3, 'h5': 3, 'h6': 3}
+BLOCK_TAGS = {'p', 'div', 'li', 'blockquote', 'pre', 'hr', 'tr', 'td', 'th'}
+INLINE_TAGS = {'a', 'span', 'em', 'i', 'strong', 'b'}
+
+WS_RE = re.compile(r'\s+')
+CSS_RULE_RE = re.compile(r'([^{}]+)\{([^{}]*)\}')
+CLASS_SELECTOR_RE = re.compile(r'^\s*\.([\w-]+)\s*$')
+ITALIC_RE = re.compile(r'font-style\s*:\s*italic')
+BOLD_RE = re.compile(r'font-weight\s*:\s*(?:bold|[6-9]00)')
+NOT_BOLD_RE = re.compile(r'font-weight\s*:\s*(?:normal|[1-4]00)')
+MARKDOWN_LINK_RE = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+# Literal emphasis and code characters in Docs text, as entities neither Markdown engine acts on
+MARKDOWN_ESCAPES = str.maketrans({'*': '&#42;', '_': '&#95;', '`': '&#96;'})
+GOOGLE_REDIRECT = 'https://www.google.com/url'
+
+# Inline images (src="data:...") are dropped before parsing: the parser would otherwise rescan
+# the whole unfinished tag on every chunk fed to it
+DATA_URI_RE = re.compile(r'''(\bsrc\s*=\s*["']?)data:[^"'\s>]*''', re.IGNORECASE)
+OPEN_DATA_URI_RE = re.compile(r'''(\bsrc\s*=\s*["']?)data:[^"'\s>]*\Z''', re.IGNORECASE)
+DATA_URI_END_RE = re.compile(r'''["'\s>]''')
+CARRY = 32  # long enough to hold a partial 'src="data:' split across chunks
+
+
+def link_target(href):
+    """Unwrap Google's redirect links (https://www.google.com/url?q=<target>&sa=...)."""
+    if href.startswith(GOOGLE_REDIRECT):
+        target = parse_qs(urlsplit(href).query).get('q')
+        if target:
+            return target[0]
+    return href
+
+
+class DocsParser(HTMLParser):
+    """Incremental Google Docs HTML to Markdown; finished blocks are queued in self.blocks."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = deque()
+        self._parts = []    # inline Markdown of the open block
+        self._inline = []   # open inline elements: (tag, index into _parts, marker or link target)
+        self._level = 0     # heading level of the open block
+        self._item = False  # is the open block a list item?
+        self._items = []    # finished items of the open list
+        self._lists = 0
+        self._skip = 0
+        self._css = None    # text of the <style> element being read
+        self._italic = set()
+        self._bold = set()
+
+    # --- parser callbacks ---
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or '' for name, value in attrs}
+        if tag == 'style':
+            self._css = []
+        if tag in SKIPPED_TAGS:
+            self._skip += 1
+            return
+        if self._skip:
+            return
 
-def clean_google_docs_text(text):
-    """Clean Google Docs text and convert to HTML paragraphs"""
-
-    # Split by double line breaks (paragraphs)
-    paragraphs = re.split(r'\n\s*\n', text.strip())
+        if tag in HEADING_TAGS or tag in BLOCK_TAGS:
+            self._end_block()
+            self._level = HEADING_TAGS.get(tag, 0)
+            if tag == 'p' and 'title' in attrs.get('class', '').split():
+                self._level = 1  # the Docs "Title" paragraph style
+            self._item = tag == 'li' or (self._lists > 0 and tag not in HEADING_TAGS)
+        elif tag in ('ul', 'ol'):
+            self._end_block()
+            self._lists += 1
+        elif tag == 'br':
+            self._parts.append('\n')
+        elif tag == 'img':
+            src = attrs.get('src', '')
+            if src and not src.startswith('data:'):
+                alt = html.escape(WS_RE.sub(' ', attrs.get('alt', '')).strip(), quote=False)
+                self._parts.append(f"![{alt}]({src})")
+        elif tag == 'a':
+            href = link_target(attrs.get('href', ''))
+            # in-document anchors (footnotes, comments) do not survive the conversion
+            self._inline.append((tag, len(self._parts), '' if href.startswith('#') else href))
+        elif tag in INLINE_TAGS:
+            self._inline.append((tag, len(self._parts), self._marker(tag, attrs)))
+
+    def handle_endtag(self, tag):
+        if tag == 'style' and self._css is not None:
+            self._read_css(''.join(self._css))
+            self._css = None
+        if tag in SKIPPED_TAGS:
+            self._skip = max(0, self._skip - 1)
+            return
+        if self._skip:
+            return
 
-    # Clean up each paragraph
-    html_paragraphs = []
-    for para in paragraphs:
-        para = para.strip()
-        if para:
-            # Remove extra whitespace and line breaks
-            para = re.sub(r'\s+', ' ', para)
-            # Skip if it's just whitespace
-            if para.strip():
-                html_paragraphs.append(f"<p>\n{para}\n</p>")
+        if tag in HEADING_TAGS or tag in BLOCK_TAGS:
+            self._end_block()
+        elif tag in ('ul', 'ol'):
+            self._end_block()
+            self._lists = max(0, self._lists - 1)
+            if not self._lists:
+                self._end_list()
+        elif tag in INLINE_TAGS and any(entry[0] == tag for entry in self._inline):
+            while self._close_inline()[0] != tag:
+                pass
+
+    def handle_data(self, data):
+        if self._css is not None:
+            self._css.append(data)
+        elif not self._skip:
+            self._parts.append(html.escape(WS_RE.sub(' ', data), quote=False).translate(MARKDOWN_ESCAPES))
+
+    def close(self):
+        super().close()
+        self._end_block()
+        self._end_list()
+
+    # --- helpers ---
+
+    def _read_css(self, css):
+        """Remember which classes Docs uses for italic and bold text."""
+        for selectors, declarations in CSS_RULE_RE.findall(css):
+            for selector in selectors.split(','):
+                m = CLASS_SELECTOR_RE.match(selector)
+                if m:
+                    if ITALIC_RE.search(declarations):
+                        self._italic.add(m.group(1))
+                    if BOLD_RE.search(declarations):
+                        self._bold.add(m.group(1))
+
+    def _marker(self, tag, attrs):
+        classes = set(attrs.get('class', '').split())
+        style = attrs.get('style', '')
+        italic = tag in ('em', 'i') or bool(classes & self._italic) or bool(ITALIC_RE.search(style))
+        bold = tag in ('strong', 'b') or bool(classes & self._bold) or bool(BOLD_RE.search(style))
+        if NOT_BOLD_RE.search(style):
+            bold = False
+        return '*' * (italic + 2 * bold)
+
+    def _close_inline(self):
+        """Wrap the text of the innermost open inline element in its Markdown."""
+        entry = self._inline.pop()
+        tag, start, value = entry
+        text = ''.join(self._parts[start:])
+        del self._parts[start:]
+        inner = text.strip()
+        if inner and value:
+            lead = text[:len(text) - len(text.lstrip())]
+            trail = text[len(text.rstrip()):]
+            # markers hug the text: "*word* " rather than "*word *"
+            inner = f'[{inner}]({value})' if tag == 'a' else f'{value}{inner}{value}'
+            text = lead + inner + trail
+        self._parts.append(text)
+        return entry
+
+    def _end_block(self):
+        while self._inline:
+            self._close_inline()
+        lines = (WS_RE.sub(' ', line).strip() for line in ''.join(self._parts).split('\n'))
+        text = '\n'.join(line for line in lines if line)
+        level, item = self._level, self._item
+        self._parts = []
+        self._level = 0
+        self._item = False
+        if not text:
+            return
+        if item:
+            self._items.append('- ' + text.replace('\n', ' '))
+            return
+        self._end_list()
+        self.blocks.append(f"{'#' * level} {text.replace(chr(10), ' ')}" if level else text)
+
+    def _end_list(self):
+        if self._items:
+            self.blocks.append('\n'.join(self._items))
+            self._items = []
+
+
+def read_chunks(input_file, chunk_size=CHUNK_SIZE):
+    """Yield the text of a file in chunks, with the contents of data: URIs cut out."""
+    carry = ''
+    in_uri = False
+    with open(input_file, 'r', encoding='utf-8') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            if in_uri:
+                end = DATA_URI_END_RE.search(chunk)
+                if not end:
+                    continue
+                chunk = chunk[end.start():]
+                in_uri = False
+            text = carry + chunk
+            m = OPEN_DATA_URI_RE.search(text)
+            if m:
+                in_uri = True
+                text = text[:m.end(1)]
+            text = DATA_URI_RE.sub(r'\1', text)
+            if in_uri:
+                carry = ''
+                yield text
+            else:
+                carry = text[-CARRY:]
+                yield text[:-CARRY]
+    yield carry
+
+
+def iter_markdown_blocks(input_file, chunk_size=CHUNK_SIZE):
+    """Yield the Markdown blocks of a Google Docs export as they complete, reading it in chunks."""
+    parser = DocsParser()
+    for chunk in read_chunks(input_file, chunk_size):
+        parser.feed(chunk)
+        while parser.blocks:
+            yield parser.blocks.popleft()
+    parser.close()
+    yield from parser.blocks
+
+
+def plain_text(markdown):
+    """Markdown block without link syntax or emphasis markers (escaped characters are kept)."""
+    text = MARKDOWN_LINK_RE.sub(r'\1', markdown).replace('*', '')
+    for char in '*_`':
+        text = text.replace(f'&#{ord(char)};', char)
+    return text
 
-    return '\n\n'.join(html_paragraphs)
 
 def extract_title(text):
     """Extract title from first line or first meaningful paragraph"""
@@ -41,106 +281,239 @@ def extract_title(text):
 
     return "Untitled Post"
 
-def create_blog_post(title, content, template_path="posts/post-template.html"):
-    """Create blog post from template"""
 
-    # Load template
-    try:
-        with open(template_path, 'r', encoding='utf-8') as f:
-            template = f.read()
-    except FileNotFoundError:
-        print("❌ Template not found. Make sure post-template.html exists.")
-        return None
-
-    # Generate meta info
-    date_str = datetime.now().strftime("%B %d, %Y")
-    word_count = len(content.split())
-    reading_time = max(1, round(word_count / 200))
-    meta = f"{date_str} · {reading_time} min read"
+def split_title(blocks):
+    """Pick the title from the first blocks: the first heading, else the first substantial line.
 
-    # Replace in template
-    blog_post = template.replace("Post Title - Tufte-Style Blog", f"{title} - Tufte-Style Blog")
-    blog_post = blog_post.replace("Your Post Title Here", title)
-    blog_post = blog_post.replace("Date · Reading time", meta)
+    Returns (title, remaining blocks); a heading used as the title is dropped from the body.
+    """
+    blocks = iter(blocks)
+    head = []
+    title = None
+    for block in blocks:
+        if block.startswith('#'):
+            title = plain_text(block.lstrip('#')).strip()
+            break
+        head.append(block)
+        if len(head) == TITLE_SEARCH_BLOCKS:
+            break
+    if not title:
+        title = extract_title('\n'.join(plain_text(block) for block in head))
 
-    # Replace content
-    content_section = f'<section class="content">\n{content}\n</section>'
-    blog_post = re.sub(r'<section class="content">.*?</section>', content_section, blog_post, flags=re.DOTALL)
+    def body():
+        yield from head
+        yield from blocks
+    return title, body()
 
-    return blog_post
 
-def convert_google_docs_file(input_file, output_file=None):
+def article_meta(word_count):
+    date_str = datetime.now().strftime("%B %d, %Y")
+    reading_time = max(1, round(word_count / 200))
+    return f"{date_str} · {reading_time} min read"
+
+
+def write_markdown_post(title, blocks, out):
+    """Write the blocks as a content/ post with title and date directives."""
+    out.write(f"<!-- title: {title} -->\n")
+    out.write(f"<!-- date: {datetime.now().strftime('%d/%m-%Y')} -->\n")
+    for block in blocks:
+        out.write(f"\n{block}\n")
+
+
+def write_html_post(title, blocks, out, template):
+    """Write the blocks into the post template.
+
+    The reading time in the header depends on the whole text, so the body is spooled to a
+    temporary file first and copied in after the header.
+    """
+    word_count = 0
+    with tempfile.TemporaryFile('w+', encoding='utf-8') as body:
+        for block in blocks:
+            word_count += len(plain_text(block).split())
+            body.write(markdown_engine.convert(block) + '\n\n')
+        head, tail = template.render_around(
+            'CONTENT', TITLE=title, ARTICLE_DATE=article_meta(word_count), MATH_SCRIPTS='')
+        out.write(head)
+        body.seek(0)
+        shutil.copyfileobj(body, out)
+        out.write(tail)
+
+
+def output_name(input_file, markdown=False):
+    """File name of the converted post for an export."""
+    stem = Path(input_file).stem
+    return f"{stem}.md" if markdown else f"{stem}-converted.html"
+
+
+def convert_file(input_file, output_file, template=None):
+    """Convert one export; returns the title. Raises on failure, leaving no partial output.
+
+    template is the compiled post template (needed unless output_file ends in .md).
+    """
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = output_file.with_name(f".{output_file.name}.{os.getpid()}.tmp")
+    try:
+        title, blocks = split_title(iter_markdown_blocks(input_file))
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            if output_file.suffix == '.md':
+                write_markdown_post(title, blocks, f)
+            else:
+                write_html_post(title, blocks, f, template)
+        os.replace(temp_file, output_file)
+    finally:
+        if temp_file.exists():
+            temp_file.unlink()
+    return title
+
+
+def convert_google_docs_file(input_file, output_file=None, template_path=DEFAULT_TEMPLATE):
     """Convert a Google Docs HTML export to blog post"""
 
-    try:
-        with open(input_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+    # Generate output filename
+    if not output_file:
+        output_file = DEFAULT_OUTPUT_DIR / output_name(input_file)
 
-        # Extract text content (simple approach)
-        # Remove HTML tags but keep structure
-        content = re.sub(r'<script[^>]*>.*?</script>', '', content, flags=re.DOTALL)
-        content = re.sub(r'<style[^>]*>.*?</style>', '', content, flags=re.DOTALL)
-        content = re.sub(r'<[^>]+>', '\n', content)  # Replace tags with newlines
+    template = None
+    if Path(output_file).suffix != '.md':
+        try:
+            template = load_template(template_path, prepare_post_template)
+        except FileNotFoundError:
+            print("❌ Template not found. Make sure post-template.html exists.")
+            return False
 
-        # Clean up whitespace
-        content = re.sub(r'\n\s*\n\s*\n+', '\n\n', content)
+    try:
+        title = convert_file(input_file, output_file, template)
+    except Exception as e:
+        print(f"❌ Error converting {input_file}: {e}")
+        return False
 
-        # Extract title
-        title = extract_title(content)
+    print(f"✅ Converted: {input_file}")
+    print(f"📄 Output: {output_file}")
+    print(f"📖 Title: {title}")
+    return True
 
-        # Clean content
-        clean_content = clean_google_docs_text(content)
 
-        # Create blog post
-        blog_post = create_blog_post(title, clean_content)
+# --- Batch conversion ---
 
-        if blog_post:
-            # Generate output filename
-            if not output_file:
-                base_name = Path(input_file).stem
-                output_file = f"posts/{base_name}-converted.html"
+_worker_template = None
 
-            # Ensure posts directory exists
-            os.makedirs("posts", exist_ok=True)
 
-            with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(blog_post)
+def _init_worker(template):
+    """Process pool initializer: the template is loaded once, in the parent, and shared."""
+    global _worker_template
+    _worker_template = template
 
-            print(f"✅ Converted: {input_file}")
-            print(f"📄 Output: {output_file}")
-            print(f"📖 Title: {title}")
-            return True
 
+def _convert_worker(input_file, output_file):
+    """Convert one export in a worker; returns its summary entry."""
+    entry = {'input': str(input_file), 'output': str(output_file)}
+    start = time.perf_counter()
+    try:
+        entry['title'] = convert_file(input_file, output_file, _worker_template)
+        entry['status'] = 'converted'
     except Exception as e:
-        print(f"❌ Error converting {input_file}: {e}")
-        return False
-
-def main():
-    import sys
+        entry['status'] = 'failed'
+        entry['error'] = f"{type(e).__name__}: {e}"
+    entry['seconds'] = round(time.perf_counter() - start, 4)
+    return entry
+
+
+def convert_directory(input_dir, output_dir=None, jobs=1, force=False, markdown=False,
+                      template_path=DEFAULT_TEMPLATE, summary_path=None):
+    """Convert every *.html export in input_dir, jobs at a time.
+
+    Exports whose output is newer than the export are skipped unless force is set. A JSON
+    summary with per-file status and timings is written to summary_path (default
+    <input_dir>/conversion-summary.json). Returns the summary.
+    """
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir) if output_dir else (DEFAULT_MARKDOWN_DIR if markdown else DEFAULT_OUTPUT_DIR)
+    summary_path = Path(summary_path) if summary_path else input_dir / SUMMARY_NAME
+    started = time.perf_counter()
+
+    template = None
+    if not markdown:
+        try:
+            template = load_template(template_path, prepare_post_template)
+        except FileNotFoundError:
+            print("❌ Template not found. Make sure post-template.html exists.")
+            return None
+
+    entries = []
+    pending = []
+    for input_file in sorted(input_dir.glob("*.html")):
+        output_file = output_dir / output_name(input_file, markdown)
+        if (not force and output_file.exists()
+                and output_file.stat().st_mtime_ns >= input_file.stat().st_mtime_ns):
+            entries.append({'input': str(input_file), 'output': str(output_file),
+                            'status': 'skipped', 'seconds': 0.0})
+        else:
+            pending.append((input_file, output_file))
+
+    if not entries and not pending:
+        print(f"No HTML files found in {input_dir}")
+        return None
 
-    if len(sys.argv) < 2:
-        print("Usage: python3 simple_converter.py <google_docs_file.html> [output_file.html]")
-        print("Or: python3 simple_converter.py <directory_with_html_files>")
-        return
+    print(f"Converting {len(pending)} of {len(entries) + len(pending)} files with {jobs} worker(s)...")
+    if jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(template,)) as pool:
+            futures = [pool.submit(_convert_worker, *args) for args in pending]
+            for future in as_completed(futures):
+                entries.append(_report(future.result()))
+    else:
+        _init_worker(template)
+        for args in pending:
+            entries.append(_report(_convert_worker(*args)))
+
+    entries.sort(key=lambda entry: entry['input'])
+    counts = {status: sum(entry['status'] == status for entry in entries)
+              for status in ('converted', 'skipped', 'failed')}
+    summary = {'input_dir': str(input_dir), 'output_dir': str(output_dir), 'jobs': jobs,
+               'seconds': round(time.perf_counter() - started, 4), **counts, 'files': entries}
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+    print(f"✅ Converted {counts['converted']}, skipped {counts['skipped']} (up to date), "
+          f"failed {counts['failed']} in {summary['seconds']:.2f}s")
+    print(f"📝 Summary: {summary_path}")
+    return summary
+
+
+def _report(entry):
+    if entry['status'] == 'converted':
+        print(f"✅ {entry['input']} → {entry['output']} ({entry['seconds']:.2f}s)")
+    else:
+        print(f"❌ Error converting {entry['input']}: {entry['error']}")
+    return entry
 
-    input_path = sys.argv[1]
-    output_path = sys.argv[2] if len(sys.argv) > 2 else None
 
-    path = Path(input_path)
+def main():
+    parser = argparse.ArgumentParser(description="Convert Google Docs HTML exports to blog posts")
+    parser.add_argument('input', help="a Google Docs export (.html) or a directory of them")
+    parser.add_argument('output', nargs='?',
+                        help="output file for a single export (.html, or .md for a content/ post)")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="directory: convert this many files in parallel (0 = one per CPU)")
+    parser.add_argument('--force', action='store_true',
+                        help="directory: convert even exports whose output is up to date")
+    parser.add_argument('--markdown', action='store_true',
+                        help="directory: write Markdown posts (default into content/)")
+    parser.add_argument('--output-dir', help="directory: where to write the posts (default posts/ or content/)")
+    parser.add_argument('--summary', help="directory: JSON summary path (default <directory>/conversion-summary.json)")
+    args = parser.parse_args()
+
+    path = Path(args.input)
 
     if path.is_file():
-        convert_google_docs_file(input_path, output_path)
+        convert_google_docs_file(path, args.output)
     elif path.is_dir():
-        html_files = list(path.glob("*.html"))
-        if not html_files:
-            print(f"No HTML files found in {input_path}")
-            return
-
-        print(f"Converting {len(html_files)} files...")
-        for html_file in html_files:
-            convert_google_docs_file(str(html_file))
+        convert_directory(path, args.output_dir, jobs=args.jobs or os.cpu_count() or 1, force=args.force,
+                          markdown=args.markdown, summary_path=args.summary)
     else:
-        print(f"Path not found: {input_path}")
+        print(f"Path not found: {args.input}")
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Compiled HTML templates for the Tufte Blog Builder
+
+A template is parsed once into literal segments and named {{SLOT}} markers;
+rendering is a single join. Loaded templates are cached and only re-parsed
+when the file on disk changes.
+"""
+
+import re
+from pathlib import Path
+
+SLOT_RE = re.compile(r'\{\{([A-Z][A-Z0-9_]*)\}\}')
+CONTENT_SECTION_RE = re.compile(r'<section class="content">.*?</section>', re.DOTALL)
+
+# Placeholder text used by older copies of post-template.html, mapped onto slots
+POST_TEMPLATE_ALIASES = {
+    "Post Title - Tufte-Style Blog": "{{TITLE}} - Tufte-Style Blog",
+    "Your Post Title Here": "{{TITLE}}",
+    "Date · Reading time": "{{ARTICLE_DATE}}",
+}
+
+
+class CompiledTemplate:
+    """Literal segments interleaved with slot names: segments[0], slots[0], segments[1], ..."""
+
+    def __init__(self, segments, slots):
+        self.segments = segments
+        self.slots = slots
+
+    def render(self, **values):
+        """Fill the slots; a slot without a value keeps its {{NAME}} marker."""
+        parts = [self.segments[0]]
+        for name, segment in zip(self.slots, self.segments[1:]):
+            parts.append(values.get(name, f'{{{{{name}}}}}'))
+            parts.append(segment)
+        return ''.join(parts)
+
+    def render_around(self, name, **values):
+        """Render the text before and after slot name, so its content can be streamed in between.
+
+        Raises ValueError if the template has no such slot.
+        """
+        i = self.slots.index(name)
+        head = CompiledTemplate(self.segments[:i + 1], self.slots[:i]).render(**values)
+        tail = CompiledTemplate(self.segments[i + 1:], self.slots[i + 1:]).render(**values)
+        return head, tail
+
+
+def compile_template(text):
+    """Parse template text into a CompiledTemplate."""
+    segments = []
+    slots = []
+    pos = 0
+    for m in SLOT_RE.finditer(text):
+        segments.append(text[pos:m.start()])
+        slots.append(m.group(1))
+        pos = m.end()
+    segments.append(text[pos:])
+    return CompiledTemplate(segments, slots)
+
+
+def prepare_post_template(text):
+    """Turn post-template.html into slot form: sample content becomes {{CONTENT}}."""
+    for literal, slot in POST_TEMPLATE_ALIASES.items():
+        text = text.replace(literal, slot)
+    return CONTENT_SECTION_RE.sub(lambda m: '<section class="content">\n{{CONTENT}}\n</section>', text)
+
+
+_cache = {}
+
+
+def load_template(path, prepare=None):
+    """Load and compile a template file, reusing the compiled form while the file is unchanged.
+
+    prepare optionally rewrites the raw text before compiling (e.g. prepare_post_template).
+    Raises FileNotFoundError if the file does not exist.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (path, prepare)
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    cached = _cache.get(key)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    text = path.read_text(encoding='utf-8')
+    template = compile_template(prepare(text) if prepare else text)
+    _cache[key] = (stamp, template)
+    return template
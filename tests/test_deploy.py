@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Incremental dist/ sync (deploy.py): the deploy diff, in-place edits of static
+sources and the refusal to clear directories an earlier sync did not create.
+
+    python3 -m pytest tests
+    python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import deploy  # noqa: E402
+import outputs  # noqa: E402
+
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tempdir.name) / 'site'
+        self.dist = Path(self.tempdir.name) / 'dist'
+        self.write('posts/a.html', '<p>a</p>')
+        self.write('posts/b.html', '<p>b</p>')
+        self.write('css/style.css', 'body { color: #000; }\n')
+        self.files = ['css/style.css', 'posts/a.html', 'posts/b.html']
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write(self, rel, text):
+        """Write a generated file the way the build does: atomically replaced."""
+        path = self.root / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        outputs.OutputWriter().write_text(path, text)
+
+    def sync(self, files=None):
+        return deploy.sync(self.root, self.dist, self.files if files is None else files)
+
+    def test_first_sync_adds_everything(self):
+        diff = self.sync()
+        self.assertEqual(diff['added'], self.files)
+        self.assertEqual((diff['changed'], diff['removed'], diff['unchanged']), ([], [], 0))
+        for rel in self.files:
+            self.assertEqual((self.dist / rel).read_bytes(), (self.root / rel).read_bytes())
+        self.assertTrue((self.dist / deploy.MARKER).is_file())
+
+    def test_resync_without_changes(self):
+        self.sync()
+        diff = self.sync()
+        self.assertEqual((diff['added'], diff['changed'], diff['removed']), ([], [], []))
+        self.assertEqual(diff['unchanged'], len(self.files))
+
+    def test_added_changed_and_removed(self):
+        self.sync()
+        self.write('posts/a.html', '<p>a, edited</p>')
+        self.write('posts/c.html', '<p>c</p>')
+        diff = self.sync(['css/style.css', 'posts/a.html', 'posts/c.html'])
+        self.assertEqual(diff['added'], ['posts/c.html'])
+        self.assertEqual(diff['changed'], ['posts/a.html'])
+        self.assertEqual(diff['removed'], ['posts/b.html'])
+        self.assertEqual(diff['unchanged'], 1)
+        self.assertEqual((self.dist / 'posts/a.html').read_text(), '<p>a, edited</p>')
+        self.assertFalse((self.dist / 'posts/b.html').exists())
+
+    def test_generated_files_are_linked_and_sources_copied(self):
+        self.sync()
+        self.assertTrue(os.path.samefile(self.dist / 'posts/a.html', self.root / 'posts/a.html'))
+        self.assertFalse(os.path.samefile(self.dist / 'css/style.css', self.root / 'css/style.css'))
+
+    def test_in_place_edit_of_static_source(self):
+        self.sync()
+        with open(self.root / 'css/style.css', 'a', encoding='utf-8') as f:
+            f.write('p { margin: 0; }\n')
+        diff = self.sync()
+        self.assertEqual(diff['changed'], ['css/style.css'])
+        self.assertEqual((self.dist / 'css/style.css').read_bytes(), (self.root / 'css/style.css').read_bytes())
+
+    def test_source_linked_by_an_older_sync_is_copied_again(self):
+        self.sync()
+        (self.dist / 'css/style.css').unlink()
+        os.link(self.root / 'css/style.css', self.dist / 'css/style.css')
+        diff = self.sync()
+        self.assertEqual(diff['changed'], ['css/style.css'])
+        self.assertFalse(os.path.samefile(self.dist / 'css/style.css', self.root / 'css/style.css'))
+
+    def test_refuses_non_empty_directory_without_marker(self):
+        self.dist.mkdir()
+        (self.dist / 'keep.txt').write_text('not part of the site')
+        with self.assertRaises(ValueError):
+            self.sync()
+        self.assertEqual(sorted(path.name for path in self.dist.iterdir()), ['keep.txt'])
+
+    def test_refuses_project_directories(self):
+        for dist_dir in (self.root, self.root / 'posts', self.root / 'posts' / 'out', self.root.parent):
+            with self.subTest(dist=dist_dir), self.assertRaises(ValueError):
+                deploy.check_dist_dir(self.root, dist_dir)
+
+
+if __name__ == '__main__':
+    unittest.main()
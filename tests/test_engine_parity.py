@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Parity of the two Markdown engines over the benchmark corpus
+
+The token engine (markdown_engine.py) has to produce the regex converter's
+output byte for byte, except inside fenced code blocks: the regex converter
+wraps their contents in <p> and applies emphasis to them (so a `*` in code can
+pair with one in the text after the block), while the token engine keeps
+code verbatim. That known difference is pinned down exactly below; any other
+difference fails.
+
+    python3 -m pytest tests
+    python3 -m unittest discover tests
+"""
+
+import re
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(PROJECT_ROOT / 'benchmarks'))
+
+import build  # noqa: E402
+import corpus  # noqa: E402
+import markdown_engine  # noqa: E402
+
+CORPUS_POSTS = 200
+FENCED_CODE_RE = re.compile(r'^```.*?^```\n', re.MULTILINE | re.DOTALL)
+
+# The known difference: what each engine makes of a fenced code block
+FENCED_SAMPLE = "Före koden.\n\n```\ndef f(x):\n    return x * 2\n```\n\nEfter *koden*.\n"
+FENCED_REGEX = ('<p>Före koden.</p>\n\n<pre><code>\n\n<p>def f(x):\n    return x <em> 2\n</code></pre></p>\n\n'
+                '<p>Efter </em>koden*.</p>')
+FENCED_TOKENS = ('<p>Före koden.</p>\n\n<pre><code>\ndef f(x):\n    return x * 2\n</code></pre>\n\n'
+                 '<p>Efter <em>koden</em>.</p>')
+
+
+def regex_convert(text):
+    return build.BlogBuilder('regex').convert_markdown_to_html(text)
+
+
+class EngineParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tempdir = tempfile.TemporaryDirectory()
+        root = Path(cls.tempdir.name)
+        paths = corpus.generate_corpus(root / 'content', CORPUS_POSTS, seed=0)
+        # Links are resolved before conversion, as in a build
+        builder = build.BlogBuilder(project_root=root)
+        mapping = builder._build_post_mapping()
+        cls.posts = {path.name: builder._resolve_internal_links(path.read_text(encoding='utf-8'), mapping)
+                     for path in paths}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tempdir.cleanup()
+
+    def test_corpus_matches_outside_fenced_code(self):
+        for name, text in self.posts.items():
+            text = FENCED_CODE_RE.sub('', text)
+            with self.subTest(post=name):
+                self.assertEqual(markdown_engine.convert(text), regex_convert(text))
+
+    def test_only_posts_with_fenced_code_differ(self):
+        differing = {name for name, text in self.posts.items() if markdown_engine.convert(text) != regex_convert(text)}
+        fenced = {name for name, text in self.posts.items() if FENCED_CODE_RE.search(text)}
+        self.assertTrue(fenced, "the corpus should exercise fenced code")
+        self.assertLessEqual(differing, fenced)
+
+    def test_known_fenced_code_difference(self):
+        self.assertEqual(regex_convert(FENCED_SAMPLE), FENCED_REGEX)
+        self.assertEqual(markdown_engine.convert(FENCED_SAMPLE), FENCED_TOKENS)
+
+
+if __name__ == '__main__':
+    unittest.main()
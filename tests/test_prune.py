@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Removal of generated pages: prune_outputs after a build and `build.py gc`
+(collect_garbage), across slug collisions, renames, deleted posts and dropped
+index pages, including the pages' compressed siblings.
+
+    python3 -m pytest tests
+    python3 -m unittest discover tests
+"""
+
+import contextlib
+import io
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import build  # noqa: E402
+
+
+class PruneTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tempdir.name)
+        (self.root / 'content').mkdir()
+        (self.root / 'posts').mkdir()
+        shutil.copy(PROJECT_ROOT / 'posts' / 'post-template.html', self.root / 'posts')
+        self.write_post('a', 'Shared Title')
+        self.write_post('b', 'Shared Title')
+        self.write_post('c', 'Another Post')
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def write_post(self, name, title):
+        text = f"<!-- title: {title} -->\n<!-- date: 1/2-2025 -->\nText of {name}.\n"
+        (self.root / 'content' / f'{name}.md').write_text(text, encoding='utf-8')
+
+    def run_builder(self, method='build_all', **kwargs):
+        """Run a build step in a fresh builder (as separate invocations would) without its output."""
+        builder = build.BlogBuilder(page_size=1, project_root=self.root)
+        with contextlib.redirect_stdout(io.StringIO()):
+            return getattr(builder, method)(**kwargs)
+
+    def pages(self, directory):
+        return sorted(path.name for path in (self.root / directory).glob('*.html*'))
+
+    def add_siblings(self, rel):
+        for suffix in ('.gz', '.br'):
+            (self.root / (rel + suffix)).write_bytes(b'compressed')
+
+    def test_slug_collision_keeps_both_pages(self):
+        self.run_builder()
+        self.assertEqual(self.pages('posts'),
+                         ['another-post.html', 'post-template.html', 'shared-title-2.html', 'shared-title.html'])
+        self.assertIn('Text of a.', (self.root / 'posts/shared-title.html').read_text(encoding='utf-8'))
+        self.assertIn('Text of b.', (self.root / 'posts/shared-title-2.html').read_text(encoding='utf-8'))
+
+    def test_retitled_post_removes_its_old_page_and_siblings(self):
+        self.run_builder()
+        self.add_siblings('posts/shared-title-2.html')
+        self.write_post('b', 'Its Own Title')
+        self.run_builder()
+        self.assertEqual(self.pages('posts'),
+                         ['another-post.html', 'its-own-title.html', 'post-template.html', 'shared-title.html'])
+
+    def test_deleted_post_removes_its_page_and_siblings(self):
+        self.run_builder()
+        self.add_siblings('posts/another-post.html')
+        (self.root / 'content' / 'c.md').unlink()
+        self.run_builder()
+        self.assertEqual(self.pages('posts'), ['post-template.html', 'shared-title-2.html', 'shared-title.html'])
+
+    def test_dropped_index_page_removes_its_siblings(self):
+        self.run_builder()
+        self.assertEqual(self.pages('page'), ['2.html', '3.html'])
+        self.add_siblings('page/3.html')
+        (self.root / 'content' / 'c.md').unlink()
+        self.run_builder()
+        self.assertEqual(self.pages('page'), ['2.html'])
+
+    def test_gc_dry_run_leaves_files(self):
+        self.run_builder()
+        (self.root / 'posts/stray.html').write_text('<p>left over</p>', encoding='utf-8')
+        self.add_siblings('posts/stray.html')
+        (self.root / 'page/9.html').write_text('<p>left over</p>', encoding='utf-8')
+        before = self.pages('posts') + self.pages('page')
+        orphans = self.run_builder('collect_garbage', dry_run=True)
+        self.assertEqual(orphans, ['page/9.html', 'posts/stray.html'])
+        self.assertEqual(self.pages('posts') + self.pages('page'), before)
+
+    def test_gc_removes_only_orphans(self):
+        self.run_builder()
+        (self.root / 'posts/stray.html').write_text('<p>left over</p>', encoding='utf-8')
+        self.add_siblings('posts/stray.html')
+        self.add_siblings('posts/shared-title.html')
+        orphans = self.run_builder('collect_garbage')
+        self.assertEqual(orphans, ['posts/stray.html'])
+        self.assertEqual(self.pages('posts'),
+                         ['another-post.html', 'post-template.html', 'shared-title-2.html', 'shared-title.html',
+                          'shared-title.html.br', 'shared-title.html.gz'])
+
+    def test_gc_follows_collision_renames(self):
+        self.run_builder()
+        # a.md goes away: b.md takes over shared-title.html, so shared-title-2.html is orphaned
+        (self.root / 'content' / 'a.md').unlink()
+        orphans = self.run_builder('collect_garbage')
+        self.assertEqual(orphans, ['posts/shared-title-2.html'])
+        self.assertEqual(self.pages('posts'), ['another-post.html', 'post-template.html', 'shared-title.html'])
+
+
+if __name__ == '__main__':
+    unittest.main()
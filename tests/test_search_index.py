@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Incremental updates of the sharded search index (search_index.py): an index
+built from scratch and then updated with an edit and a delete has to hold the
+same postings as one rebuilt from the final posts.
+
+    python3 -m pytest tests
+    python3 -m unittest discover tests
+"""
+
+import json
+import sys
+import tempfile
+import unittest
+from itertools import accumulate
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import search_index  # noqa: E402
+
+POSTS = {
+    'alfa.md': ('Alfa', 'Löpband och löpning, löpband igen. Zebra 2024.'),
+    'beta.md': ('Beta', 'Ett löpband står i köket; ingen äter där.'),
+    'gamma.md': ('Gamma', 'Zebror springer fort. Ångest 1999.'),
+    'delta.md': ('Delta', 'Köket är tomt, bara ett bord.'),
+}
+EDITED = ('Beta', 'Inget löpband längre, bara en cykel och en zebra.')
+
+
+def changes(posts):
+    return {name: ({'url': f'posts/{name[:-3]}.html', 'title': title, 'date': '2025-01-01'},
+                   search_index.term_counts(f'{title} {text}'))
+            for name, (title, text) in posts.items()}
+
+
+def read_index(output_dir):
+    """The index on disk as {term: {url: count}} plus the documents, independent of doc ids."""
+    docs = json.loads((output_dir / 'docs.json').read_text(encoding='utf-8'))
+    urls = [doc and doc[0] for doc in docs['docs']]
+    postings = {}
+    for path in output_dir.glob('*.json'):
+        if path.name == 'docs.json':
+            continue
+        for term, flat in json.loads(path.read_text(encoding='utf-8')).items():
+            assert search_index.shard_of(term) == path.stem, (term, path.name)
+            ids = list(accumulate(flat[0::2]))
+            postings[term] = {urls[doc_id]: count for doc_id, count in zip(ids, flat[1::2])}
+    return sorted(filter(None, docs['docs'])), postings, sorted(docs['shards'])
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tempdir.name)
+
+    def tearDown(self):
+        self.tempdir.cleanup()
+
+    def index(self, name):
+        (self.root / name).mkdir(exist_ok=True)
+        return search_index.SearchIndex(self.root / name / 'search', self.root / name / 'search.json')
+
+    def rebuilt(self, posts):
+        """An index built from scratch over posts, read back from disk."""
+        self.index('rebuilt').update(changes(posts), set(posts))
+        return read_index(self.root / 'rebuilt' / 'search')
+
+    def test_edit_and_delete_match_a_rebuild(self):
+        index = self.index('incremental')
+        index.update(changes(POSTS), set(POSTS))
+        self.assertEqual(read_index(index.output_dir), self.rebuilt(POSTS))
+
+        final = dict(POSTS, **{'beta.md': EDITED})
+        del final['gamma.md']
+        # A fresh SearchIndex, as in the next build: everything else is read back from disk
+        index = self.index('incremental')
+        index.update(changes({'beta.md': EDITED}), set(final))
+        docs, postings, shards = read_index(index.output_dir)
+        self.assertEqual((docs, postings, shards), self.rebuilt(final))
+        self.assertNotIn('zebror', postings)
+        self.assertFalse((index.output_dir / '1.json').exists(), "shard of terms no post uses any more")
+
+    def test_ids_stay_stable_across_updates(self):
+        index = self.index('incremental')
+        index.update(changes(POSTS), set(POSTS))
+        ids = {name: entry['id'] for name, entry in index.docs.items()}
+        index.update({}, set(POSTS) - {'beta.md'})
+        index.update(changes({'beta.md': EDITED}), set(POSTS))
+        self.assertEqual({name: entry['id'] for name, entry in index.docs.items() if name != 'beta.md'},
+                         {name: doc_id for name, doc_id in ids.items() if name != 'beta.md'})
+        self.assertEqual(read_index(index.output_dir), self.rebuilt(dict(POSTS, **{'beta.md': EDITED})))
+
+    def test_unchanged_update_writes_nothing(self):
+        index = self.index('incremental')
+        index.update(changes(POSTS), set(POSTS))
+        self.assertEqual(index.update(changes({'delta.md': POSTS['delta.md']}), set(POSTS)), 0)
+
+    def test_postings_round_trip(self):
+        ids, counts = [3, 4, 10, 200], [1, 5, 2, 1]
+        flat = search_index.encode_postings(ids, counts)
+        self.assertEqual(flat, [3, 1, 1, 5, 6, 2, 190, 1])
+        self.assertEqual(list(accumulate(flat[0::2])), ids)
+        self.assertEqual(flat[1::2], counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,17 @@
+#!/usr/bin/env node
+// Math renderer for `python3 build.py --prerender-math` (needs the katex package: npm install).
+// Reads one JSON request per line, {"tex": "...", "display": true}, and answers each
+// with {"html": "..."} or {"error": "..."} on its own line.
+const katex = require('katex');
+const readline = require('readline');
+
+readline.createInterface({input: process.stdin}).on('line', (line) => {
+  let reply;
+  try {
+    const request = JSON.parse(line);
+    reply = {html: katex.renderToString(request.tex, {displayMode: request.display, throwOnError: true})};
+  } catch (e) {
+    reply = {error: String(e.message || e)};
+  }
+  process.stdout.write(JSON.stringify(reply) + '\n');
+});
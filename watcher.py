@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+File change watching for `python3 build.py watch`
+
+Uses Linux inotify (through ctypes, no dependencies) when available and falls
+back to polling mtimes. Both watchers report changed paths; wait_for_changes()
+coalesces a burst of saves into one batch.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_ATTRIB | IN_MODIFY
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _split_targets(targets):
+    """Map each directory to watch onto the file names of interest in it (None = every file)."""
+    watched = {}
+    for target in targets:
+        target = Path(target).resolve()
+        if target.is_dir():
+            watched[target] = None
+        elif target.parent.is_dir():
+            names = watched.setdefault(target.parent, set())
+            if names is not None:
+                names.add(target.name)
+    return watched
+
+
+class InotifyWatcher:
+    """Watch directories (non-recursively) with inotify."""
+
+    name = 'inotify'
+
+    def __init__(self, targets):
+        libc_name = ctypes.util.find_library('c')
+        if not libc_name:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError("inotify not available")
+        self._libc = libc
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        self._dirs = {}
+        for directory, names in _split_targets(targets).items():
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                self.close()
+                raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+            self._dirs[wd] = (directory, names)
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds; return the set of paths that changed."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0').decode('utf-8', 'surrogateescape')
+            offset += length
+            if wd not in self._dirs or not name:
+                continue
+            directory, names = self._dirs[wd]
+            if names is None or name in names:
+                changed.add(directory / name)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """Fallback watcher: compare (mtime, size) snapshots every interval seconds."""
+
+    name = 'polling'
+
+    def __init__(self, targets, interval=0.1):
+        self.interval = interval
+        self._watched = _split_targets(targets)
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        for directory, names in self._watched.items():
+            try:
+                entries = list(os.scandir(directory))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if names is not None and entry.name not in names:
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[directory / entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def poll(self, timeout):
+        """Wait up to timeout seconds; return the set of paths that changed."""
+        deadline = time.monotonic() + timeout
+        while True:
+            current = self._scan()
+            changed = {path for path in current.keys() | self._snapshot.keys()
+                       if current.get(path) != self._snapshot.get(path)}
+            self._snapshot = current
+            remaining = deadline - time.monotonic()
+            if changed or remaining <= 0:
+                return changed
+            time.sleep(min(self.interval, remaining))
+
+    def close(self):
+        pass
+
+
+def create_watcher(targets, polling=False):
+    """Return an inotify watcher where the platform supports it, else a polling watcher."""
+    if not polling:
+        try:
+            return InotifyWatcher(targets)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(targets)
+
+
+def wait_for_changes(watcher, debounce=0.03):
+    """Block until something changes, then keep collecting until debounce seconds pass quietly."""
+    changed = set()
+    while not changed:
+        changed = watcher.poll(1.0)
+    while True:
+        more = watcher.poll(debounce)
+        if not more:
+            return changed
+        changed |= more